@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Serve with an ASGI server (e.g. `uvicorn config.asgi:application`) so the
+native async views (auth, project creation) await password / PIN hashing on
+the bounded pool in users.hashing instead of occupying a worker thread.
 """
 
 import os
@@ -12,5 +16,9 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+# Tells the settings that no connection outlives its request (CONN_MAX_AGE)
+os.environ['DJANGO_ASGI'] = 'True'
+# Serve the project read endpoints from projects.async_views
+os.environ.setdefault('DJANGO_ASYNC_VIEWS', 'True')
 
 application = get_asgi_application()
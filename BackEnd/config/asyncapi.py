@@ -0,0 +1,100 @@
+"""
+Small helpers for native async JSON views.
+
+DRF's APIView is sync-only, so endpoints that must not tie up a worker
+thread (password / PIN hashing, async ORM reads) are plain Django async
+views wrapped with async_api_view(). Responses keep DRF's shapes:
+{"detail": ...} for auth / method errors, view-specific bodies otherwise.
+"""
+import json
+from functools import wraps
+
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.exceptions import APIException, AuthenticationFailed
+
+from config.renderers import JSONResponse
+from users.authentication import CachedJWTAuthentication
+from users.hashing import HashingBusy
+
+
+class InvalidJSON(Exception):
+    pass
+
+
+def json_body(request):
+    """Parse a JSON object request body ({} when empty)"""
+    if not request.body:
+        return {}
+    try:
+        data = json.loads(request.body)
+    except ValueError as e:
+        raise InvalidJSON() from e
+    if not isinstance(data, dict):
+        raise InvalidJSON()
+    return data
+
+
+def _error_body(detail):
+    # Mirrors DRF: dict details (e.g. InvalidToken) are the body as-is
+    return detail if isinstance(detail, dict) else {"detail": detail}
+
+
+def _unauthorized(detail):
+    response = JSONResponse(_error_body(detail), status=401)
+    response["WWW-Authenticate"] = 'Bearer realm="api"'
+    return response
+
+
+def async_api_view(methods, authenticated=False, authentication=CachedJWTAuthentication):
+    """
+    Decorate an `async def view(request, ...)`:
+    - CSRF exempt (JWT auth only, like the DRF views)
+    - 405 for other methods
+    - JWT authentication when `authenticated` (sets request.user), with
+      the `authentication` class; a user already forced onto the request
+      (config.batch sub-requests) is taken as-is
+    - DRF APIExceptions rendered with their status code
+    - 400 on malformed JSON, 503 when the hashing pool is saturated
+    """
+    authenticator = authentication()
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in methods:
+                return JSONResponse(
+                    {"detail": f'Method "{request.method}" not allowed.'},
+                    status=405,
+                )
+
+            if authenticated and getattr(request, "_force_auth_user", None):
+                request.user = request._force_auth_user
+                request.auth = getattr(request, "_force_auth_token", None)
+            elif authenticated:
+                try:
+                    result = await authenticator.aauthenticate(request)
+                except AuthenticationFailed as exc:
+                    return _unauthorized(exc.detail)
+                if result is None:
+                    return _unauthorized("Authentication credentials were not provided.")
+                request.user, request.auth = result
+
+            try:
+                return await view(request, *args, **kwargs)
+            except APIException as exc:
+                return JSONResponse(_error_body(exc.detail), status=exc.status_code)
+            except InvalidJSON:
+                return JSONResponse({"detail": "JSON parse error"}, status=400)
+            except HashingBusy:
+                response = JSONResponse(
+                    {"detail": "Server busy, please retry shortly."},
+                    status=503,
+                )
+                response["Retry-After"] = "1"
+                return response
+
+        # API views are the only ones config.batch dispatches to
+        wrapper.async_api_view = True
+        return csrf_exempt(wrapper)
+
+    return decorator
@@ -0,0 +1,189 @@
+"""
+Batch endpoint: several read-only API calls in one round-trip.
+
+    POST /api/batch/
+    {"requests": [{"path": "/api/projects/owned/?limit=10"},
+                  {"path": "/api/projects/<id>/overview/",
+                   "headers": {"If-None-Match": "\"...\""}}],
+     "parallel": true}
+
+    -> {"responses": [{"status": 200, "headers": {"ETag": ...}, "body": {...}},
+                      {"status": 304, "headers": {...}, "body": null}]}
+
+The batch is authenticated once; every sub-request is dispatched straight
+to its view through the URLconf, with that user forced in (DRF's forced
+authentication, honoured by async_api_view too), so no sub-request decodes
+the JWT or runs the middleware again. Only GET sub-requests are allowed,
+and streaming responses (the events stream) are refused. Paths must be
+under /api/ and resolve to an API view (DRF or async_api_view): the admin
+and any other plain Django view are never reachable from a batch.
+
+Native async views run concurrently on the event loop. Sync (DRF) views
+run one after another on the request's thread, or with "parallel": true
+on a bounded pool of BATCH_WORKERS threads.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import asyncio
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.handlers.exception import response_for_exception
+from django.db import close_old_connections
+from django.http import HttpRequest, HttpResponse, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework.views import APIView
+
+from config.asyncapi import async_api_view, json_body
+from config.renderers import JSONResponse, dumps
+
+# Request headers a sub-request may set
+SUB_REQUEST_HEADERS = {"If-None-Match": "HTTP_IF_NONE_MATCH"}
+
+API_PREFIX = "/api/"
+
+# Parent META entries a sub-request must not inherit
+_BODY_META = {"CONTENT_LENGTH", "CONTENT_TYPE", "HTTP_IF_NONE_MATCH", "wsgi.input"}
+
+_executor = None
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.BATCH_WORKERS,
+            thread_name_prefix="batch",
+        )
+    return _executor
+
+
+class _Rejected(Exception):
+
+    def __init__(self, status, detail):
+        self.status = status
+        self.detail = detail
+
+
+def _sub_request(request, spec):
+    if not isinstance(spec, dict) or not isinstance(spec.get("path"), str):
+        raise _Rejected(400, 'Each request needs a "path".')
+    if spec.get("method", "GET").upper() != "GET":
+        raise _Rejected(405, "Only GET requests can be batched.")
+
+    url = urlsplit(spec["path"])
+    sub = HttpRequest()
+    sub.method = "GET"
+    sub.path = sub.path_info = url.path
+    sub.GET = QueryDict(url.query)
+    sub.META = {k: v for k, v in request.META.items() if k not in _BODY_META}
+    sub.META.update(REQUEST_METHOD="GET", PATH_INFO=url.path, QUERY_STRING=url.query)
+    headers = spec.get("headers") or {}
+    for name, meta_key in SUB_REQUEST_HEADERS.items():
+        if isinstance(headers.get(name), str):
+            sub.META[meta_key] = headers[name]
+
+    # Authenticated once for the whole batch
+    sub.user = request.user
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    return sub
+
+
+def _is_api_view(view):
+    # api_view and APIView.as_view() set .cls
+    cls = getattr(view, "cls", None)
+    if isinstance(cls, type) and issubclass(cls, APIView):
+        return True
+    return getattr(view, "async_api_view", False)
+
+
+def _finish(sub, response):
+    if response.streaming:
+        response.close()
+        raise _Rejected(400, "Streaming endpoints cannot be batched.")
+    if hasattr(response, "render"):
+        # DRF Response / TemplateResponse
+        response.render()
+    return response
+
+
+def _call_sync(view, sub, args, kwargs):
+    try:
+        return _finish(sub, view(sub, *args, **kwargs))
+    except _Rejected:
+        raise
+    except Exception as exc:
+        return response_for_exception(sub, exc)
+
+
+def _call_in_pool(view, sub, args, kwargs):
+    try:
+        return _call_sync(view, sub, args, kwargs)
+    finally:
+        # Pool threads are not request threads: honour CONN_MAX_AGE here
+        close_old_connections()
+
+
+async def _call_async(view, sub, args, kwargs):
+    try:
+        return _finish(sub, await view(sub, *args, **kwargs))
+    except _Rejected:
+        raise
+    except Exception as exc:
+        return await sync_to_async(response_for_exception)(sub, exc)
+
+
+async def _dispatch(request, spec, parallel):
+    try:
+        sub = _sub_request(request, spec)
+        try:
+            if not sub.path_info.startswith(API_PREFIX):
+                raise Resolver404
+            match = resolve(sub.path_info)
+        except Resolver404:
+            raise _Rejected(404, "Not found.")
+
+        view, args, kwargs = match.func, match.args, match.kwargs
+        if not _is_api_view(view):
+            raise _Rejected(404, "Not found.")
+        if iscoroutinefunction(view):
+            return await _call_async(view, sub, args, kwargs)
+        if parallel:
+            return await sync_to_async(
+                _call_in_pool, thread_sensitive=False, executor=_pool()
+            )(view, sub, args, kwargs)
+        return await sync_to_async(_call_sync)(view, sub, args, kwargs)
+    except _Rejected as exc:
+        return JSONResponse({"detail": exc.detail}, status=exc.status)
+
+
+def _entry(response):
+    headers = {"ETag": response["ETag"]} if response.has_header("ETag") else {}
+    is_json = response.get("Content-Type", "").startswith("application/json")
+    body = response.content if is_json and response.content else b"null"
+    # Bodies are already JSON: spliced in, not decoded and re-encoded
+    head = dumps({"status": response.status_code, "headers": headers})
+    return head[:-1] + b',"body":' + body + b"}"
+
+
+@async_api_view(["POST"], authenticated=True)
+async def batch_view(request):
+    data = json_body(request)
+    specs = data.get("requests")
+    if not isinstance(specs, list) or not specs:
+        return JSONResponse({"detail": '"requests" must be a non-empty list.'}, status=400)
+    if len(specs) > settings.BATCH_MAX_REQUESTS:
+        return JSONResponse(
+            {"detail": f"At most {settings.BATCH_MAX_REQUESTS} requests per batch."},
+            status=400,
+        )
+
+    parallel = bool(data.get("parallel"))
+    if parallel:
+        responses = await asyncio.gather(*(_dispatch(request, s, True) for s in specs))
+    else:
+        responses = [await _dispatch(request, s, False) for s in specs]
+
+    content = b'{"responses":[' + b",".join(map(_entry, responses)) + b"]}"
+    return HttpResponse(content, content_type="application/json")
@@ -0,0 +1,170 @@
+"""
+Primary / read-replica routing.
+
+Writes always go to `default`. Reads go to a replica (settings.DB_REPLICAS,
+round-robin) only inside views decorated with @replica_reads, and only
+while the request has not written anything: the first write pins the rest
+of the request to the primary, so it reads its own writes. Reads made
+before the request's user is authenticated (the JWT user lookup) also use
+the primary.
+
+ReplicaPinningMiddleware keeps the routing state per request and, when a
+request wrote, pins that user to the primary for REPLICA_PIN_SECONDS so
+follow-up reads do not see replication lag. The pins live in the
+REPLICA_PIN_CACHE cache, which must be shared by all workers (`manage.py
+check --deploy` rejects a per-process one). Outside requests (shell,
+management commands) every query uses the primary.
+"""
+import contextvars
+import itertools
+import threading
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.decorators import sync_and_async_middleware
+from django.utils.functional import LazyObject, empty
+
+PRIMARY = "default"
+
+_routing = contextvars.ContextVar("db_routing", default=None)
+
+
+def _pins():
+    return caches[settings.REPLICA_PIN_CACHE]
+
+
+def _pin_key(user_id):
+    return f"replica-pin:{user_id}"
+
+
+class RoutingState:
+
+    def __init__(self, request=None):
+        self.request = request
+        self.replica_reads = False
+        self.wrote = False
+        self._user_pinned = None
+
+    def user_pinned(self, user):
+        """Whether a recent write by this user pins it to the primary"""
+        if self._user_pinned is None:
+            self._user_pinned = bool(_pins().get(_pin_key(user.pk)))
+        return self._user_pinned
+
+    def use_replica(self):
+        if not self.replica_reads or self.wrote:
+            return False
+        user = getattr(self.request, "user", None)
+        if isinstance(user, LazyObject) and user._wrapped is empty:
+            # AuthenticationMiddleware's lazy session user: resolving it
+            # here would query (and route) from inside the router
+            return False
+        if user is None or not user.is_authenticated:
+            # Authentication has not resolved the user yet: its lookups
+            # (a user who just registered may not be on the replica) stay
+            # on the primary
+            return False
+        return not self.user_pinned(user)
+
+
+class PrimaryReplicaRouter:
+
+    # Security-sensitive reads that must never lag behind the primary
+    primary_only = {"users.revokedtoken", "users.tokencutoff"}
+
+    def __init__(self):
+        self.replicas = [f"replica_{i}" for i in range(len(settings.DB_REPLICAS))]
+        self._next = itertools.count()
+        self._lock = threading.Lock()
+
+    def _pick_replica(self):
+        with self._lock:
+            return self.replicas[next(self._next) % len(self.replicas)]
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if (
+            not self.replicas
+            or state is None
+            or model._meta.label_lower in self.primary_only
+            or not state.use_replica()
+        ):
+            return PRIMARY
+        return self._pick_replica()
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas are copies of the primary, never migrated directly
+        return db == PRIMARY
+
+
+@sync_and_async_middleware
+def ReplicaPinningMiddleware(get_response):
+
+    def start(request):
+        return _routing.set(RoutingState(request))
+
+    def finish(token, request):
+        state = _routing.get()
+        _routing.reset(token)
+        user = getattr(request, "user", None)
+        if state.wrote and user is not None and user.is_authenticated:
+            _pins().set(_pin_key(user.pk), True, settings.REPLICA_PIN_SECONDS)
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = start(request)
+            try:
+                return await get_response(request)
+            finally:
+                finish(token, request)
+    else:
+        def middleware(request):
+            token = start(request)
+            try:
+                return get_response(request)
+            finally:
+                finish(token, request)
+
+    return middleware
+
+
+def pin_to_primary():
+    """
+    Treat the current request as a write: its remaining reads, and the
+    user's reads for REPLICA_PIN_SECONDS after it, use the primary
+    """
+    state = _routing.get()
+    if state is not None:
+        state.wrote = True
+
+
+def replica_reads(view):
+    """Let the read-only queries of `view` go to a replica"""
+    if iscoroutinefunction(view):
+        async def wrapped(request, *args, **kwargs):
+            state = _routing.get()
+            if state is not None:
+                state.replica_reads = True
+            return await view(request, *args, **kwargs)
+
+        markcoroutinefunction(wrapped)
+    else:
+        def wrapped(request, *args, **kwargs):
+            state = _routing.get()
+            if state is not None:
+                state.replica_reads = True
+            return view(request, *args, **kwargs)
+
+    return wraps(view)(wrapped)
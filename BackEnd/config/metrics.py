@@ -0,0 +1,17 @@
+"""
+Minimal in-process metrics registry.
+
+Modules register a zero-argument collector returning a dict; the admin-only
+/api/metrics/ endpoint (config.views.metrics_view) returns every
+collector's current snapshot. Values are per process.
+"""
+
+_collectors = {}
+
+
+def register(name, collector):
+    _collectors[name] = collector
+
+
+def snapshot():
+    return {name: collector() for name, collector in _collectors.items()}
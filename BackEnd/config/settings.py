@@ -36,20 +36,127 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    "config.db_router.ReplicaPinningMiddleware",
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
     ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "config.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+}
+
+# Route project read endpoints to their native async versions
+# (projects.async_views). config/asgi.py enables this by default.
+ASYNC_PROJECT_VIEWS = os.getenv("DJANGO_ASYNC_VIEWS") == "True"
+
+# Token user resolution cache (users.authentication.CachedJWTAuthentication).
+# SHARED_CACHE optionally names a CACHES alias used as a second tier; the
+# local tier then keeps entries for SHARED_LOCAL_TTL at most, as other
+# processes' invalidations only reach the shared tier.
+JWT_USER_CACHE = {
+    "TTL": int(os.getenv("JWT_USER_CACHE_TTL", "60")),
+    "MAX_ENTRIES": int(os.getenv("JWT_USER_CACHE_MAX_ENTRIES", "10000")),
+    "SHARED_CACHE": os.getenv("JWT_USER_SHARED_CACHE") or None,
+    "SHARED_TTL": int(os.getenv("JWT_USER_SHARED_CACHE_TTL", "300")),
+    "SHARED_LOCAL_TTL": int(os.getenv("JWT_USER_SHARED_LOCAL_TTL", "5")),
+}
+
+# Per-user project access cache (projects.access), same shape as above
+PROJECT_ACCESS_CACHE = {
+    "TTL": int(os.getenv("PROJECT_ACCESS_CACHE_TTL", "60")),
+    "MAX_ENTRIES": int(os.getenv("PROJECT_ACCESS_CACHE_MAX_ENTRIES", "50000")),
+    "SHARED_CACHE": os.getenv("PROJECT_ACCESS_SHARED_CACHE") or None,
+    "SHARED_TTL": int(os.getenv("PROJECT_ACCESS_SHARED_CACHE_TTL", "300")),
+    "SHARED_LOCAL_TTL": int(os.getenv("PROJECT_ACCESS_SHARED_LOCAL_TTL", "5")),
+}
+
+# Per-process prefix index behind /api/projects/autocomplete/
+# (projects.autocomplete): users kept loaded, seconds before a reload
+PROJECT_AUTOCOMPLETE = {
+    "TTL": int(os.getenv("PROJECT_AUTOCOMPLETE_TTL", "300")),
+    "MAX_USERS": int(os.getenv("PROJECT_AUTOCOMPLETE_MAX_USERS", "10000")),
+}
+
+# Join by public_code + PIN (projects.joining): PIN verifications allowed
+# per client address and per (project code, address), failed ones per
+# project code from all addresses, in each WINDOW seconds, and how long a
+# successful verification is remembered. CACHE names the CACHES alias
+# holding the counters; it must be shared by all workers in production
+# (`manage.py check --deploy` rejects a per-process one).
+PROJECT_JOIN = {
+    "PER_IP": int(os.getenv("PROJECT_JOIN_PER_IP", "20")),
+    "PER_CODE_IP": int(os.getenv("PROJECT_JOIN_PER_CODE_IP", "10")),
+    "PER_CODE": int(os.getenv("PROJECT_JOIN_PER_CODE", "200")),
+    "WINDOW": int(os.getenv("PROJECT_JOIN_WINDOW", "900")),
+    "VERIFIED_TTL": int(os.getenv("PROJECT_JOIN_VERIFIED_TTL", "300")),
+    "CACHE": os.getenv("PROJECT_JOIN_CACHE", "default"),
+}
+
+# The "default" cache is per process. SHARED_CACHE_URL adds a "shared"
+# alias on Redis (Django's RedisCache; needs the redis package) for the
+# settings above that take a cache alias.
+CACHES = {
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"},
+}
+if os.getenv("SHARED_CACHE_URL"):
+    CACHES["shared"] = {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.getenv("SHARED_CACHE_URL"),
+    }
+
+# Client addresses (projects.joining.client_ip) behind PROXY_COUNT reverse
+# proxies that append the address they received from to HEADER (a
+# request.META key). 0 when clients connect directly: REMOTE_ADDR is used
+# and forwarding headers, which anyone can send, are ignored. Unset (None)
+# behaves as 0 but is rejected by `manage.py check --deploy`: behind a
+# proxy, 0 gives every client the proxy's address and one shared limit.
+CLIENT_IP = {
+    "HEADER": os.getenv("CLIENT_IP_HEADER", "HTTP_X_FORWARDED_FOR"),
+    "PROXY_COUNT": (
+        int(os.environ["CLIENT_IP_PROXY_COUNT"]) if os.getenv("CLIENT_IP_PROXY_COUNT") else None
+    ),
+}
+
+# Project change log behind /api/projects/changes/ (projects.changes).
+# Sync tokens older than this are refused; the client reloads its lists.
+PROJECT_CHANGES_RETENTION_DAYS = int(os.getenv("PROJECT_CHANGES_RETENTION_DAYS", "30"))
+
+# Push of project / membership events (projects.events). BROKER is a
+# projects.events.Broker; the default one only reaches this process.
+PROJECT_EVENTS = {
+    "BROKER": os.getenv("PROJECT_EVENTS_BROKER", "projects.events.InProcessBroker"),
+    "OPTIONS": {"queue_size": int(os.getenv("PROJECT_EVENTS_QUEUE_SIZE", "100"))},
+    "HEARTBEAT": int(os.getenv("PROJECT_EVENTS_HEARTBEAT", "25")),
+}
+
+# Batched GET sub-requests (config.batch): per-batch limit, and threads for
+# running sync views of a "parallel" batch
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+BATCH_WORKERS = int(os.getenv("BATCH_WORKERS", "4"))
+
+# Password / PIN hashing pool (users.hashing)
+HASHING_POOL_WORKERS = int(os.getenv("HASHING_POOL_WORKERS", "4"))
+HASHING_POOL_MAX_PENDING = int(os.getenv("HASHING_POOL_MAX_PENDING", "64"))
+
+# JWT revocation (users.revocation). REBUILD_INTERVAL bounds how long
+# another worker may still accept a token revoked elsewhere.
+TOKEN_REVOCATION = {
+    "REBUILD_INTERVAL": int(os.getenv("TOKEN_REVOCATION_REBUILD_INTERVAL", "30")),
+    "FALSE_POSITIVE_RATE": float(os.getenv("TOKEN_REVOCATION_FP_RATE", "0.001")),
+    "MIN_CAPACITY": int(os.getenv("TOKEN_REVOCATION_MIN_CAPACITY", "10000")),
 }
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
     "AUTH_HEADER_TYPES": ("Bearer",),
+    "TOKEN_REFRESH_SERIALIZER": "users.serializers.TokenRefreshSerializer",
 }
 
 ROOT_URLCONF = 'config.urls'
@@ -82,6 +189,74 @@ DATABASES = {
     }
 }
 
+# Production SQLite: WAL lets readers run while a write is in flight,
+# IMMEDIATE takes the write lock at BEGIN (no deadlock-prone lock upgrade
+# inside atomic blocks) and, under WSGI, connections are kept across
+# requests. Benchmark with `python manage.py bench_sqlite_concurrency`.
+SQLITE_PRODUCTION = os.getenv("DJANGO_SQLITE_PRODUCTION") == "True"
+
+# Set by config/asgi.py. Persistent connections are WSGI-only: Django
+# closes expired connections at the end of a request on the request's own
+# thread, but under ASGI the queries run on sync_to_async / executor
+# threads, whose connections would never be checked and stay open.
+SERVED_BY_ASGI = os.getenv("DJANGO_ASGI") == "True"
+
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": -int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536")),
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "temp_store": "MEMORY",
+}
+
+if SQLITE_PRODUCTION:
+    DATABASES['default'].update({
+        'CONN_MAX_AGE': 0 if SERVED_BY_ASGI else int(os.getenv("DJANGO_CONN_MAX_AGE", "600")),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': SQLITE_PRAGMAS["busy_timeout"] / 1000,
+            'init_command': "".join(
+                f"PRAGMA {name}={value};" for name, value in SQLITE_PRAGMAS.items()
+            ),
+        },
+    })
+
+# Read replicas (config.db_router): comma separated database files, exposed
+# as replica_0, replica_1, ... Locally they are SQLite copies of the primary
+# kept fresh by `python manage.py sync_sqlite_replicas --interval 5`.
+# Pins are kept in REPLICA_PIN_CACHE (below), which must be shared across
+# workers for read-your-writes to hold between processes.
+DB_REPLICAS = [p for p in os.getenv("DJANGO_DB_REPLICAS", "").split(",") if p]
+
+for i, replica_name in enumerate(DB_REPLICAS):
+    DATABASES[f'replica_{i}'] = {
+        **DATABASES['default'],
+        'NAME': replica_name,
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Project shards (projects.sharding): extra database files holding projects
+# and their memberships next to "default", exposed as shard_1, shard_2, ...
+# The shard count must not change once projects exist. Create the tables
+# with `python manage.py migrate_shards`.
+PROJECT_SHARD_FILES = [p for p in os.getenv("DJANGO_PROJECT_SHARDS", "").split(",") if p]
+
+for i, shard_name in enumerate(PROJECT_SHARD_FILES, start=1):
+    DATABASES[f'shard_{i}'] = {**DATABASES['default'], 'NAME': shard_name}
+
+PROJECT_SHARDS = ['default'] + [f'shard_{i}' for i in range(1, len(PROJECT_SHARD_FILES) + 1)]
+
+DATABASE_ROUTERS = [
+    "projects.sharding.ProjectShardRouter",
+    "config.db_router.PrimaryReplicaRouter",
+]
+REPLICA_PIN_SECONDS = int(os.getenv("DJANGO_REPLICA_PIN_SECONDS", "5"))
+# CACHES alias holding the pins; must be shared by all workers when
+# DB_REPLICAS are set (`manage.py check --deploy`)
+REPLICA_PIN_CACHE = os.getenv("DJANGO_REPLICA_PIN_CACHE", "default")
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
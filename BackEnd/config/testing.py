@@ -0,0 +1,37 @@
+"""
+Test helpers for the multi-database setups (read replicas, project shards).
+
+Tests run against the single "default" test database. database_snapshot()
+adds another SQLite alias at runtime holding a copy of "default" as it is
+when called: schema included, so a snapshot taken in setUpClass is an
+empty but migrated database, i.e. a replica that has not caught up yet, or
+a fresh shard.
+"""
+import os
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+
+from django.db import connections
+
+
+@contextmanager
+def database_snapshot(alias):
+    source = connections["default"]
+    source.ensure_connection()
+    fd, path = tempfile.mkstemp(suffix=".sqlite3", prefix=f"{alias}-")
+    os.close(fd)
+    target = sqlite3.connect(path)
+    try:
+        source.connection.backup(target)
+    finally:
+        target.close()
+
+    connections.settings[alias] = {**connections.settings["default"], "NAME": path}
+    try:
+        yield alias
+    finally:
+        connections[alias].close()
+        del connections[alias]
+        del connections.settings[alias]
+        os.remove(path)
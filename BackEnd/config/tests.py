@@ -0,0 +1,384 @@
+import os
+import runpy
+import tempfile
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache
+from django.db import router
+from django.db.utils import ConnectionHandler
+from django.http import HttpResponse
+from django.test import AsyncClient, SimpleTestCase, TestCase, override_settings
+from django.urls import include, path
+from rest_framework.renderers import JSONRenderer
+
+from config.batch import batch_view
+from config.db_router import PrimaryReplicaRouter
+from config.renderers import dumps
+from config.testing import database_snapshot
+from projects import async_views
+from projects.checks import check_replica_pin_cache
+from projects.models import Project, ProjectChange
+from users.authentication import user_cache
+
+
+def plain_view(request):
+    return HttpResponse(b'{"plain": true}', content_type="application/json")
+
+
+# The read endpoints as served under ASGI (projects.urls picks the sync
+# DRF views in tests)
+async_reads = [
+    path("owned/", async_views.owned_projects),
+    path("joined/", async_views.joined_projects),
+    path("all/", async_views.all_projects),
+    path("search/", async_views.search_projects),
+    path("autocomplete/", async_views.autocomplete_projects),
+    path("changes/", async_views.project_changes),
+    path("<uuid:project_id>/overview/", async_views.project_overview),
+    path("events/", async_views.project_events),
+]
+
+urlpatterns = [
+    path("api/auth/", include("users.urls")),
+    path("api/projects/", include("projects.urls")),
+    path("api/async/projects/", include(async_reads)),
+    path("api/batch/", batch_view),
+    # Not an API view: never reachable from a batch
+    path("api/plain/", plain_view),
+]
+
+PASSWORD = "Abcdef1@"
+
+
+class ReplicaReadsTests(TestCase):
+    """
+    replica_0 is a snapshot taken before any test data exists: a replica
+    that has not caught up with anything written since.
+    """
+    # "__all__" is resolved in setUpClass, after replica_0 exists (the test
+    # runner itself only knows the configured aliases)
+    databases = "__all__"
+
+    @classmethod
+    def setUpClass(cls):
+        cls.enterClassContext(database_snapshot("replica_0"))
+        replica_router = next(r for r in router.routers if isinstance(r, PrimaryReplicaRouter))
+        cls.enterClassContext(mock.patch.object(replica_router, "replicas", ["replica_0"]))
+        super().setUpClass()
+
+    def setUp(self):
+        cache.clear()
+        user_cache.local.clear()
+
+    def register_and_login(self, email):
+        response = self.client.post("/api/auth/register/", {
+            "fullname": "Lag Test",
+            "email": email,
+            "password": PASSWORD,
+            "confirmPassword": PASSWORD,
+        }, content_type="application/json")
+        self.assertEqual(response.status_code, 201, response.content)
+
+        response = self.client.post(
+            "/api/auth/login/", {"email": email, "password": PASSWORD},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return {"Authorization": f"Bearer {response.json()['tokens']['access']}"}
+
+    def owned(self, headers, url="/api/projects/owned/"):
+        response = self.client.get(url, headers=headers)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row["name"] for row in response.json()["results"]]
+
+    def test_reads_use_the_replica(self):
+        headers = self.register_and_login("reader@example.com")
+        # Written outside any request: on the primary only
+        Project.objects.create(
+            name="Not replicated",
+            root_admin=User.objects.get(email="reader@example.com"),
+            access_key_hash="x",
+            pin_hash="x",
+        )
+
+        self.assertEqual(Project.objects.using("replica_0").count(), 0)
+        self.assertEqual(self.owned(headers), [])
+
+    def test_user_can_read_right_after_registering(self):
+        # The new user row is not on the replica: authentication must not look there
+        headers = self.register_and_login("new@example.com")
+        self.assertEqual(self.owned(headers), [])
+        with override_settings(ROOT_URLCONF=__name__):
+            self.assertEqual(self.owned(headers, "/api/async/projects/owned/"), [])
+
+    def test_user_reads_own_writes(self):
+        headers = self.register_and_login("writer@example.com")
+        response = self.client.post(
+            "/api/projects/create/", {"name": "Fresh"},
+            content_type="application/json", headers=headers,
+        )
+        self.assertEqual(response.status_code, 201, response.content)
+
+        # The write pinned the user to the primary
+        self.assertEqual(self.owned(headers), ["Fresh"])
+        with override_settings(ROOT_URLCONF=__name__):
+            self.assertEqual(self.owned(headers, "/api/async/projects/owned/"), ["Fresh"])
+
+    def test_pin_expires_back_to_the_replica(self):
+        headers = self.register_and_login("pinned@example.com")
+        self.client.post(
+            "/api/projects/create/", {"name": "Lagging"},
+            content_type="application/json", headers=headers,
+        )
+        cache.clear()
+        self.assertEqual(self.owned(headers), [])
+
+    def test_deploy_check_rejects_a_per_process_pin_cache(self):
+        with override_settings(DB_REPLICAS=["replica.sqlite3"]):
+            self.assertEqual([e.id for e in check_replica_pin_cache(None)], ["projects.E002"])
+            with override_settings(CACHES={
+                **settings.CACHES,
+                "shared": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": ""},
+            }, REPLICA_PIN_CACHE="shared"):
+                self.assertEqual(check_replica_pin_cache(None), [])
+        self.assertEqual(check_replica_pin_cache(None), [])
+
+    def test_change_token_pins_to_the_primary(self):
+        headers = self.register_and_login("sync@example.com")
+        with self.captureOnCommitCallbacks(execute=True):
+            Project.objects.create(
+                name="Only on the primary",
+                root_admin=User.objects.get(email="sync@example.com"),
+                access_key_hash="x",
+                pin_hash="x",
+            )
+
+        response = self.client.get("/api/projects/changes/", headers=headers)
+        self.assertEqual(response.status_code, 200, response.content)
+        position = signing.loads(response.json()["since"], salt="projects.changes")
+        self.assertEqual(position, ProjectChange.objects.latest("id").pk)
+        # The lists loaded after the token include everything before it
+        self.assertEqual(self.owned(headers), ["Only on the primary"])
+
+
+class RendererTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        user_cache.local.clear()
+
+    def test_sync_and_async_views_send_the_same_bytes(self):
+        self.client.post("/api/auth/register/", {
+            "fullname": "Render Test",
+            "email": "render@example.com",
+            "password": PASSWORD,
+            "confirmPassword": PASSWORD,
+        }, content_type="application/json")
+        response = self.client.post(
+            "/api/auth/login/", {"email": "render@example.com", "password": PASSWORD},
+            content_type="application/json",
+        )
+        headers = {"Authorization": f"Bearer {response.json()['tokens']['access']}"}
+        Project.objects.create(
+            name="Ünïcode", root_admin=User.objects.get(email="render@example.com"),
+            access_key_hash="x", pin_hash="x",
+        )
+
+        sync = self.client.get("/api/projects/owned/", headers=headers)
+        with override_settings(ROOT_URLCONF=__name__):
+            async_ = self.client.get("/api/async/projects/owned/", headers=headers)
+
+        self.assertEqual(sync.content, async_.content)
+        self.assertEqual(async_["Content-Type"], "application/json")
+        # Compact, UTF-8, DRF's "Z" datetimes
+        self.assertEqual(sync.content, dumps(sync.json()))
+        self.assertIn('"name":"Ünïcode"'.encode(), sync.content)
+        self.assertNotIn(b'": ', sync.content)
+        self.assertRegex(sync.json()["results"][0]["created_at"], r"Z$")
+
+    def test_dumps_matches_drf(self):
+        data = {"when": datetime(2030, 1, 2, 3, 4, 5, 678000, tzinfo=timezone.utc),
+                "amount": Decimal("1.50"), "ids": [uuid.UUID(int=1)], "text": "é"}
+        self.assertEqual(dumps(data), JSONRenderer().render(data))
+
+
+class BatchTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        user_cache.local.clear()
+        self.client.post("/api/auth/register/", {
+            "fullname": "Batch Test",
+            "email": "batch@example.com",
+            "password": PASSWORD,
+            "confirmPassword": PASSWORD,
+        }, content_type="application/json")
+        response = self.client.post(
+            "/api/auth/login/", {"email": "batch@example.com", "password": PASSWORD},
+            content_type="application/json",
+        )
+        self.headers = {"Authorization": f"Bearer {response.json()['tokens']['access']}"}
+
+    def batch(self, *paths, **data):
+        response = self.client.post(
+            "/api/batch/", {"requests": [{"path": p} for p in paths], **data},
+            content_type="application/json", headers=self.headers,
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return [entry["status"] for entry in response.json()["responses"]]
+
+    @override_settings(BATCH_MAX_REQUESTS=3)
+    def test_limits(self):
+        for data in ({"requests": []}, {"requests": "/api/projects/owned/"},
+                     {"requests": [{"path": "/api/projects/owned/"}] * 4}):
+            with self.subTest(data=data):
+                response = self.client.post(
+                    "/api/batch/", data, content_type="application/json", headers=self.headers,
+                )
+                self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            "/api/batch/", {"requests": [{"path": "/api/projects/owned/"}]},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_sub_requests(self):
+        owned = self.client.get("/api/projects/owned/", headers=self.headers)
+        for parallel in (False, True):
+            with self.subTest(parallel=parallel):
+                response = self.client.post("/api/batch/", {"parallel": parallel, "requests": [
+                    {"path": "/api/projects/owned/"},
+                    {"path": "/api/async/projects/owned/?limit=5"},
+                    {"path": "/api/projects/owned/", "headers": {"If-None-Match": owned["ETag"]}},
+                    {"path": "/api/projects/create/", "method": "POST"},
+                    {"path": "/api/async/projects/events/"},
+                    {"nopath": True},
+                ]}, content_type="application/json", headers=self.headers)
+                entries = response.json()["responses"]
+                self.assertEqual([e["status"] for e in entries], [200, 200, 304, 405, 400, 400])
+                self.assertEqual(entries[0]["body"], owned.json())
+                self.assertEqual(entries[0]["headers"], {"ETag": owned["ETag"]})
+                self.assertIsNone(entries[2]["body"])
+
+    @override_settings(ROOT_URLCONF=__name__)
+    def test_only_api_views_are_dispatched(self):
+        self.assertEqual(
+            self.batch("/api/projects/owned/", "/api/async/projects/owned/", "/api/plain/"),
+            [200, 200, 404],
+        )
+
+    def test_paths_outside_the_api_are_rejected(self):
+        User.objects.filter(email="batch@example.com").update(is_staff=True, is_superuser=True)
+        self.assertEqual(
+            self.batch("/admin/", "/admin/auth/user/", "/api/../admin/", "/api/metrics/"),
+            [404, 404, 404, 200],
+        )
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncViewTests(TestCase):
+    """The native async read endpoints, through the ASGI handler, against the DRF ones"""
+
+    def setUp(self):
+        cache.clear()
+        user_cache.local.clear()
+        self.headers = {}
+        for email in ("owner@example.com", "member@example.com"):
+            self.client.post("/api/auth/register/", {
+                "fullname": "Async Test", "email": email,
+                "password": PASSWORD, "confirmPassword": PASSWORD,
+            }, content_type="application/json")
+            response = self.client.post(
+                "/api/auth/login/", {"email": email, "password": PASSWORD},
+                content_type="application/json",
+            )
+            self.headers[email] = {"Authorization": f"Bearer {response.json()['tokens']['access']}"}
+        for name in ("Async One", "Async Two"):
+            response = self.client.post(
+                "/api/projects/create/",
+                {"name": name, "members": [{"email": "member@example.com", "role": "admin"}]},
+                content_type="application/json", headers=self.headers["owner@example.com"],
+            )
+            self.project_id = response.json()["id"]
+
+    async def test_same_responses_as_the_sync_views(self):
+        client = AsyncClient()
+        for email, headers in self.headers.items():
+            for path, params in (
+                ("owned/", {}), ("joined/", {"limit": 1}), ("all/", {"fields": "name,role"}),
+                ("search/", {"q": "async"}), ("autocomplete/", {"q": "as"}),
+                (f"{self.project_id}/overview/", {}),
+            ):
+                with self.subTest(email=email, path=path):
+                    sync = await client.get(f"/api/projects/{path}", params, headers=headers)
+                    async_ = await client.get(f"/api/async/projects/{path}", params, headers=headers)
+                    self.assertEqual(sync.status_code, 200, sync.content)
+                    self.assertEqual((async_.status_code, async_.content), (200, sync.content))
+                    # ETags hash the path, so only their presence matches
+                    self.assertEqual(async_.has_header("ETag"), sync.has_header("ETag"))
+
+    async def test_authentication_and_conditional_requests(self):
+        client = AsyncClient()
+        self.assertEqual((await client.get("/api/async/projects/owned/")).status_code, 401)
+        response = await client.get(
+            "/api/async/projects/owned/", headers={"Authorization": "Bearer nope"},
+        )
+        self.assertEqual(response.status_code, 401)
+
+        headers = self.headers["owner@example.com"]
+        response = await client.get("/api/async/projects/owned/", headers=headers)
+        response = await client.get(
+            "/api/async/projects/owned/", headers={**headers, "If-None-Match": response["ETag"]},
+        )
+        self.assertEqual(response.status_code, 304)
+
+    async def test_event_stream_takes_the_token_as_a_parameter(self):
+        client = AsyncClient()
+        self.assertEqual((await client.get("/api/async/projects/events/")).status_code, 401)
+        token = self.headers["member@example.com"]["Authorization"].split()[1]
+        response = await client.get("/api/async/projects/events/", {"token": token})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b"retry: 5000\n\n")
+        await stream.aclose()
+
+
+class SQLiteProductionTests(SimpleTestCase):
+    """DJANGO_SQLITE_PRODUCTION: the settings it produces, applied to a real file"""
+
+    def production_database(self, **env):
+        path = settings.BASE_DIR / "config" / "settings.py"
+        with mock.patch.dict(os.environ, {"DJANGO_SQLITE_PRODUCTION": "True", **env}):
+            database = runpy.run_path(str(path))["DATABASES"]["default"]
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return {**database, "NAME": os.path.join(directory.name, "production.sqlite3")}
+
+    def test_pragmas_and_immediate_transactions(self):
+        database = self.production_database()
+        # Not the test database connection: only "production" is opened
+        handler = ConnectionHandler({"default": database, "production": database})
+        self.addCleanup(handler.close_all)
+        connection = handler["production"]
+        with connection.cursor() as cursor:
+            pragmas = {
+                name: cursor.execute(f"PRAGMA {name}").fetchone()[0]
+                for name in ("journal_mode", "synchronous", "busy_timeout", "temp_store")
+            }
+        # synchronous NORMAL = 1, temp_store MEMORY = 2
+        self.assertEqual(pragmas, {
+            "journal_mode": "wal", "synchronous": 1, "busy_timeout": 5000, "temp_store": 2,
+        })
+        self.assertEqual(connection.transaction_mode, "IMMEDIATE")
+        self.assertEqual(connection.settings_dict["CONN_MAX_AGE"], 600)
+
+    def test_no_persistent_connections_under_asgi(self):
+        self.assertEqual(self.production_database(DJANGO_ASGI="True")["CONN_MAX_AGE"], 0)
@@ -0,0 +1,134 @@
+"""
+Two-tier cache: a local LRU (per process) in front of an optional shared
+Django cache (settings naming a CACHES alias), as used by
+users.authentication.UserCache and projects.access.ProjectAccessCache.
+
+Subclasses read with get_many(), fill misses from the database with
+set_many(), passing back the state get_many() returned, and invalidate
+with delete_on_commit() from their model signals. The guards:
+
+- invalidation runs after commit, so a miss cannot refill values the
+  write is about to replace;
+- a miss that read the database before an invalidation and stores after
+  it is not cached: a write counter guards the local tier, per-key
+  generations the shared one (for invalidations from any process);
+- invalidations reach only this process's local tier and the shared
+  tier, so with a shared tier local entries are kept for at most
+  shared_local_ttl seconds.
+"""
+import threading
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
+
+from config.lru import LRUCache
+
+
+class TieredCache:
+
+    def __init__(self, ttl, max_entries, shared_alias=None, shared_ttl=None, shared_local_ttl=None):
+        if shared_alias and shared_local_ttl is not None:
+            # Other processes' invalidations only reach the shared tier
+            ttl = min(ttl, shared_local_ttl)
+        self.local = LRUCache(max_entries=max_entries, ttl=ttl)
+        self.shared_alias = shared_alias
+        self.shared_ttl = shared_ttl or ttl
+        # Bumped by each invalidation in this process; a fill that raced
+        # with one is served but not cached locally
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias] if self.shared_alias else None
+
+    @staticmethod
+    def _generation_key(key):
+        return f"{key}:generation"
+
+    # ---------- tiers ----------
+    #
+    # Shared entries are stored as (generation, value). Invalidation sets
+    # a new generation for the key; a fill stores the generation it saw
+    # before reading the database, so a fill that raced with an
+    # invalidation (in any process) is ignored instead of served.
+
+    def _local_hits(self, keys):
+        writes = self._writes
+        return {key: self.local.get(key) for key in keys}, writes
+
+    def _from_shared(self, values, found, generations):
+        for key, value in values.items():
+            if value is not None:
+                continue
+            generation = generations[key] = found.get(self._generation_key(key))
+            entry = found.get(key)
+            if entry is not None and entry[0] == generation:
+                values[key] = entry[1]
+
+    def _shared_keys(self, values):
+        missing = [key for key, value in values.items() if value is None]
+        return missing + [self._generation_key(key) for key in missing]
+
+    def get_many(self, keys):
+        """({key: value or None}, fill state for set_many())"""
+        values, writes = self._local_hits(keys)
+        generations = {}
+        if self.shared is not None and None in values.values():
+            self._from_shared(values, self.shared.get_many(self._shared_keys(values)), generations)
+            self._set_local(values, generations, writes)
+        return values, (writes, generations)
+
+    async def aget_many(self, keys):
+        values, writes = self._local_hits(keys)
+        generations = {}
+        if self.shared is not None and None in values.values():
+            found = await self.shared.aget_many(self._shared_keys(values))
+            self._from_shared(values, found, generations)
+            self._set_local(values, generations, writes)
+        return values, (writes, generations)
+
+    def _set_local(self, entries, keys, writes):
+        with self._lock:
+            if writes == self._writes:
+                for key in keys:
+                    if entries.get(key) is not None:
+                        self.local.set(key, entries[key])
+
+    def _shared_entries(self, entries, generations):
+        # Only what was missing from the shared tier, with the generation
+        # seen before the database read
+        return {
+            key: (generations[key], value)
+            for key, value in entries.items()
+            if key in generations
+        }
+
+    def set_many(self, entries, state):
+        writes, generations = state
+        self._set_local(entries, entries, writes)
+        if self.shared is not None:
+            self.shared.set_many(self._shared_entries(entries, generations), self.shared_ttl)
+
+    async def aset_many(self, entries, state):
+        writes, generations = state
+        self._set_local(entries, entries, writes)
+        if self.shared is not None:
+            await self.shared.aset_many(self._shared_entries(entries, generations), self.shared_ttl)
+
+    def delete_many(self, keys):
+        with self._lock:
+            self._writes += 1
+            for key in keys:
+                self.local.delete(key)
+        if self.shared is not None:
+            generation = uuid.uuid4().hex
+            self.shared.set_many(
+                {self._generation_key(key): generation for key in keys}, self.shared_ttl,
+            )
+            self.shared.delete_many(keys)
+
+    def delete_on_commit(self, keys, using=None):
+        # After commit, so a concurrent miss cannot refill the old values
+        transaction.on_commit(lambda: self.delete_many(keys), using=using)
@@ -1,8 +1,13 @@
 from django.contrib import admin
 from django.urls import path, include
 
+from config.batch import batch_view
+from config.views import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
     path("api/auth/", include("users.urls")),
     path("api/projects/", include("projects.urls")),
+    path("api/metrics/", metrics_view),
+    path("api/batch/", batch_view),
 ]
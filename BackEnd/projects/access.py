@@ -0,0 +1,149 @@
+"""
+Per-user project access cache.
+
+Answers "what is this user's role on this project" (and the few project
+columns the overview shows) from memory. Two kinds of entries, each in a
+local LRU (per process) and optionally a shared Django cache:
+
+- project:<id>              name, public_code, created_at, root_admin_id
+- project-role:<id>:<user>  the user's ProjectMember role, "" for none
+
+The owner's role comes from root_admin_id, so ownership changes only need
+the project entry dropped. Entries are invalidated after commit by
+projects.signals: project saves / deletes drop the project entry,
+members_changed drops the affected (project, user) roles. Fills that
+raced an invalidation are not cached, and with a shared tier other
+processes' local entries are kept for at most SHARED_LOCAL_TTL seconds
+(config.tiered).
+
+Misses are filled with overview_queryset(), which reads the project's
+shard directly (never a replica). Write endpoints keep authorizing against
+the database.
+"""
+from django.conf import settings
+
+from config import metrics
+from config.tiered import TieredCache
+from .listings import overview_queryset
+
+_NO_ROLE = ""
+
+SUMMARY_FIELDS = ("id", "name", "public_code", "created_at", "root_admin_id")
+
+
+class ProjectAccessCache(TieredCache):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def project_key(project_id):
+        return f"project:{project_id}"
+
+    @staticmethod
+    def role_key(project_id, user_id):
+        return f"project-role:{project_id}:{user_id}"
+
+    # ---------- lookups ----------
+
+    def _from_cache(self, summary, role, user):
+        """(summary, role) if the cached entries answer for `user`, else None"""
+        if summary is None:
+            return None
+        if summary["root_admin_id"] == user.pk:
+            return summary, "root_admin"
+        if role is None:
+            return None
+        return summary, role or None
+
+    @staticmethod
+    def _entries(project, user):
+        summary = {field: getattr(project, field) for field in SUMMARY_FIELDS}
+        entries = {ProjectAccessCache.project_key(project.pk): summary}
+        if project.root_admin_id != user.pk:
+            entries[ProjectAccessCache.role_key(project.pk, user.pk)] = project.role or _NO_ROLE
+        return summary, entries
+
+    def _keys(self, user, project_id):
+        return self.project_key(project_id), self.role_key(project_id, user.pk)
+
+    def resolve(self, user, project_id):
+        """
+        (summary, role) for `user` on the project; role is None without
+        access. (None, None) when the project does not exist.
+        """
+        keys = self._keys(user, project_id)
+        values, state = self.get_many(keys)
+        cached = self._from_cache(*(values[key] for key in keys), user)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        project = overview_queryset(user, project_id).first()
+        if project is None:
+            return None, None
+        summary, entries = self._entries(project, user)
+        self.set_many(entries, state)
+        return summary, project.role
+
+    async def aresolve(self, user, project_id):
+        keys = self._keys(user, project_id)
+        values, state = await self.aget_many(keys)
+        cached = self._from_cache(*(values[key] for key in keys), user)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        project = await overview_queryset(user, project_id).afirst()
+        if project is None:
+            return None, None
+        summary, entries = self._entries(project, user)
+        await self.aset_many(entries, state)
+        return summary, project.role
+
+    def role_for(self, user, project_id):
+        return self.resolve(user, project_id)[1]
+
+    async def arole_for(self, user, project_id):
+        return (await self.aresolve(user, project_id))[1]
+
+    # ---------- invalidation ----------
+
+    def invalidate_project(self, project):
+        self.delete_on_commit([self.project_key(project.pk)], project._state.db)
+
+    def invalidate_memberships(self, memberships):
+        by_db = {}
+        for m in memberships:
+            by_db.setdefault(m._state.db, []).append(self.role_key(m.project_id, m.user_id))
+        for using, keys in by_db.items():
+            self.delete_on_commit(keys, using)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            **self.local.stats(),
+            "lookups": lookups,
+            "resolved_from_cache": self.hits,
+            "resolved_from_db": self.misses,
+            "access_hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
+
+
+def _build_access_cache():
+    config = settings.PROJECT_ACCESS_CACHE
+    return ProjectAccessCache(
+        ttl=config["TTL"],
+        max_entries=config["MAX_ENTRIES"],
+        shared_alias=config.get("SHARED_CACHE"),
+        shared_ttl=config.get("SHARED_TTL"),
+        shared_local_ttl=config.get("SHARED_LOCAL_TTL"),
+    )
+
+
+project_access = _build_access_cache()
+metrics.register("project_access_cache", project_access.stats)
@@ -0,0 +1,144 @@
+"""
+Native async versions of the project read endpoints.
+
+Same queries, paginators and payloads as projects.views (via
+projects.listings), but executed with the async ORM and async JWT
+authentication, so under ASGI they don't each occupy a thread through
+sync_to_async. projects.urls routes to these when ASYNC_PROJECT_VIEWS is
+on (config/asgi.py turns it on by default).
+"""
+from functools import partial
+
+from django.http import StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+
+from config.asyncapi import async_api_view
+from config.db_router import replica_reads
+from config.renderers import JSONResponse
+from users.authentication import QueryTokenJWTAuthentication
+
+from .access import project_access
+from .autocomplete import autocomplete_index, result_limit
+from .changes import achanges_since
+from .events import event_stream
+from .versions import conditional_on_versions, overview_keys, user_lists_keys
+from .search import search_projects_queryset
+from .listings import (
+    OWNED_PAGINATOR, JOINED_PAGINATOR, FEED_PAGINATOR, SEARCH_PAGINATOR,
+    owned_queryset, joined_queryset, feed_queryset,
+    aload_feed_projects, serialize_projects, serialize_feed,
+    serialize_search_results, serialize_overview,
+    SEARCH_RESULT_FIELDS, requested_fields,
+)
+
+
+@replica_reads
+@async_api_view(["GET"], authenticated=True)
+@conditional_on_versions(user_lists_keys)
+async def owned_projects(request):
+    fields = requested_fields(request.GET)
+    return JSONResponse(await OWNED_PAGINATOR.aget_paginated_data(
+        owned_queryset(request.user, fields), request.GET,
+        partial(serialize_projects, fields=fields),
+    ))
+
+
+@replica_reads
+@async_api_view(["GET"], authenticated=True)
+@conditional_on_versions(user_lists_keys)
+async def joined_projects(request):
+    fields = requested_fields(request.GET)
+    return JSONResponse(await JOINED_PAGINATOR.aget_paginated_data(
+        joined_queryset(request.user, fields), request.GET,
+        partial(serialize_projects, fields=fields),
+    ))
+
+
+@replica_reads
+@async_api_view(["GET"], authenticated=True)
+@conditional_on_versions(user_lists_keys)
+async def all_projects(request):
+    fields = requested_fields(request.GET)
+    return JSONResponse(await FEED_PAGINATOR.aget_paginated_data(
+        feed_queryset(request.user, fields), request.GET,
+        partial(serialize_feed, fields=fields),
+        load=partial(aload_feed_projects, fields=fields),
+    ))
+
+
+@replica_reads
+@async_api_view(["GET"], authenticated=True)
+async def project_changes(request):
+    return JSONResponse(await achanges_since(request.user, request.GET.get("since")))
+
+
+@replica_reads
+@async_api_view(["GET"], authenticated=True)
+@conditional_on_versions(overview_keys)
+async def project_overview(request, project_id):
+    fields = requested_fields(request.GET)
+    summary, role = await project_access.aresolve(request.user, project_id)
+
+    if summary is None:
+        return JSONResponse({"detail": "No Project matches the given query."}, status=404)
+
+    if role is None:
+        return JSONResponse({"detail": "Access denied"}, status=403)
+
+    return JSONResponse(serialize_overview(summary, role, fields))
+
+
+@replica_reads
+@async_api_view(["GET"], authenticated=True)
+async def search_projects(request):
+    q = request.GET.get("q", "").strip()
+
+    if not q:
+        return JSONResponse({"results": []})
+
+    fields = requested_fields(request.GET, default=SEARCH_RESULT_FIELDS)
+    return JSONResponse(await SEARCH_PAGINATOR.aget_paginated_data(
+        search_projects_queryset(request.user, q, fields), request.GET,
+        partial(serialize_search_results, fields=fields),
+    ))
+
+
+@async_api_view(["GET"], authenticated=True)
+async def autocomplete_projects(request):
+    q = request.GET.get("q", "").strip()
+
+    if not q:
+        return JSONResponse({"results": []})
+
+    rows = await autocomplete_index.asearch(request.user, q, result_limit(request.GET))
+    return JSONResponse({"results": serialize_search_results(rows)})
+
+
+_stream_authentication = QueryTokenJWTAuthentication()
+
+
+async def _token_still_valid(token):
+    try:
+        await _stream_authentication.arecheck(token)
+    except AuthenticationFailed:
+        return False
+    return True
+
+
+@async_api_view(["GET"], authenticated=True, authentication=QueryTokenJWTAuthentication)
+async def project_events(request):
+    """
+    Server-sent events stream of the caller's project and membership
+    events (projects.events). The access token may be passed as ?token=
+    since EventSource cannot send headers; the stream ends when it
+    expires, is revoked or its user is deactivated (checked at every
+    heartbeat), and the client reconnects with a fresh one.
+    """
+    response = StreamingHttpResponse(
+        event_stream(request.user.pk, request.auth["exp"], partial(_token_still_valid, request.auth)),
+        content_type="text/event-stream",
+    )
+    response["Cache-Control"] = "no-cache"
+    # Stop nginx from buffering the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
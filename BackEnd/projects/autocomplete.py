@@ -0,0 +1,234 @@
+"""
+Per-process prefix index behind /api/projects/autocomplete/.
+
+Search-as-you-type fires on every keystroke; /api/projects/search/ runs a
+full ranked query (FTS / icontains plus role lookups) each time. Here the
+caller's accessible projects are loaded once into a sorted array of terms
+and each keystroke is a bisect:
+
+- the casefolded name and public_code           ("ali" -> "Alpha app")
+- every later word of the name                   ("app" -> "Alpha app")
+
+Ranking follows search_projects_queryset: exact name, then name / code
+prefix, then word prefix, newest first within each bucket.
+
+Indexes are per user, in an LRU of at most MAX_USERS users (cold users are
+evicted and reloaded on their next keystroke) and expire after TTL.
+projects.signals keeps loaded indexes current after commit: renames,
+deletions and role changes are applied in place; changes the signal cannot
+apply locally (a new membership, an ownership transfer) drop the user's
+index. Writes handled by other processes are only bounded by TTL, as with
+the other local caches.
+"""
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import transaction
+
+from config import metrics
+from config.lru import LRUCache
+from .listings import SEARCH_RESULT_FIELDS
+from .models import Project
+
+DEFAULT_RESULTS = 10
+MAX_RESULTS = 20
+
+_NAME, _CODE, _WORD = range(3)
+
+
+def result_limit(params):
+    try:
+        limit = int(params.get("limit", DEFAULT_RESULTS))
+    except (TypeError, ValueError):
+        return DEFAULT_RESULTS
+    return max(1, min(limit, MAX_RESULTS))
+
+
+def _terms(row):
+    name = row["name"].casefold()
+    yield name, _NAME
+    yield row["public_code"].casefold(), _CODE
+    words = name.split()
+    for i in range(1, len(words)):
+        yield " ".join(words[i:]), _WORD
+
+
+class PrefixIndex:
+    """Immutable sorted-array index over one user's projects"""
+
+    def __init__(self, rows):
+        # {project_id: {"id", "name", "public_code", "role", "is_owner"}}
+        self.rows = rows
+        self._terms = sorted(
+            (term, kind, project_id)
+            for project_id, row in rows.items()
+            for term, kind in _terms(row)
+        )
+
+    def search(self, q, limit):
+        q = q.casefold()
+        ranks = {}
+        terms = self._terms
+        i = bisect_left(terms, (q,))
+        while i < len(terms) and terms[i][0].startswith(q):
+            term, kind, project_id = terms[i]
+            if kind == _NAME and term == q:
+                rank = 0
+            else:
+                rank = 1 if kind != _WORD else 2
+            ranks[project_id] = min(rank, ranks.get(project_id, rank))
+            i += 1
+
+        # UUIDv7 ids: newest first, then (stable) by rank
+        matches = sorted(ranks, reverse=True)
+        matches.sort(key=ranks.__getitem__)
+        return [self.rows[project_id] for project_id in matches[:limit]]
+
+    def replace(self, upserted=(), removed=()):
+        rows = dict(self.rows)
+        for row in upserted:
+            rows[row["id"]] = row
+        for project_id in removed:
+            rows.pop(project_id, None)
+        return PrefixIndex(rows)
+
+
+def _queryset(user):
+    return (
+        Project.objects
+        .accessible_to(user)
+        .with_access_for(user)
+        .values(*SEARCH_RESULT_FIELDS)
+        .per_shard()
+    )
+
+
+class AutocompleteIndex:
+
+    def __init__(self, ttl, max_users):
+        self.local = LRUCache(max_entries=max_users, ttl=ttl)
+        # Serializes updates; bumped by each one so a load that raced with
+        # an update is served but not cached
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.loads = 0
+
+    @staticmethod
+    def _key(user_id):
+        return f"autocomplete:{user_id}"
+
+    def _cache(self, user_id, rows, writes):
+        index = PrefixIndex({row["id"]: row for row in rows})
+        with self._lock:
+            self.loads += 1
+            if writes == self._writes:
+                self.local.set(self._key(user_id), index)
+        return index
+
+    def for_user(self, user):
+        index = self.local.get(self._key(user.pk))
+        if index is None:
+            writes = self._writes
+            rows = [row for qs in _queryset(user) for row in qs]
+            index = self._cache(user.pk, rows, writes)
+        return index
+
+    async def afor_user(self, user):
+        index = self.local.get(self._key(user.pk))
+        if index is None:
+            writes = self._writes
+            rows = [row for qs in _queryset(user) async for row in qs]
+            index = self._cache(user.pk, rows, writes)
+        return index
+
+    def search(self, user, q, limit):
+        return self.for_user(user).search(q, limit)
+
+    async def asearch(self, user, q, limit):
+        return (await self.afor_user(user)).search(q, limit)
+
+    # ---------- updates (projects.signals) ----------
+
+    def _update(self, user_ids, apply):
+        """apply(index, user_id) -> new index, or None to drop it"""
+        with self._lock:
+            self._writes += 1
+            for user_id in user_ids:
+                key = self._key(user_id)
+                index = self.local.peek(key)
+                if index is None:
+                    continue
+                index = apply(index, user_id)
+                if index is None:
+                    self.local.delete(key)
+                else:
+                    self.local.set(key, index)
+
+    def project_changed_on_commit(self, project, user_ids, deleted):
+        """Rename / deletion / ownership change of `project`, seen by `user_ids`"""
+        def apply(index, user_id):
+            if deleted:
+                return index.replace(removed=[project.pk])
+            current = index.rows.get(project.pk)
+            if user_id == project.root_admin_id:
+                role = "root_admin"
+            elif current is not None and current["role"] != "root_admin":
+                role = current["role"]
+            else:
+                # Joined or lost ownership: role unknown here, reload
+                return None
+            return index.replace(upserted=[{
+                "id": project.pk,
+                "name": project.name,
+                "public_code": project.public_code,
+                "role": role,
+                "is_owner": role == "root_admin",
+            }])
+
+        user_ids = set(user_ids)
+        transaction.on_commit(
+            lambda: self._update(user_ids, apply), using=project._state.db,
+        )
+
+    def memberships_changed_on_commit(self, upserted, removed):
+        changes = {}
+        for m in upserted:
+            changes.setdefault((m._state.db, m.user_id), {})[m.project_id] = m.role
+        for m in removed:
+            changes.setdefault((m._state.db, m.user_id), {})[m.project_id] = None
+
+        def apply_for(roles):
+            def apply(index, user_id):
+                rows = []
+                for project_id, role in roles.items():
+                    current = index.rows.get(project_id)
+                    if role is not None and current is None:
+                        # New project for this user: name unknown here, reload
+                        return None
+                    if current is not None and not current["is_owner"]:
+                        rows.append({**current, "role": role})
+                return index.replace(
+                    upserted=[row for row in rows if row["role"] is not None],
+                    removed=[row["id"] for row in rows if row["role"] is None],
+                )
+            return apply
+
+        for (using, user_id), roles in changes.items():
+            apply = apply_for(roles)
+            transaction.on_commit(
+                lambda user_id=user_id, apply=apply: self._update([user_id], apply),
+                using=using,
+            )
+
+    def stats(self):
+        return {**self.local.stats(), "loads": self.loads}
+
+
+def _build_index():
+    config = settings.PROJECT_AUTOCOMPLETE
+    return AutocompleteIndex(ttl=config["TTL"], max_users=config["MAX_USERS"])
+
+
+autocomplete_index = _build_index()
+metrics.register("project_autocomplete", autocomplete_index.stats)
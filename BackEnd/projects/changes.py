@@ -0,0 +1,158 @@
+"""
+Delta sync of a user's project list (/api/projects/changes/).
+
+projects.signals appends a ProjectChange row for every user affected by a
+Project or ProjectMember write, after commit. A client that has loaded its
+lists keeps the returned `since` token and asks for what changed after it:
+
+    {"upserted": [feed rows], "deleted": [project ids],
+     "since": "<token>", "has_more": false}
+
+Only the changed projects are read back, through the user's feed rows
+(projects.feed): a changed project with a feed row is an upsert, one
+without (removed, deleted, or only invited) is a tombstone. Without
+`since` the response only carries the current token.
+
+Tokens are signed positions in the log. They expire after
+PROJECT_CHANGES_RETENTION_DAYS, the age past which log rows are purged;
+an expired token gets a 410 and the client reloads its lists.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotFound
+
+from config.db_router import PRIMARY, pin_to_primary
+
+from .listings import (
+    aload_feed_projects, feed_queryset, load_feed_projects, serialize_feed,
+)
+from .models import ProjectChange
+
+MAX_CHANGES = 500
+
+_SALT = "projects.changes"
+
+
+class ResyncRequired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = "Change token expired. Reload the project lists."
+    default_code = "resync_required"
+
+
+def _retention():
+    return timedelta(days=settings.PROJECT_CHANGES_RETENTION_DAYS)
+
+
+def record_on_commit(pairs, using=None):
+    """Log (user_id, project_id) changes once the surrounding write commits"""
+    pairs = set(pairs)
+    if not pairs:
+        return
+    transaction.on_commit(
+        lambda: ProjectChange.objects.bulk_create(
+            [ProjectChange(user_id=u, project_id=p) for u, p in pairs]
+        ),
+        using=using,
+    )
+
+
+def _encode(position):
+    return signing.dumps(position, salt=_SALT)
+
+
+def _decode(token):
+    try:
+        return int(signing.loads(token, salt=_SALT, max_age=_retention()))
+    except signing.SignatureExpired:
+        raise ResyncRequired()
+    except (signing.BadSignature, TypeError, ValueError):
+        raise NotFound("Invalid change token")
+
+
+def _changes_after(user, position):
+    return (
+        ProjectChange.objects
+        .filter(user=user, id__gt=position)
+        .order_by("id")
+        .values_list("id", "project_id")[:MAX_CHANGES + 1]
+    )
+
+
+def _result(changes, rows, position):
+    has_more = len(changes) > MAX_CHANGES
+    changes = changes[:MAX_CHANGES]
+    if changes:
+        position = changes[-1][0]
+
+    upserted = {row.project_id for row in rows}
+    deleted = {project_id for _, project_id in changes} - upserted
+    return {
+        "upserted": serialize_feed(rows),
+        "deleted": sorted(str(project_id) for project_id in deleted),
+        "since": _encode(position),
+        "has_more": has_more,
+    }
+
+
+def _feed_rows(user, changes):
+    project_ids = {project_id for _, project_id in changes[:MAX_CHANGES]}
+    return feed_queryset(user).filter(project_id__in=project_ids).order_by("-sort_at")
+
+
+def _last_position():
+    return ProjectChange.objects.using(PRIMARY).aggregate(last=Max("id"))["last"] or 0
+
+
+async def _alast_position():
+    last = await ProjectChange.objects.using(PRIMARY).aaggregate(last=Max("id"))
+    return last["last"] or 0
+
+
+def current_token():
+    """Token for the current end of the log; read it before the lists"""
+    return _encode(_last_position())
+
+
+async def acurrent_token():
+    return _encode(await _alast_position())
+
+
+def changes_since(user, token):
+    if not token:
+        pin_to_primary()
+        return _result([], [], _last_position())
+
+    position = _decode(token)
+    changes = list(_changes_after(user, position))
+    rows = load_feed_projects(list(_feed_rows(user, changes))) if changes else []
+    return _result(changes, rows, position)
+
+
+async def achanges_since(user, token):
+    if not token:
+        pin_to_primary()
+        return _result([], [], await _alast_position())
+
+    position = _decode(token)
+    changes = [change async for change in _changes_after(user, position)]
+    rows = []
+    if changes:
+        rows = await aload_feed_projects([row async for row in _feed_rows(user, changes)])
+    return _result(changes, rows, position)
+
+
+def purge():
+    """Delete log rows older than the retention; returns how many"""
+    cutoff = timezone.now() - _retention()
+    deleted, _ = (
+        ProjectChange.objects
+        .filter(changed_at__lt=cutoff, id__lt=_last_position())
+        .delete()
+    )
+    return deleted
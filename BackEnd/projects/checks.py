@@ -0,0 +1,66 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+# Backends whose data is private to one process
+PER_PROCESS_CACHES = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+@register(Tags.security, Tags.caches, deploy=True)
+def check_join_cache(app_configs, **kwargs):
+    """The join attempt counters (projects.joining) must be shared by all workers"""
+    alias = settings.PROJECT_JOIN["CACHE"]
+    backend = settings.CACHES.get(alias, {}).get("BACKEND")
+    if backend in PER_PROCESS_CACHES:
+        return [Error(
+            f"PROJECT_JOIN['CACHE'] ({alias!r}) uses {backend}, which each "
+            "process keeps to itself, so every worker allows the full "
+            "number of PIN attempts.",
+            hint=(
+                "Point PROJECT_JOIN_CACHE at a cache shared by all workers, "
+                "e.g. set SHARED_CACHE_URL and PROJECT_JOIN_CACHE=shared."
+            ),
+            id="projects.E001",
+        )]
+    return []
+
+
+@register(Tags.database, Tags.caches, deploy=True)
+def check_replica_pin_cache(app_configs, **kwargs):
+    """The replica pins (config.db_router) must be seen by every worker"""
+    if not settings.DB_REPLICAS:
+        return []
+    alias = settings.REPLICA_PIN_CACHE
+    backend = settings.CACHES.get(alias, {}).get("BACKEND")
+    if backend in PER_PROCESS_CACHES:
+        return [Error(
+            f"REPLICA_PIN_CACHE ({alias!r}) uses {backend}, which each "
+            "process keeps to itself, so a request served by another worker "
+            "right after a write may read a replica that has not caught up.",
+            hint=(
+                "Point DJANGO_REPLICA_PIN_CACHE at a cache shared by all "
+                "workers, e.g. set SHARED_CACHE_URL and "
+                "DJANGO_REPLICA_PIN_CACHE=shared."
+            ),
+            id="projects.E002",
+        )]
+    return []
+
+
+@register(Tags.security, deploy=True)
+def check_client_ip(app_configs, **kwargs):
+    """The join limits (projects.joining) key on client_ip()"""
+    if settings.CLIENT_IP["PROXY_COUNT"] is None:
+        return [Error(
+            "CLIENT_IP_PROXY_COUNT is not set. Behind a reverse proxy, the "
+            "default of 0 gives every client the proxy's address, so all "
+            "of them share one set of join attempt limits.",
+            hint=(
+                "Set CLIENT_IP_PROXY_COUNT to the number of reverse proxies "
+                "in front of the app, or to 0 when clients connect directly."
+            ),
+            id="projects.E003",
+        )]
+    return []
@@ -0,0 +1,157 @@
+"""
+Per-user push of project and membership events.
+
+projects.signals publishes, after commit, one event per affected user:
+
+    {"type": "project", "project_id": "...", "deleted": false}
+    {"type": "membership", "project_id": "...", "role": "user" | null}
+
+and the server-sent events stream at /api/projects/events/
+(projects.async_views.project_events, ASGI only) delivers them to the
+user's open connections. An event only says *what* changed; clients fetch
+the data through /api/projects/changes/. A "resync" event means events
+were dropped (the connection fell behind) and the client should do the
+same without relying on the stream.
+
+The broker is pluggable (settings.PROJECT_EVENTS["BROKER"]). The default
+InProcessBroker only reaches connections served by the publishing
+process; a multi-process deployment plugs in a Broker backed by a shared
+pub/sub (e.g. Redis) implementing the same two methods.
+"""
+import asyncio
+import json
+from abc import ABC, abstractmethod
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from config import metrics
+
+RESYNC = {"type": "resync"}
+
+
+class Broker(ABC):
+    """
+    publish() is called from any thread (request threads, the event loop
+    through sync_to_async); subscribe() from the event loop serving the
+    stream, as an async context manager yielding an object with an
+    awaitable get() returning the next event.
+    """
+
+    @abstractmethod
+    def publish(self, user_ids, event):
+        ...
+
+    @abstractmethod
+    def subscribe(self, user_id):
+        ...
+
+    def stats(self):
+        return {}
+
+
+class InProcessBroker(Broker):
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def publish(self, user_ids, event):
+        with self._lock:
+            self.published += 1
+            targets = [
+                subscriber
+                for user_id in set(user_ids)
+                for subscriber in self._subscribers.get(user_id, ())
+            ]
+        for loop, queue in targets:
+            try:
+                loop.call_soon_threadsafe(self._offer, queue, event)
+            except RuntimeError:
+                # Loop closed; its subscription is going away
+                pass
+
+    def _offer(self, queue, event):
+        try:
+            queue.put_nowait(event)
+            self.delivered += 1
+        except asyncio.QueueFull:
+            # Slow reader: drop its backlog, tell it to resync
+            self.dropped += queue.qsize()
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(RESYNC)
+
+    @asynccontextmanager
+    async def subscribe(self, user_id):
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(self.queue_size))
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+        try:
+            yield subscriber[1]
+        finally:
+            with self._lock:
+                subscribers = self._subscribers.get(user_id)
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def stats(self):
+        with self._lock:
+            connections = sum(len(s) for s in self._subscribers.values())
+            users = len(self._subscribers)
+        return {
+            "users": users,
+            "connections": connections,
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
+
+
+def publish_on_commit(user_ids, event, using=None):
+    user_ids = set(user_ids)
+    if user_ids:
+        transaction.on_commit(lambda: broker.publish(user_ids, event), using=using)
+
+
+async def event_stream(user_id, expires_at, still_authorized=None):
+    """
+    SSE body for one connection: the user's events, a comment line every
+    HEARTBEAT seconds so proxies keep the idle stream open, and the end of
+    the stream at `expires_at` (the access token's exp). EventSource then
+    reconnects after `retry` ms.
+
+    `still_authorized`, an async callable, is awaited before each heartbeat;
+    the stream ends as soon as it returns False (token revoked, user
+    deactivated), and the reconnect is refused.
+    """
+    heartbeat = settings.PROJECT_EVENTS["HEARTBEAT"]
+    async with broker.subscribe(user_id) as subscription:
+        yield "retry: 5000\n\n"
+        while (remaining := expires_at - time.time()) > 0:
+            try:
+                event = await asyncio.wait_for(subscription.get(), min(heartbeat, remaining))
+            except asyncio.TimeoutError:
+                if still_authorized is not None and not await still_authorized():
+                    return
+                yield ": ping\n\n"
+                continue
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+def _build_broker():
+    config = settings.PROJECT_EVENTS
+    return import_string(config["BROKER"])(**config.get("OPTIONS", {}))
+
+
+broker = _build_broker()
+metrics.register("project_events", broker.stats)
@@ -0,0 +1,175 @@
+"""
+Maintenance of the denormalized UserProjectIndex feed.
+
+Every write path that changes ownership or membership ends up here
+through projects.signals: Project saves directly, memberships through
+the batch-shaped members_changed signal (which bulk write paths send
+themselves, since bulk_create/bulk_update skip post_save).
+"""
+from django.db.models import F
+
+from .models import Project, ProjectMember, UserProjectIndex
+from .sharding import group_by_shard
+
+INDEX_FIELDS = ["role", "is_owner", "sort_at"]
+
+
+def _owner_row(project):
+    return UserProjectIndex(
+        user_id=project.root_admin_id,
+        project_id=project.id,
+        role="root_admin",
+        is_owner=True,
+        sort_at=project.created_at,
+    )
+
+
+def _member_row(member):
+    return UserProjectIndex(
+        user_id=member.user_id,
+        project_id=member.project_id,
+        role=member.role,
+        is_owner=False,
+        sort_at=member.joined_at,
+    )
+
+
+def _upsert(rows):
+    if not rows:
+        return
+    UserProjectIndex.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=["user", "project"],
+        update_fields=INDEX_FIELDS,
+    )
+
+
+def index_project(project):
+    """Ensure the owner row exists and drop rows of a previous owner"""
+    stale_owner_rows = (
+        UserProjectIndex.objects
+        .filter(project_id=project.id, is_owner=True)
+        .exclude(user_id=project.root_admin_id)
+    )
+    stale_user_ids = list(stale_owner_rows.values_list("user_id", flat=True))
+
+    if stale_user_ids:
+        stale_owner_rows.delete()
+        # A previous owner may still hold a regular membership
+        index_memberships(
+            ProjectMember.objects.for_project(project.id).filter(
+                project_id=project.id,
+                user_id__in=stale_user_ids
+            )
+        )
+
+    _upsert([_owner_row(project)])
+
+
+def index_memberships(members):
+    """
+    Upsert feed rows for the given ProjectMember rows.
+    Members that are not active (invited) or that own the project are
+    removed from / never added to the feed as "joined".
+    """
+    members = list(members)
+    if not members:
+        return
+
+    owners = {}
+    for alias, project_ids in group_by_shard({m.project_id for m in members}).items():
+        owners.update(
+            Project.objects
+            .using(alias)
+            .filter(id__in=project_ids)
+            .values_list("id", "root_admin_id")
+        )
+
+    rows, inactive = [], []
+    for m in members:
+        if owners.get(m.project_id) == m.user_id:
+            continue
+        if m.role in ProjectMember.ACTIVE_ROLES:
+            rows.append(_member_row(m))
+        else:
+            inactive.append(m)
+
+    _upsert(rows)
+    unindex_memberships(inactive)
+
+
+def unindex_project(project):
+    """Remove every feed row of a deleted project"""
+    UserProjectIndex.objects.filter(project_id=project.id).delete()
+
+
+def unindex_memberships(members):
+    """Remove the "joined" feed rows for the given (deleted/invited) members"""
+    by_project = {}
+    for m in members:
+        by_project.setdefault(m.project_id, set()).add(m.user_id)
+
+    for project_id, user_ids in by_project.items():
+        UserProjectIndex.objects.filter(
+            project_id=project_id,
+            user_id__in=user_ids,
+            is_owner=False,
+        ).delete()
+
+
+def _upsert_in_batches(rows, batch_size, written):
+    """Upsert `rows`, adding their (user_id, project_id) to `written`"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            _upsert(batch)
+            written.update((r.user_id, r.project_id) for r in batch)
+            batch = []
+    _upsert(batch)
+    written.update((r.user_id, r.project_id) for r in batch)
+
+
+def _delete_unwritten(written, last_id, batch_size):
+    """Delete rows up to id `last_id` whose (user, project) is not in `written`"""
+    deleted = 0
+    after = 0
+    while True:
+        chunk = list(
+            UserProjectIndex.objects
+            .filter(id__gt=after, id__lte=last_id)
+            .order_by("id")
+            .values_list("id", "user_id", "project_id")[:batch_size]
+        )
+        if not chunk:
+            return deleted
+        stale = [pk for pk, user_id, project_id in chunk if (user_id, project_id) not in written]
+        if stale:
+            deleted += UserProjectIndex.objects.filter(id__in=stale).delete()[0]
+        after = chunk[-1][0]
+
+
+def backfill(batch_size=1000):
+    """
+    Rebuild the feed from every Project / ProjectMember on every shard:
+    upsert their rows, then delete the rows that were not rewritten (left
+    behind by deleted projects or by writes that skipped the signals).
+    Rows added while it runs are kept. Returns (rows written, rows deleted).
+    """
+    last_id = UserProjectIndex.objects.order_by("-id").values_list("id", flat=True).first() or 0
+    written = set()
+    for projects in Project.objects.only("id", "root_admin_id", "created_at").order_by("pk").per_shard():
+        rows = (_owner_row(p) for p in projects.iterator(chunk_size=batch_size))
+        _upsert_in_batches(rows, batch_size, written)
+
+    members = (
+        ProjectMember.objects
+        .filter(role__in=ProjectMember.ACTIVE_ROLES)
+        .exclude(user_id=F("project__root_admin_id"))
+        .order_by("pk")
+    )
+    for shard_members in members.per_shard():
+        rows = (_member_row(m) for m in shard_members.iterator(chunk_size=batch_size))
+        _upsert_in_batches(rows, batch_size, written)
+    return len(written), _delete_unwritten(written, last_id, batch_size)
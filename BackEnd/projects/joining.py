@@ -0,0 +1,181 @@
+"""
+Join a project with its public_code and PIN (/api/projects/join/).
+
+A PIN check is a full PBKDF2 run on the hashing pool, so guesses are
+shed before they get there:
+
+- attempt limits, in fixed WINDOW-second windows: PER_IP verifications
+  and unknown codes per client address (client_ip(), which trusts
+  X-Forwarded-For only as far as settings.CLIENT_IP says; projects.E003
+  asks for CLIENT_IP_PROXY_COUNT to be set explicitly in production), PER_CODE_IP per (project, address),
+  and PER_CODE failed ones per project from all addresses together. Over
+  a limit the request gets a 429 without hashing. Someone guessing
+  from one address therefore locks only themselves out of the code; the
+  project-wide ceiling is only reached by guesses spread over many
+  addresses, and correct PINs never count towards it.
+- verification cache: a successful (project, PIN) check is remembered for
+  VERIFIED_TTL seconds, so retries and double submits skip the hash. The
+  key is an HMAC of the project id, its current pin_hash and the PIN:
+  changing the PIN invalidates it, and the cache never holds anything a
+  PIN could be brute-forced from offline.
+
+Counters and the verification cache live in the PROJECT_JOIN["CACHE"]
+alias, which must be shared by all workers (e.g. Redis): a per-process
+cache multiplies every limit by the number of processes. The
+projects.E001 deploy check (manage.py check --deploy) reports one.
+
+Limits and the cache only gate hashing; the code lookup is one probe of
+the public_code index per shard.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.crypto import salted_hmac
+
+from config import metrics
+from .models import Project
+
+_SALT = "projects.joining"
+
+# Columns needed to verify and answer; the access key hash is never read
+_JOIN_COLUMNS = ("id", "name", "public_code", "created_at", "root_admin", "pin_hash")
+
+_stats = {"verified": 0, "rejected_pin": 0, "from_cache": 0, "limited": 0}
+
+
+class AttemptLimited(Exception):
+
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+
+
+def normalize_code(code):
+    return (code or "").strip().upper()
+
+
+def client_ip(request):
+    """
+    The client's address. Behind PROXY_COUNT trusted reverse proxies it is
+    the PROXY_COUNT-th address from the right of the HEADER they append
+    to; anything left of that was sent by the client and is ignored.
+    """
+    config = settings.CLIENT_IP
+    remote_addr = request.META.get("REMOTE_ADDR", "")
+    if not config["PROXY_COUNT"]:
+        return remote_addr
+    forwarded = [
+        address.strip()
+        for address in request.META.get(config["HEADER"], "").split(",")
+        if address.strip()
+    ]
+    if len(forwarded) < config["PROXY_COUNT"]:
+        # Not sent through all the proxies
+        return remote_addr
+    return forwarded[-config["PROXY_COUNT"]]
+
+
+def _cache():
+    return caches[settings.PROJECT_JOIN["CACHE"]]
+
+
+async def afind_project(public_code):
+    """The project with this public_code on any shard, or None"""
+    for qs in Project.objects.filter(public_code=public_code).only(*_JOIN_COLUMNS).per_shard():
+        project = await qs.afirst()
+        if project is not None:
+            return project
+    return None
+
+
+# ---------- attempt limits ----------
+
+def _attempts_key(scope, *values):
+    return f"join-attempts:{scope}:" + ":".join(values)
+
+
+async def _acount(key, window):
+    cache = _cache()
+    # add() starts the window; incr() never extends it
+    await cache.aadd(key, 0, window)
+    try:
+        return await cache.aincr(key)
+    except ValueError:
+        # Window expired in between
+        await cache.aadd(key, 1, window)
+        return 1
+
+
+def _limited(window):
+    _stats["limited"] += 1
+    return AttemptLimited(window)
+
+
+async def acount_attempt(address, public_code):
+    """
+    Count one verification against the address and the (code, address)
+    pair, and check the code's failures; raises AttemptLimited once any of
+    them is over its limit for the window
+    """
+    config = settings.PROJECT_JOIN
+    window = config["WINDOW"]
+    for key, limit in (
+        (_attempts_key("ip", address), config["PER_IP"]),
+        (_attempts_key("code-ip", public_code, address), config["PER_CODE_IP"]),
+    ):
+        if await _acount(key, window) > limit:
+            raise _limited(window)
+
+    failures = await _cache().aget(_attempts_key("code", public_code), 0)
+    if failures >= config["PER_CODE"]:
+        raise _limited(window)
+
+
+async def acount_unknown_code(address):
+    """
+    Count a lookup of a code that matches no project against the address,
+    so codes cannot be enumerated past PER_IP; raises AttemptLimited once
+    over it
+    """
+    config = settings.PROJECT_JOIN
+    if await _acount(_attempts_key("ip", address), config["WINDOW"]) > config["PER_IP"]:
+        raise _limited(config["WINDOW"])
+
+
+async def acount_failure(public_code):
+    """Count a wrong PIN against the project-wide limit"""
+    await _acount(_attempts_key("code", public_code), settings.PROJECT_JOIN["WINDOW"])
+
+
+# ---------- verification ----------
+
+def _verified_key(project, pin):
+    digest = salted_hmac(_SALT, f"{project.pk}:{project.pin_hash}:{pin}").hexdigest()
+    return f"join-verified:{digest}"
+
+
+async def averify_pin(project, pin, address):
+    """
+    True when `pin` is the project's PIN. Cached successes skip the
+    limits and the hash; everything else is counted first.
+    """
+    cache = _cache()
+    key = _verified_key(project, pin)
+    if await cache.aget(key):
+        _stats["from_cache"] += 1
+        return True
+
+    await acount_attempt(address, project.public_code)
+    if not await project.acheck_pin(pin):
+        _stats["rejected_pin"] += 1
+        await acount_failure(project.public_code)
+        return False
+
+    _stats["verified"] += 1
+    await cache.aset(key, True, settings.PROJECT_JOIN["VERIFIED_TTL"])
+    return True
+
+
+def stats():
+    return dict(_stats)
+
+
+metrics.register("project_join", stats)
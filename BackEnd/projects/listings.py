@@ -0,0 +1,225 @@
+"""
+Query builders, paginators and serializers for the project read endpoints.
+
+Shared by the sync DRF views (projects.views) and their native async
+counterparts (projects.async_views) so both paths return identical payloads.
+Project listings run on every shard (projects.sharding) and are merged by
+the paginator; the feed is read from "default" and its projects loaded
+per shard.
+"""
+from django.db.models import F
+from django.http import QueryDict
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from .models import Project, ProjectMember, UserProjectIndex
+from .pagination import KeysetPaginator
+from .sharding import group_by_shard, is_sharded
+
+# Keyset paginators; every ordering ends in a unique column and is backed
+# by a matching composite index (see Project / ProjectMember / UserProjectIndex Meta)
+# Project ids are UUIDv7, so the id alone orders projects by creation
+OWNED_PAGINATOR = KeysetPaginator(("-id",), salt="projects.owned")
+JOINED_PAGINATOR = KeysetPaginator(("-joined_at", "-member_project_id"), salt="projects.joined")
+FEED_PAGINATOR = KeysetPaginator(("-sort_at", "-project_id"), salt="projects.all")
+SEARCH_PAGINATOR = KeysetPaginator(("match_rank", "-id"), salt="projects.search")
+
+# Columns of a project list row. Lists are read with .values() and
+# serialized by hand (serialize_projects): no model instances, no DRF fields
+PROJECT_LIST_FIELDS = ("id", "name", "public_code", "created_at", "role", "is_owner")
+SEARCH_RESULT_FIELDS = ("id", "name", "public_code", "role", "is_owner")
+
+# Fields computed per user rather than stored on Project
+_ACCESS_FIELDS = {"role", "is_owner"}
+
+
+def requested_fields(params, default=PROJECT_LIST_FIELDS):
+    """
+    Sparse fieldset from ?fields=name,role: the named PROJECT_LIST_FIELDS
+    (always with id), in their usual order. Only these columns are
+    selected, so the secret hashes are never read.
+    """
+    raw = params.get("fields")
+    if not raw:
+        return default
+
+    names = {name.strip() for name in raw.split(",") if name.strip()}
+    unknown = names.difference(PROJECT_LIST_FIELDS)
+    if unknown:
+        raise ValidationError({"fields": [f"Unknown field(s): {', '.join(sorted(unknown))}"]})
+    names.add("id")
+    return tuple(f for f in PROJECT_LIST_FIELDS if f in names)
+
+
+def _project_columns(fields):
+    return [f for f in fields if f not in _ACCESS_FIELDS]
+
+
+def _with_access(qs, user, fields):
+    return qs.with_access_for(user) if _ACCESS_FIELDS.intersection(fields) else qs
+
+
+def owned_queryset(user, fields=PROJECT_LIST_FIELDS):
+    # The default fields are covered by projects_owned_cover_idx
+    qs = Project.objects.filter(root_admin=user)
+    return _with_access(qs, user, fields).values(*fields).per_shard()
+
+
+def joined_queryset(user, fields=PROJECT_LIST_FIELDS):
+    # role / is_owner are annotated in SQL, so a page costs one query
+    qs = (
+        Project.objects
+        .filter(
+            projectmember__user=user,
+            projectmember__role__in=ProjectMember.ACTIVE_ROLES
+        )
+        .annotate(
+            joined_at=F("projectmember__joined_at"),
+            member_project_id=F("projectmember__project_id"),
+        )
+    )
+    return (
+        _with_access(qs, user, fields)
+        .values(*fields, "joined_at", "member_project_id")
+        .per_shard()
+    )
+
+
+def feed_queryset(user, fields=PROJECT_LIST_FIELDS):
+    qs = UserProjectIndex.objects.filter(user=user)
+    if is_sharded():
+        # Projects on other shards cannot be joined in; see load_feed_projects
+        return qs
+    return qs.select_related("project").only(
+        "user", "project", "role", "is_owner", "sort_at",
+        *(f"project__{f}" for f in _project_columns(fields)),
+    )
+
+
+def _attach_projects(rows, projects):
+    rows = [row for row in rows if row.project_id in projects]
+    for row in rows:
+        row.project = projects[row.project_id]
+    return rows
+
+
+def load_feed_projects(rows, fields=PROJECT_LIST_FIELDS):
+    """Fetch a sharded feed page's projects, one query per shard touched"""
+    if not is_sharded():
+        return rows
+    projects = {}
+    for alias, ids in group_by_shard({row.project_id for row in rows}).items():
+        projects.update(
+            Project.objects.using(alias).only(*_project_columns(fields)).in_bulk(ids)
+        )
+    return _attach_projects(rows, projects)
+
+
+async def aload_feed_projects(rows, fields=PROJECT_LIST_FIELDS):
+    if not is_sharded():
+        return rows
+    projects = {}
+    for alias, ids in group_by_shard({row.project_id for row in rows}).items():
+        projects.update(
+            await Project.objects.using(alias).only(*_project_columns(fields)).ain_bulk(ids)
+        )
+    return _attach_projects(rows, projects)
+
+
+def first_pages(user):
+    """
+    First page of the owned and joined lists, exactly as the list
+    endpoints return it without parameters; the page's next_cursor
+    continues on those endpoints. Embedded in login / token refresh
+    responses (include=bootstrap).
+    """
+    params = QueryDict()
+    return {
+        "owned": OWNED_PAGINATOR.get_paginated_data(owned_queryset(user), params, serialize_projects),
+        "joined": JOINED_PAGINATOR.get_paginated_data(joined_queryset(user), params, serialize_projects),
+    }
+
+
+async def afirst_pages(user):
+    params = QueryDict()
+    return {
+        "owned": await OWNED_PAGINATOR.aget_paginated_data(
+            owned_queryset(user), params, serialize_projects,
+        ),
+        "joined": await JOINED_PAGINATOR.aget_paginated_data(
+            joined_queryset(user), params, serialize_projects,
+        ),
+    }
+
+
+def overview_queryset(user, project_id):
+    # The columns projects.access caches, never the secret hashes
+    return (
+        Project.objects
+        .for_project(project_id)
+        .only("id", "name", "public_code", "created_at", "root_admin")
+        .with_access_for(user)
+        .filter(id=project_id)
+    )
+
+
+def _datetime(value):
+    """Same output as DRF's DateTimeField: ISO 8601, "Z" for UTC"""
+    value = timezone.localtime(value).isoformat()
+    return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+
+_CONVERTERS = {"id": str, "created_at": _datetime}
+
+
+def serialize_projects(rows, fields=PROJECT_LIST_FIELDS):
+    """.values() rows, in ProjectListSerializer's shape restricted to `fields`"""
+    if fields == PROJECT_LIST_FIELDS:
+        # Common case, spelled out
+        return [
+            {
+                "id": str(row["id"]),
+                "name": row["name"],
+                "public_code": row["public_code"],
+                "created_at": _datetime(row["created_at"]),
+                "role": row["role"],
+                "is_owner": row["is_owner"],
+            }
+            for row in rows
+        ]
+    convert = [(f, _CONVERTERS.get(f)) for f in fields]
+    return [
+        {f: c(row[f]) if c else row[f] for f, c in convert}
+        for row in rows
+    ]
+
+
+def _feed_value(row, field):
+    if field == "id":
+        return str(row.project_id)
+    if field in _ACCESS_FIELDS:
+        return getattr(row, field)
+    value = getattr(row.project, field)
+    return _datetime(value) if field == "created_at" else value
+
+
+def serialize_feed(rows, fields=PROJECT_LIST_FIELDS):
+    """Feed rows (UserProjectIndex + its project) in the same shape"""
+    return [{f: _feed_value(row, f) for f in fields} for row in rows]
+
+
+def serialize_search_results(rows, fields=SEARCH_RESULT_FIELDS):
+    return serialize_projects(rows, fields)
+
+
+def serialize_overview(summary, role, fields=PROJECT_LIST_FIELDS):
+    """summary: the project columns cached by projects.access"""
+    data = {
+        "id": str(summary["id"]),
+        "name": summary["name"],
+        "public_code": summary["public_code"],
+        "created_at": _datetime(summary["created_at"]),
+        "role": role,
+        "is_owner": role == "root_admin",
+    }
+    return {f: data[f] for f in fields}
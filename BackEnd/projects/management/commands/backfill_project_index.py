@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from projects.feed import backfill
+
+
+class Command(BaseCommand):
+    help = "Rebuild the UserProjectIndex feed from Project / ProjectMember rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        written, deleted = backfill(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {written} feed rows, deleted {deleted} stale"))
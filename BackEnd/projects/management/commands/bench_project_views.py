@@ -0,0 +1,114 @@
+import asyncio
+import statistics
+import time
+
+from asgiref.sync import sync_to_async
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from projects import views, async_views
+from projects.models import Project
+from users.lookups import user_by_email
+
+ENDPOINTS = ("owned", "joined", "overview", "search")
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the project read endpoints: DRF views run through "
+        "sync_to_async (how ASGI serves sync views) vs projects.async_views"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", required=True, help="User to request as")
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--concurrency", type=int, default=50)
+        parser.add_argument("--query", default="proj", help="Search term")
+        parser.add_argument(
+            "--endpoints", default=",".join(ENDPOINTS),
+            help=f"Comma separated subset of {', '.join(ENDPOINTS)}",
+        )
+
+    def handle(self, *args, **options):
+        user = user_by_email(options["email"]).first()
+        if user is None:
+            raise CommandError("User not found")
+
+        project = next(
+            (p for qs in Project.objects.accessible_to(user).per_shard() for p in qs[:1]),
+            None,
+        )
+        endpoints = [e for e in options["endpoints"].split(",") if e]
+        if "overview" in endpoints and project is None:
+            raise CommandError("overview needs the user to have at least one project")
+
+        token = str(AccessToken.for_user(user))
+        cases = self._cases(endpoints, project, options["query"])
+
+        self.stdout.write(
+            f"{options['requests']} requests per case, concurrency {options['concurrency']}"
+        )
+        self.stdout.write(f"{'endpoint':<10} {'mode':<6} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9}")
+
+        for name, path, params, kwargs, sync_view, async_view in cases:
+            for mode, call in (
+                ("sync", self._sync_caller(sync_view, kwargs)),
+                ("async", self._async_caller(async_view, kwargs)),
+            ):
+                rps, p50, p99 = asyncio.run(self._run(
+                    call, path, params, token,
+                    options["requests"], options["concurrency"],
+                ))
+                self.stdout.write(f"{name:<10} {mode:<6} {rps:>9.1f} {p50:>9.2f} {p99:>9.2f}")
+
+    def _cases(self, endpoints, project, query):
+        table = {
+            "owned": ("/api/projects/owned/", {}, {}, views.owned_projects, async_views.owned_projects),
+            "joined": ("/api/projects/joined/", {}, {}, views.joined_projects, async_views.joined_projects),
+            "search": ("/api/projects/search/", {"q": query}, {}, views.search_projects, async_views.search_projects),
+        }
+        if project is not None:
+            table["overview"] = (
+                f"/api/projects/{project.id}/overview/", {}, {"project_id": project.id},
+                views.project_overview, async_views.project_overview,
+            )
+        return [(name, *table[name]) for name in endpoints if name in table]
+
+    @staticmethod
+    def _sync_caller(view, kwargs):
+        def render(request):
+            response = view(request, **kwargs)
+            response.render()
+            return response
+
+        # ASGIHandler runs sync views with thread_sensitive=True
+        return sync_to_async(render, thread_sensitive=True)
+
+    @staticmethod
+    def _async_caller(view, kwargs):
+        async def call(request):
+            return await view(request, **kwargs)
+        return call
+
+    async def _run(self, call, path, params, token, total, concurrency):
+        factory = AsyncRequestFactory()
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def one():
+            async with semaphore:
+                request = factory.get(path, params, headers={"Authorization": f"Bearer {token}"})
+                started = time.perf_counter()
+                response = await call(request)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    raise CommandError(f"{path} returned {response.status_code}")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        return total / elapsed, statistics.median(latencies) * 1000, p99 * 1000
@@ -0,0 +1,87 @@
+import datetime
+import statistics
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from config.renderers import FastJSONRenderer, orjson
+from projects.listings import PROJECT_LIST_FIELDS, serialize_projects
+from projects.models import Project
+from projects.serializers import ProjectListSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Per-row cost of serializing / rendering a project list: "
+        "ProjectListSerializer over model instances + JSONRenderer vs "
+        ".values() rows + serialize_projects + FastJSONRenderer. "
+        "Runs on in-memory rows, no database needed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=50, help="Rows per page")
+        parser.add_argument("--repeat", type=int, default=2000, help="Pages per case")
+
+    def handle(self, *args, **options):
+        rows, repeat = options["rows"], options["repeat"]
+        values = self._value_rows(rows)
+        instances = [self._instance(row) for row in values]
+
+        if serialize_projects(values) != ProjectListSerializer(instances, many=True).data:
+            self.stderr.write("Warning: the two paths produce different payloads")
+
+        self.stdout.write(
+            f"{rows} rows per page, {repeat} pages per case, "
+            f"orjson {'available' if orjson else 'NOT installed'}"
+        )
+        self.stdout.write(f"{'case':<38} {'us/row':>8} {'us/page p50':>12}")
+
+        drf = JSONRenderer()
+        fast = FastJSONRenderer()
+        cases = (
+            ("ProjectListSerializer", lambda: ProjectListSerializer(instances, many=True).data),
+            ("serialize_projects", lambda: serialize_projects(values)),
+            ("ProjectListSerializer + JSONRenderer",
+             lambda: drf.render(ProjectListSerializer(instances, many=True).data)),
+            ("serialize_projects + FastJSONRenderer",
+             lambda: fast.render(serialize_projects(values))),
+        )
+        for name, run in cases:
+            timings = self._time(run, repeat)
+            p50 = statistics.median(timings) * 1e6
+            self.stdout.write(f"{name:<38} {p50 / rows:>8.2f} {p50:>12.1f}")
+
+    @staticmethod
+    def _value_rows(count):
+        now = timezone.now()
+        return [
+            {
+                "id": uuid.uuid4(),
+                "name": f"Project {n}",
+                "public_code": f"APSQ-{n:08X}",
+                "created_at": now - datetime.timedelta(minutes=n),
+                "role": "root_admin" if n % 3 == 0 else "user",
+                "is_owner": n % 3 == 0,
+            }
+            for n in range(count)
+        ]
+
+    @staticmethod
+    def _instance(row):
+        # Annotated instance, as the model-based queryset would return
+        project = Project(**{f: row[f] for f in PROJECT_LIST_FIELDS if f not in ("role", "is_owner")})
+        project.role = row["role"]
+        project.is_owner = row["is_owner"]
+        return project
+
+    @staticmethod
+    def _time(run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+        return timings
@@ -0,0 +1,136 @@
+import statistics
+import threading
+import time
+import uuid
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+
+from projects.listings import OWNED_PAGINATOR, owned_queryset
+from projects.models import Project
+from projects.sharding import atomic_for_project
+from users.lookups import user_by_email
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure read throughput while writes are in flight. Run it with and "
+        "without DJANGO_SQLITE_PRODUCTION=True to compare journal modes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--email", required=True, help="User to read and write as")
+        parser.add_argument("--seconds", type=float, default=10)
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--writers", type=int, default=2)
+
+    def handle(self, *args, **options):
+        user = user_by_email(options["email"]).first()
+        if user is None:
+            raise CommandError("User not found")
+
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            journal_mode = cursor.fetchone()[0]
+        self.stdout.write(
+            f"journal_mode={journal_mode} "
+            f"transaction_mode={connection.transaction_mode or 'DEFERRED'} "
+            f"readers={options['readers']} writers={options['writers']} "
+            f"seconds={options['seconds']}"
+        )
+
+        prefix = f"bench-{uuid.uuid4().hex[:8]}"
+        deadline = time.monotonic() + options["seconds"]
+        reads, writes = Stats(), Stats()
+
+        threads = [
+            threading.Thread(target=self._reader, args=(user, deadline, reads))
+            for _ in range(options["readers"])
+        ] + [
+            threading.Thread(target=self._writer, args=(user, deadline, writes, prefix, n))
+            for n in range(options["writers"])
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        deleted = sum(
+            qs.delete()[0]
+            for qs in Project.objects.filter(name__startswith=prefix).per_shard()
+        )
+
+        elapsed = options["seconds"]
+        self.stdout.write(f"{'':<7} {'ops/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'locked':>7}")
+        for name, stats in (("reads", reads), ("writes", writes)):
+            p50, p99 = stats.percentiles()
+            self.stdout.write(
+                f"{name:<7} {len(stats.latencies) / elapsed:>9.1f} "
+                f"{p50:>9.2f} {p99:>9.2f} {stats.locked:>7}"
+            )
+        self.stdout.write(f"Removed {deleted} benchmark rows")
+
+    @staticmethod
+    def _reader(user, deadline, stats):
+        try:
+            while time.monotonic() < deadline:
+                with stats.measure():
+                    OWNED_PAGINATOR.paginate_queryset(owned_queryset(user), {})
+        finally:
+            connections.close_all()
+
+    @staticmethod
+    def _writer(user, deadline, stats, prefix, n):
+        seq = 0
+        try:
+            while time.monotonic() < deadline:
+                seq += 1
+                project = Project(
+                    name=f"{prefix}-{n}-{seq}",
+                    root_admin=user,
+                    access_key_hash="!",
+                    pin_hash="!",
+                )
+                with stats.measure():
+                    with atomic_for_project(project.pk):
+                        project.save()
+        finally:
+            connections.close_all()
+
+
+class Stats:
+
+    def __init__(self):
+        self.latencies = []
+        self.locked = 0
+        self._lock = threading.Lock()
+
+    def measure(self):
+        return _Measure(self)
+
+    def percentiles(self):
+        if not self.latencies:
+            return 0.0, 0.0
+        latencies = sorted(self.latencies)
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        return statistics.median(latencies) * 1000, p99 * 1000
+
+
+class _Measure:
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.started
+        with self.stats._lock:
+            if exc_type is OperationalError and "locked" in str(exc):
+                # "database is locked": busy timeout exceeded
+                self.stats.locked += 1
+                return True
+            if exc_type is None:
+                self.stats.latencies.append(elapsed)
+        return False
@@ -0,0 +1,12 @@
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Run migrate on every project shard (PROJECT_SHARDS), default included"
+
+    def handle(self, *args, **options):
+        for alias in settings.PROJECT_SHARDS:
+            self.stdout.write(f"Migrating {alias}")
+            call_command("migrate", database=alias, verbosity=options["verbosity"])
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from projects.changes import purge
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete project change-log rows older than "
+        "PROJECT_CHANGES_RETENTION_DAYS (their sync tokens have expired)"
+    )
+
+    def handle(self, *args, **options):
+        deleted = purge()
+        self.stdout.write(self.style.SUCCESS(
+            f"Purged {deleted} change-log rows older than "
+            f"{settings.PROJECT_CHANGES_RETENTION_DAYS} days"
+        ))
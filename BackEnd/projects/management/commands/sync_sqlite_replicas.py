@@ -0,0 +1,50 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database onto every DJANGO_DB_REPLICAS file "
+        "(local stand-in for replication). Uses the online backup API, so "
+        "the primary stays writable while copying."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval", type=float, default=0,
+            help="Repeat every N seconds (default: copy once)",
+        )
+
+    def handle(self, *args, **options):
+        if connections["default"].vendor != "sqlite":
+            raise CommandError("The primary database is not SQLite")
+        if not settings.DB_REPLICAS:
+            raise CommandError("DJANGO_DB_REPLICAS is empty")
+
+        while True:
+            started = time.perf_counter()
+            self._copy(settings.DATABASES["default"]["NAME"], settings.DB_REPLICAS)
+            self.stdout.write(
+                f"Copied to {len(settings.DB_REPLICAS)} replicas "
+                f"in {(time.perf_counter() - started) * 1000:.0f} ms"
+            )
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
+
+    @staticmethod
+    def _copy(primary, replicas):
+        source = sqlite3.connect(primary)
+        try:
+            for replica in replicas:
+                target = sqlite3.connect(replica)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+        finally:
+            source.close()
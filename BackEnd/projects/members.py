@@ -0,0 +1,148 @@
+from users.lookups import users_by_emails
+
+from .models import ProjectMember
+from .signals import batched_member_changes, notify_members_changed
+
+VALID_ROLES = {value for value, _ in ProjectMember.ROLE_CHOICES}
+
+MAX_BULK_OPERATIONS = 1000
+BULK_OPS = ("add", "remove", "set_role")
+
+
+def users_by_email(emails):
+    """Resolve many emails (case-insensitive) with a single query"""
+    lowered = {e.lower() for e in emails}
+    if not lowered:
+        return {}
+
+    return {u.email.lower(): u for u in users_by_emails(lowered)}
+
+
+def add_initial_members(project, members_data):
+    """
+    Bulk-add the members submitted with a new project.
+
+    All emails are resolved in one query and memberships are written with
+    a single bulk_create, so the write lock is held for a constant number
+    of statements. Returns (added, skipped), where skipped entries carry
+    a reason. Non-registered emails are never added (security).
+    `members_data` is validated by serializers.MemberSerializer.
+    """
+    owner_email = (project.root_admin.email or "").lower()
+
+    requested, skipped = {}, []
+    for m_data in members_data:
+        email = (m_data.get("email") or "").strip()
+        role = (m_data.get("role") or "user").lower()
+        if not email:
+            continue
+
+        key = email.lower()
+        if key == owner_email:
+            # ROOT ADMIN PROTECTION: root admin is never a member
+            skipped.append({"email": email, "reason": "owner"})
+        elif role not in VALID_ROLES:
+            skipped.append({"email": email, "reason": "invalid_role"})
+        elif key in requested:
+            skipped.append({"email": email, "reason": "duplicate"})
+        else:
+            requested[key] = (email, role)
+
+    found = users_by_email(requested)
+
+    memberships, added = [], []
+    for key, (email, role) in requested.items():
+        target_user = found.get(key)
+        if target_user is None:
+            skipped.append({"email": email, "reason": "not_registered"})
+            continue
+        memberships.append(ProjectMember(project=project, user=target_user, role=role))
+        added.append(email)
+
+    ProjectMember.objects.bulk_create(memberships, ignore_conflicts=True)
+    # bulk_create bypasses post_save
+    notify_members_changed(upserted=memberships)
+
+    return added, skipped
+
+
+def apply_member_operations(project, operations):
+    """
+    Apply a batch of {"op": "add" | "remove" | "set_role", "email", "role"}
+    operations to `project`.
+
+    Emails and existing memberships are each resolved with one query, then
+    changes are written with one bulk_create, one bulk_update and one
+    filtered delete. Call inside atomic_for_project(). `operations` is
+    validated by serializers.BulkMembersSerializer. Returns one result
+    dict per operation, in request order.
+    """
+    owner_email = (project.root_admin.email or "").lower()
+
+    results, planned, seen = [], [], set()
+    for index, item in enumerate(operations):
+        op = item.get("op")
+        email = (item.get("email") or "").strip()
+        role = (item.get("role") or "user").lower()
+        result = {"index": index, "op": op, "email": email}
+        results.append(result)
+
+        if op not in BULK_OPS or not email:
+            result.update(status="error", reason="invalid_operation")
+        elif op == "set_role" and not item.get("role"):
+            result.update(status="error", reason="invalid_role")
+        elif op != "remove" and role not in VALID_ROLES:
+            result.update(status="error", reason="invalid_role")
+        elif email.lower() == owner_email:
+            result.update(status="skipped", reason="owner")
+        elif email.lower() in seen:
+            result.update(status="skipped", reason="duplicate")
+        else:
+            seen.add(email.lower())
+            planned.append((result, op, email.lower(), role))
+
+    found = users_by_email(seen)
+    existing = {
+        m.user_id: m
+        for m in ProjectMember.objects.for_project(project.pk).filter(
+            project=project,
+            user__in=[u.pk for u in found.values()]
+        )
+    }
+
+    to_create, to_update, to_delete = [], [], []
+    for result, op, key, role in planned:
+        target_user = found.get(key)
+        membership = existing.get(target_user.pk) if target_user else None
+
+        if target_user is None:
+            result.update(status="skipped", reason="not_registered")
+        elif op == "add":
+            if membership:
+                result.update(status="skipped", reason="already_member")
+            else:
+                to_create.append(ProjectMember(project=project, user=target_user, role=role))
+                result.update(status="added", role=role)
+        elif membership is None:
+            result.update(status="skipped", reason="not_member")
+        elif op == "remove":
+            to_delete.append(membership.pk)
+            result.update(status="removed")
+        elif membership.role == role:
+            result.update(status="skipped", reason="unchanged")
+        else:
+            membership.role = role
+            to_update.append(membership)
+            result.update(status="updated", role=role)
+
+    with batched_member_changes():
+        if to_create:
+            ProjectMember.objects.bulk_create(to_create, ignore_conflicts=True)
+        if to_update:
+            ProjectMember.objects.bulk_update(to_update, ["role"])
+        if to_delete:
+            # post_delete receivers join the surrounding batch
+            ProjectMember.objects.for_project(project.pk).filter(pk__in=to_delete).delete()
+        notify_members_changed(upserted=to_create + to_update)
+
+    return results
@@ -0,0 +1,105 @@
+from django.db import migrations
+
+
+# SQLite-only: a trigram FTS5 index over Project.name / Project.public_code.
+# projects_project_search is a plain side table with a stable INTEGER rowid
+# (Project's UUID table has no rowid alias, so its rowids may move on VACUUM)
+# and projects_project_fts is an external-content FTS5 table over it.
+# Triggers keep both in sync with projects_project on insert/update/delete.
+FORWARD_SQL = [
+    """
+    CREATE TABLE projects_project_search (
+        id INTEGER PRIMARY KEY,
+        project_id char(32) NOT NULL UNIQUE,
+        name varchar(255) NOT NULL,
+        public_code varchar(16) NOT NULL
+    )
+    """,
+    """
+    CREATE VIRTUAL TABLE projects_project_fts USING fts5(
+        name,
+        public_code,
+        content='projects_project_search',
+        content_rowid='id',
+        tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER projects_project_search_ai AFTER INSERT ON projects_project_search BEGIN
+        INSERT INTO projects_project_fts(rowid, name, public_code)
+        VALUES (new.id, new.name, new.public_code);
+    END
+    """,
+    """
+    CREATE TRIGGER projects_project_search_ad AFTER DELETE ON projects_project_search BEGIN
+        INSERT INTO projects_project_fts(projects_project_fts, rowid, name, public_code)
+        VALUES ('delete', old.id, old.name, old.public_code);
+    END
+    """,
+    """
+    CREATE TRIGGER projects_project_search_au AFTER UPDATE ON projects_project_search BEGIN
+        INSERT INTO projects_project_fts(projects_project_fts, rowid, name, public_code)
+        VALUES ('delete', old.id, old.name, old.public_code);
+        INSERT INTO projects_project_fts(rowid, name, public_code)
+        VALUES (new.id, new.name, new.public_code);
+    END
+    """,
+    """
+    CREATE TRIGGER projects_project_fts_ai AFTER INSERT ON projects_project BEGIN
+        INSERT INTO projects_project_search(project_id, name, public_code)
+        VALUES (new.id, new.name, new.public_code);
+    END
+    """,
+    """
+    CREATE TRIGGER projects_project_fts_ad AFTER DELETE ON projects_project BEGIN
+        DELETE FROM projects_project_search WHERE project_id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER projects_project_fts_au AFTER UPDATE OF id, name, public_code ON projects_project BEGIN
+        UPDATE projects_project_search
+        SET project_id = new.id, name = new.name, public_code = new.public_code
+        WHERE project_id = old.id;
+    END
+    """,
+    """
+    INSERT INTO projects_project_search(project_id, name, public_code)
+    SELECT id, name, public_code FROM projects_project
+    """,
+]
+
+REVERSE_SQL = [
+    "DROP TRIGGER IF EXISTS projects_project_fts_au",
+    "DROP TRIGGER IF EXISTS projects_project_fts_ad",
+    "DROP TRIGGER IF EXISTS projects_project_fts_ai",
+    "DROP TRIGGER IF EXISTS projects_project_search_au",
+    "DROP TRIGGER IF EXISTS projects_project_search_ad",
+    "DROP TRIGGER IF EXISTS projects_project_search_ai",
+    "DROP TABLE IF EXISTS projects_project_fts",
+    "DROP TABLE IF EXISTS projects_project_search",
+]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in FORWARD_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in REVERSE_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0005_alter_project_name'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:36
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0007_userprojectindex'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='projectmember',
+            name='projects_pr_user_id_18afed_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='userprojectindex',
+            name='projects_upi_feed_idx',
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['root_admin', '-created_at', '-id'], name='projects_owned_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='projectmember',
+            index=models.Index(fields=['user', '-joined_at', '-project'], name='projects_joined_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userprojectindex',
+            index=models.Index(fields=['user', '-sort_at', '-project', 'role', 'is_owner'], name='projects_upi_feed_idx'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:56
+
+import projects.utils
+from django.conf import settings
+from django.db import migrations, models
+
+from projects.utils import uuid7
+from ._search_triggers import recreate_search_triggers
+
+
+def rekey_projects(apps, schema_editor):
+    """
+    Give existing projects UUIDv7 ids derived from their created_at, so id
+    order matches creation order for old rows too. Memberships and feed
+    rows follow; the search side table follows through its update trigger.
+    """
+    db = schema_editor.connection.alias
+    Project = apps.get_model("projects", "Project")
+    ProjectMember = apps.get_model("projects", "ProjectMember")
+    UserProjectIndex = apps.get_model("projects", "UserProjectIndex")
+
+    projects = list(
+        Project.objects.using(db)
+        .order_by("created_at")
+        .values_list("id", "created_at")
+    )
+    if not projects:
+        return
+    if len(settings.PROJECT_SHARDS) > 1:
+        # New ids would map to other shards
+        raise RuntimeError(
+            "Run this migration before enabling DJANGO_PROJECT_SHARDS: "
+            "project ids decide the shard."
+        )
+
+    for old_id, created_at in projects:
+        new_id = uuid7(int(created_at.timestamp() * 1000))
+        Project.objects.using(db).filter(id=old_id).update(id=new_id)
+        ProjectMember.objects.using(db).filter(project_id=old_id).update(project_id=new_id)
+        UserProjectIndex.objects.using(db).filter(project_id=old_id).update(project_id=new_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0009_cross_shard_foreign_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(rekey_projects, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='project',
+            name='projects_owned_keyset_idx',
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='created_at',
+            field=models.DateTimeField(auto_now_add=True),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='id',
+            field=models.UUIDField(default=projects.utils.uuid7, editable=False, primary_key=True, serialize=False),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['root_admin', '-id'], name='projects_owned_id_idx'),
+        ),
+        # The rebuilds of projects_project drop the search index triggers
+        migrations.RunPython(recreate_search_triggers, recreate_search_triggers),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:59
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+from ._search_triggers import recreate_search_triggers
+
+
+def rename_case_duplicates(apps, schema_editor):
+    """
+    Names used to be unique only as typed. Keep the oldest project of each
+    case-insensitive duplicate group and suffix the others with their
+    public code, so the new constraint can be created.
+    """
+    db = schema_editor.connection.alias
+    Project = apps.get_model("projects", "Project")
+
+    duplicated = (
+        Project.objects.using(db)
+        .values(name_ci=Lower("name"))
+        .annotate(n=Count("id"))
+        .filter(n__gt=1)
+        .values_list("name_ci", flat=True)
+    )
+    for name_ci in list(duplicated):
+        group = (
+            Project.objects.using(db)
+            .alias(name_ci=Lower("name"))
+            .filter(name_ci=name_ci)
+            .order_by("id")
+        )
+        for project in list(group)[1:]:
+            project.name = f"{project.name[:230]} ({project.public_code})"
+            project.save(update_fields=["name"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0010_uuid7_project_ids'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # Reversing rebuilds the table too, after the last operation's reverse
+        migrations.RunPython(rename_case_duplicates, recreate_search_triggers),
+        migrations.AlterField(
+            model_name='project',
+            name='name',
+            field=models.CharField(max_length=255),
+        ),
+        migrations.AddConstraint(
+            model_name='project',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('name'), name='projects_project_name_ci_uniq'),
+        ),
+        # The rebuild of projects_project drops the search index triggers
+        migrations.RunPython(recreate_search_triggers, migrations.RunPython.noop),
+    ]
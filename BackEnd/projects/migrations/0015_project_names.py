@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:11
+
+from django.conf import settings
+from django.db import connections, migrations, models
+
+
+def reserve_existing_names(apps, schema_editor):
+    """
+    Reserve the name of every project on every shard. Names were only
+    unique per shard: keep the oldest project of each case-insensitive
+    duplicate and suffix the others with their public code, as 0011 did
+    within a shard.
+    """
+    if schema_editor.connection.alias != "default":
+        return
+    Project = apps.get_model("projects", "Project")
+    ProjectName = apps.get_model("projects", "ProjectName")
+
+    projects = []
+    for alias in settings.PROJECT_SHARDS:
+        # Shards are migrated after "default": a new one has no table yet
+        if Project._meta.db_table not in connections[alias].introspection.table_names():
+            continue
+        projects += [
+            (project_id, alias, name, public_code)
+            for project_id, name, public_code in (
+                Project.objects.using(alias).values_list("id", "name", "public_code")
+            )
+        ]
+
+    reserved = {}
+    for project_id, alias, name, public_code in sorted(projects):
+        if name.lower() in reserved:
+            name = f"{name[:230]} ({public_code})"
+            Project.objects.using(alias).filter(pk=project_id).update(name=name)
+        reserved[name.lower()] = project_id
+    ProjectName.objects.bulk_create(
+        [ProjectName(project_id=project_id, name_ci=name_ci) for name_ci, project_id in reserved.items()],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0014_version_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProjectName',
+            fields=[
+                ('project_id', models.UUIDField(primary_key=True, serialize=False)),
+                ('name_ci', models.CharField(max_length=255, unique=True)),
+            ],
+        ),
+        migrations.RunPython(reserve_existing_names, migrations.RunPython.noop),
+    ]
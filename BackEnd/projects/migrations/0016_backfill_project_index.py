@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:40
+
+from itertools import islice
+
+from django.conf import settings
+from django.db import connections, migrations
+from django.db.models import F
+
+# ProjectMember.ACTIVE_ROLES (historical models have no class attributes)
+ACTIVE_ROLES = ("admin", "user")
+
+
+def index_existing_projects(apps, schema_editor):
+    """
+    0007 created UserProjectIndex empty: projects and memberships that
+    predate it were only listed once `backfill_project_index` had been run.
+    Index them here, from every shard; rows the command already wrote are
+    left as they are.
+    """
+    db = schema_editor.connection.alias
+    if db != "default":
+        return
+    Project = apps.get_model("projects", "Project")
+    ProjectMember = apps.get_model("projects", "ProjectMember")
+    UserProjectIndex = apps.get_model("projects", "UserProjectIndex")
+
+    for alias in settings.PROJECT_SHARDS:
+        # Shards are migrated after "default": a new one has no table yet
+        if Project._meta.db_table not in connections[alias].introspection.table_names():
+            continue
+        owners = (
+            UserProjectIndex(
+                user_id=root_admin_id, project_id=project_id,
+                role="root_admin", is_owner=True, sort_at=created_at,
+            )
+            for project_id, root_admin_id, created_at in (
+                Project.objects.using(alias)
+                .values_list("id", "root_admin_id", "created_at")
+                .iterator(chunk_size=1000)
+            )
+        )
+        members = (
+            UserProjectIndex(
+                user_id=user_id, project_id=project_id,
+                role=role, is_owner=False, sort_at=joined_at,
+            )
+            for project_id, user_id, role, joined_at in (
+                ProjectMember.objects.using(alias)
+                .filter(role__in=ACTIVE_ROLES)
+                .exclude(user_id=F("project__root_admin_id"))
+                .values_list("project_id", "user_id", "role", "joined_at")
+                .iterator(chunk_size=1000)
+            )
+        )
+        for rows in (owners, members):
+            # bulk_create would materialize the whole generator
+            while batch := list(islice(rows, 1000)):
+                UserProjectIndex.objects.using(db).bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0015_project_names'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_existing_projects, migrations.RunPython.noop),
+    ]
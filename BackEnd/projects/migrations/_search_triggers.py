@@ -0,0 +1,39 @@
+"""
+Search index triggers on projects_project (created by 0006).
+
+SQLite applies most AlterField operations by rebuilding the table, which
+drops its triggers; migrations that rebuild projects_project run
+recreate_search_triggers afterwards. Not a migration itself (the loader
+skips modules starting with "_").
+"""
+
+PROJECT_TRIGGERS_SQL = [
+    "DROP TRIGGER IF EXISTS projects_project_fts_ai",
+    "DROP TRIGGER IF EXISTS projects_project_fts_ad",
+    "DROP TRIGGER IF EXISTS projects_project_fts_au",
+    """
+    CREATE TRIGGER projects_project_fts_ai AFTER INSERT ON projects_project BEGIN
+        INSERT INTO projects_project_search(project_id, name, public_code)
+        VALUES (new.id, new.name, new.public_code);
+    END
+    """,
+    """
+    CREATE TRIGGER projects_project_fts_ad AFTER DELETE ON projects_project BEGIN
+        DELETE FROM projects_project_search WHERE project_id = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER projects_project_fts_au AFTER UPDATE OF id, name, public_code ON projects_project BEGIN
+        UPDATE projects_project_search
+        SET project_id = new.id, name = new.name, public_code = new.public_code
+        WHERE project_id = old.id;
+    END
+    """,
+]
+
+
+def recreate_search_triggers(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    for sql in PROJECT_TRIGGERS_SQL:
+        schema_editor.execute(sql)
@@ -1,9 +1,17 @@
-import uuid
 import secrets
 from django.db import models
+from django.db.models import (
+    Q, Case, When, Value, Subquery, OuterRef, CharField, BooleanField,
+)
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
 from django.contrib.auth.hashers import make_password, check_password
 
+from users.hashing import amake_password, acheck_password
+
+from .sharding import ShardedQuerySet
+from .utils import uuid7
+
 def generate_public_code():
     """
     Human-friendly, searchable project code
@@ -11,11 +19,63 @@ def generate_public_code():
     """
     return f"APSQ-{secrets.token_hex(4).upper()}"
 
+class ProjectQuerySet(ShardedQuerySet):
+
+    def named(self, name):
+        """
+        Projects called `name`, ignoring case. Matches the expression of
+        projects_project_name_ci_uniq, so it is one index probe (LIKE, which
+        __iexact compiles to, is not).
+        """
+        return self.alias(name_ci=Lower("name")).filter(name_ci=name.lower())
+
+    def accessible_to(self, user):
+        """
+        Projects the user owns or is a member of.
+        Both branches resolve through indexes:
+        root_admin_id and the (user, project) unique index on ProjectMember.
+        """
+        member_project_ids = (
+            ProjectMember.objects
+            .filter(user=user)
+            .values("project_id")
+        )
+        return self.filter(Q(root_admin=user) | Q(id__in=member_project_ids))
+
+    def with_access_for(self, user):
+        """
+        Annotate `role` and `is_owner` for `user` in SQL.
+
+        role is "root_admin" for the owner, the caller's ProjectMember role
+        otherwise, and NULL when the user has no access at all.
+        """
+        membership_role = (
+            ProjectMember.objects
+            .filter(project=OuterRef("pk"), user=user)
+            .values("role")[:1]
+        )
+
+        return self.annotate(
+            role=Case(
+                When(root_admin_id=user.pk, then=Value("root_admin")),
+                default=Subquery(membership_role),
+                output_field=CharField(),
+            ),
+            is_owner=Case(
+                When(root_admin_id=user.pk, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            ),
+        )
+
+
 class Project(models.Model):
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Time-ordered: ordering by id is ordering by creation
+    id = models.UUIDField(primary_key=True, default=uuid7, editable=False)
 
     # Human-visible
-    name = models.CharField(max_length=255, unique=True)
+    # Unique ignoring case, see Meta.constraints
+    name = models.CharField(max_length=255)
     public_code = models.CharField(
         max_length=16,
         unique=True,
@@ -23,17 +83,39 @@ class Project(models.Model):
         default=generate_public_code
     )
 
+    # Users live on "default", the project may be on another shard
     root_admin = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        related_name="root_admin_projects"
+        related_name="root_admin_projects",
+        db_constraint=False,
     )
 
     # Secrets
     access_key_hash = models.CharField(max_length=128)
     pin_hash = models.CharField(max_length=128)
 
-    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ProjectQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of owned projects: (-id), ids being UUIDv7.
+            # Also holds the list card columns, so an owned page is read
+            # from the index alone (see listings.PROJECT_LIST_FIELDS)
+            models.Index(
+                fields=["root_admin", "-id", "name", "public_code", "created_at"],
+                name="projects_owned_cover_idx",
+            ),
+        ]
+        constraints = [
+            # Per shard; ProjectName reserves names across shards
+            models.UniqueConstraint(
+                Lower("name"),
+                name="projects_project_name_ci_uniq",
+            ),
+        ]
 
     def set_access_key(self, raw_key: str):
         self.access_key_hash = make_password(raw_key)
@@ -49,6 +131,20 @@ class Project(models.Model):
         """Verify entered PIN against stored hash"""
         return check_password(raw_pin, self.pin_hash)
 
+    # Async variants hash on users.hashing's bounded pool
+
+    async def aset_access_key(self, raw_key: str):
+        self.access_key_hash = await amake_password(raw_key)
+
+    async def acheck_access_key(self, raw_key: str) -> bool:
+        return await acheck_password(raw_key, self.access_key_hash)
+
+    async def aset_pin(self, raw_pin: str):
+        self.pin_hash = await amake_password(raw_pin)
+
+    async def acheck_pin(self, raw_pin: str) -> bool:
+        return await acheck_password(raw_pin, self.pin_hash)
+
     def __str__(self):
         return self.name
 
@@ -59,18 +155,137 @@ class ProjectMember(models.Model):
         ("user", "User"),
         ("invited", "Invited"),
     )
+    # Roles that count as "joined" (invited members are not listed yet)
+    ACTIVE_ROLES = ("admin", "user")
 
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False)
     project = models.ForeignKey(Project, on_delete=models.CASCADE)
     role = models.CharField(max_length=10, choices=ROLE_CHOICES)
 
     joined_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
+    objects = ShardedQuerySet.as_manager()
+
     class Meta:
         unique_together = ("user", "project")
         indexes = [
-            models.Index(fields=["user", "joined_at"]),
+            # Keyset pagination of joined projects: (-joined_at, -project)
+            models.Index(
+                fields=["user", "-joined_at", "-project"],
+                name="projects_joined_keyset_idx",
+            ),
         ]
 
     def __str__(self):
         return f"{self.user.email} - {self.project.name}"
+
+
+class UserProjectIndex(models.Model):
+    """
+    Denormalized "my projects" feed: one row per (user, accessible project).
+
+    Owned projects sort by Project.created_at, joined ones by
+    ProjectMember.joined_at. Rows are maintained by projects.feed
+    (wired through projects.signals) and can be rebuilt with
+    `python manage.py backfill_project_index`.
+
+    Always stored on "default" while projects may live on other shards,
+    so rows are removed by projects.signals rather than by cascade.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="project_index"
+    )
+    project = models.ForeignKey(
+        Project,
+        on_delete=models.DO_NOTHING,
+        related_name="user_index",
+        db_constraint=False,
+    )
+    role = models.CharField(max_length=10)
+    is_owner = models.BooleanField(default=False)
+    sort_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ("user", "project")
+        indexes = [
+            # Covering index for the feed range scan: (-sort_at, -project)
+            models.Index(
+                fields=["user", "-sort_at", "-project", "role", "is_owner"],
+                name="projects_upi_feed_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.project_id} ({self.role})"
+
+
+class ProjectChange(models.Model):
+    """
+    Append-only log of changes to the projects a user can see: one row per
+    (user, changed project) whenever a Project or ProjectMember row is
+    created, updated or deleted. The row id is the sync position read by
+    /api/projects/changes/ (projects.changes).
+
+    Stored on "default" like UserProjectIndex. Rows older than
+    PROJECT_CHANGES_RETENTION_DAYS are removed by
+    `python manage.py purge_project_changes`.
+    """
+
+    # No database constraint: deleting a User logs changes to its projects
+    # after the cascade collected its rows (purge removes them)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="project_changes",
+        db_constraint=False,
+    )
+    # No foreign key: the log outlives deleted projects
+    project_id = models.UUIDField()
+    changed_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            # Range scan of one user's changes after a position
+            models.Index(fields=["user", "id"], name="projects_change_user_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.project_id} @{self.pk}"
+
+
+class VersionCounter(models.Model):
+    """
+    Version counters behind the ETags of the project read endpoints
+    (projects.versions), e.g. "user:<id>" or "project:<id>". Bumped in the
+    transaction of the write they version, so every worker sees the same
+    value as the data it describes.
+
+    Stored on "default" like UserProjectIndex.
+    """
+
+    key = models.CharField(max_length=64, primary_key=True)
+    value = models.PositiveBigIntegerField()
+
+    def __str__(self):
+        return f"{self.key} = {self.value}"
+
+
+class ProjectName(models.Model):
+    """
+    Reservation of each project's name, lower-cased. Inserted in the same
+    atomic_for_project block as the project, so two shards cannot both
+    accept a name: projects_project_name_ci_uniq only sees its own shard.
+
+    Stored on "default" like UserProjectIndex, kept in sync by
+    projects.signals.
+    """
+
+    # No foreign key: the project may be on another shard
+    project_id = models.UUIDField(primary_key=True)
+    name_ci = models.CharField(max_length=255, unique=True)
+
+    def __str__(self):
+        return f"{self.name_ci} ({self.project_id})"
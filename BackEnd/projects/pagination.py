@@ -0,0 +1,202 @@
+import datetime
+import heapq
+import uuid
+from functools import cmp_to_key
+
+from django.core import signing
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def _value(row, field):
+    # Rows are model instances or .values() dicts
+    return row[field] if isinstance(row, dict) else getattr(row, field)
+
+
+class KeysetPaginator:
+    """
+    Keyset (seek) pagination over a fixed, unique ordering.
+
+    `ordering` lists the sort fields, e.g. ("-created_at", "-id"); the last
+    one must be unique so rows sharing a timestamp are never skipped.
+    Cursors carry the full key tuple of the boundary row and are signed
+    opaque tokens, so clients can only hand back cursors we issued.
+
+    Each page is a range scan starting at the key, so deep pages cost the
+    same as the first one as long as an index matches the ordering.
+
+    A list of querysets (one per shard, see projects.sharding) is paged by
+    fetching limit + 1 rows from each and merge-sorting them in Python.
+    .values() querysets work too, as long as they select the ordering fields.
+    """
+
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self, ordering, salt, default_limit=DEFAULT_LIMIT, max_limit=MAX_LIMIT):
+        self.ordering = tuple(ordering)
+        self.fields = [f.lstrip("-") for f in self.ordering]
+        self.descending = [f.startswith("-") for f in self.ordering]
+        self.salt = salt
+        self.default_limit = default_limit
+        self.max_limit = max_limit
+
+    # ---------- request parsing ----------
+
+    def get_limit(self, params):
+        try:
+            limit = int(params.get("limit", self.default_limit))
+        except (TypeError, ValueError):
+            return self.default_limit
+        return max(1, min(limit, self.max_limit))
+
+    def encode_cursor(self, row, direction):
+        key = [_encode_value(_value(row, f)) for f in self.fields]
+        return signing.dumps({"d": direction, "k": key}, salt=self.salt)
+
+    def decode_cursor(self, token):
+        try:
+            data = signing.loads(token, salt=self.salt)
+            direction, key = data["d"], data["k"]
+        except (signing.BadSignature, KeyError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if direction not in ("next", "prev") or len(key) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        return direction, key
+
+    # ---------- query building ----------
+
+    def _seek_filter(self, key, forward):
+        """
+        Rows strictly after `key` in the ordering (or before it when
+        paging backwards), expanded as
+        (a < x) OR (a = x AND b < y) OR ...
+        plus a leading a <= x bound.
+        """
+        condition = Q()
+        for i, field in enumerate(self.fields):
+            desc = self.descending[i] == forward
+            term = Q(**{f"{field}__{'lt' if desc else 'gt'}": key[i]})
+            for prev_field, prev_value in zip(self.fields[:i], key[:i]):
+                term &= Q(**{prev_field: prev_value})
+            condition |= term
+
+        # Redundant bound on the leading column so the index is used as a
+        # range scan rather than filtered row by row
+        desc = self.descending[0] == forward
+        return condition & Q(**{f"{self.fields[0]}__{'lte' if desc else 'gte'}": key[0]})
+
+    def _order_by(self, forward):
+        if forward:
+            return self.ordering
+        return tuple(
+            f if desc else f"-{f}"
+            for f, desc in zip(self.fields, self.descending)
+        )
+
+    def _prepare(self, queryset, params):
+        limit = self.get_limit(params)
+        token = params.get("cursor")
+
+        forward, key = True, None
+        if token:
+            direction, key = self.decode_cursor(token)
+            forward = direction == "next"
+
+        qs = queryset.order_by(*self._order_by(forward))
+        if key is not None:
+            qs = qs.filter(self._seek_filter(key, forward))
+
+        return qs[: limit + 1], limit, forward, key
+
+    def _page(self, items, limit, forward, key):
+        extra = len(items) > limit
+        rows = items[:limit]
+
+        if forward:
+            has_more = extra
+            has_previous = key is not None
+        else:
+            rows.reverse()
+            has_more = True
+            has_previous = extra
+
+        next_cursor = self.encode_cursor(rows[-1], "next") if rows and has_more else None
+        prev_cursor = self.encode_cursor(rows[0], "prev") if rows and has_previous else None
+
+        return rows, has_more, next_cursor, prev_cursor
+
+    def _sort_key(self, forward):
+        """Python equivalent of _order_by(forward), for merging shards"""
+        def compare(a, b):
+            for field, desc in zip(self.fields, self.descending):
+                x, y = _value(a, field), _value(b, field)
+                if x != y:
+                    first = x > y if desc == forward else x < y
+                    return -1 if first else 1
+            return 0
+        return cmp_to_key(compare)
+
+    def _merge(self, pages, limit, forward):
+        if len(pages) == 1:
+            return pages[0]
+        merged = heapq.merge(*pages, key=self._sort_key(forward))
+        return [row for _, row in zip(range(limit + 1), merged)]
+
+    def paginate_queryset(self, queryset, params):
+        """
+        Page `queryset` (or a list of per-shard querysets) using the
+        `cursor` / `limit` query params.
+        Returns (rows, has_more, next_cursor, prev_cursor);
+        has_more tells whether a page exists after this one.
+        """
+        querysets = queryset if isinstance(queryset, list) else [queryset]
+        prepared = [self._prepare(qs, params) for qs in querysets]
+        _, limit, forward, key = prepared[0]
+
+        pages = [list(qs) for qs, *_ in prepared]
+        return self._page(self._merge(pages, limit, forward), limit, forward, key)
+
+    async def apaginate_queryset(self, queryset, params):
+        """paginate_queryset() using the async ORM"""
+        querysets = queryset if isinstance(queryset, list) else [queryset]
+        prepared = [self._prepare(qs, params) for qs in querysets]
+        _, limit, forward, key = prepared[0]
+
+        pages = [[row async for row in qs] for qs, *_ in prepared]
+        return self._page(self._merge(pages, limit, forward), limit, forward, key)
+
+    @staticmethod
+    def _paginated_data(page, serialize):
+        rows, has_more, next_cursor, prev_cursor = page
+        return {
+            "results": serialize(rows),
+            "has_more": has_more,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+        }
+
+    def get_paginated_data(self, queryset, params, serialize, load=None):
+        """`load(rows)` may fetch what serialize needs and return the rows"""
+        rows, *cursors = self.paginate_queryset(queryset, params)
+        if load is not None:
+            rows = load(rows)
+        return self._paginated_data((rows, *cursors), serialize)
+
+    async def aget_paginated_data(self, queryset, params, serialize, load=None):
+        """get_paginated_data() with the async ORM; `load` is awaited"""
+        rows, *cursors = await self.apaginate_queryset(queryset, params)
+        if load is not None:
+            rows = await load(rows)
+        return self._paginated_data((rows, *cursors), serialize)
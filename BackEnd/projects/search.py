@@ -0,0 +1,59 @@
+from django.db import connections
+from django.db.models import Q, Case, When, Value, IntegerField
+from django.db.models.expressions import RawSQL
+
+from .listings import SEARCH_RESULT_FIELDS
+from .models import Project
+
+# The trigram tokenizer cannot match terms shorter than 3 characters
+MIN_FTS_QUERY_LENGTH = 3
+
+FTS_MATCH_SQL = (
+    "SELECT s.project_id FROM projects_project_fts "
+    "JOIN projects_project_search s ON s.id = projects_project_fts.rowid "
+    "WHERE projects_project_fts MATCH %s"
+)
+
+
+def _fts_phrase(q: str) -> str:
+    """Quote user input as a single FTS5 phrase (substring match with trigrams)"""
+    return '"' + q.replace('"', '""') + '"'
+
+
+def uses_fts(q: str, using: str = "default") -> bool:
+    return (
+        connections[using].vendor == "sqlite"
+        and len(q) >= MIN_FTS_QUERY_LENGTH
+    )
+
+
+def search_projects_queryset(user, q: str, fields=SEARCH_RESULT_FIELDS):
+    """
+    Ranked prefix/substring search over the projects visible to `user`.
+
+    On SQLite the candidate set comes from the trigram FTS5 index
+    (see migration 0006), so the permission filter only runs against
+    matching rows. Very short queries and other backends fall back to
+    icontains on the user's own (already index-filtered) project set.
+    Rows carry `role` / `is_owner` from Project.objects.with_access_for()
+    and are .values() dicts of `fields` (plus match_rank).
+
+    Ordering: exact name match, then name/code prefix, then substring,
+    newest first within each bucket. Returns one queryset per shard
+    (each shard has its own search index), merged by SEARCH_PAGINATOR.
+    """
+    qs = Project.objects.accessible_to(user).with_access_for(user)
+
+    if uses_fts(q):
+        qs = qs.filter(id__in=RawSQL(FTS_MATCH_SQL, [_fts_phrase(q)]))
+    else:
+        qs = qs.filter(Q(name__icontains=q) | Q(public_code__icontains=q))
+
+    return qs.annotate(
+        match_rank=Case(
+            When(name__iexact=q, then=Value(0)),
+            When(Q(name__istartswith=q) | Q(public_code__istartswith=q), then=Value(1)),
+            default=Value(2),
+            output_field=IntegerField(),
+        )
+    ).order_by("match_rank", "-id").values(*fields, "match_rank").per_shard()
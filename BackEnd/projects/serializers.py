@@ -1,8 +1,14 @@
 from rest_framework import serializers
 from .models import Project
+from .members import MAX_BULK_OPERATIONS
 
 
 class ProjectListSerializer(serializers.ModelSerializer):
+    """
+    Field reference for project list rows. The list endpoints use the
+    hand-written projects.listings.serialize_projects (same output);
+    `manage.py bench_serialization` compares the two.
+    """
     role = serializers.CharField()
     is_owner = serializers.BooleanField()
 
@@ -16,3 +22,34 @@ class ProjectListSerializer(serializers.ModelSerializer):
             "role",
             "is_owner",
         ]
+
+
+class MemberSerializer(serializers.Serializer):
+    """
+    Shape of one submitted member. Only types are checked here: unknown
+    roles, the owner, duplicates and unregistered emails are reported per
+    entry by projects.members.
+    """
+    email = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    role = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+
+class MemberOperationSerializer(MemberSerializer):
+    op = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+
+
+class CreateProjectSerializer(serializers.Serializer):
+    name = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    members = MemberSerializer(many=True, required=False, allow_null=True)
+
+
+class BulkMembersSerializer(serializers.Serializer):
+    operations = MemberOperationSerializer(
+        many=True, allow_empty=False, max_length=MAX_BULK_OPERATIONS,
+    )
+
+
+class JoinProjectSerializer(serializers.Serializer):
+    # PINs typed as JSON numbers become strings
+    public_code = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    pin = serializers.CharField(required=False, allow_blank=True, allow_null=True)
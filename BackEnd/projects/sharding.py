@@ -0,0 +1,145 @@
+"""
+Sharding of projects across databases by project UUID.
+
+settings.PROJECT_SHARDS lists the database aliases holding projects,
+"default" first. A Project and all of its ProjectMember rows live on
+shard_for(project.id); users, the UserProjectIndex feed and everything
+else stay on "default", so the per-user lookup index is global.
+
+- Model instances are routed by ProjectShardRouter from their project id
+  (save, delete, related managers, create / bulk_create).
+- Queries by project id use `.for_project(project_id)`.
+- Per-user listings fan out with `.per_shard()`; KeysetPaginator merges
+  the per-shard pages (scatter-gather).
+
+With a single shard every query runs on "default" exactly as before.
+Read replicas (config.db_router) only mirror "default". Cross-shard
+foreign keys are declared with db_constraint=False; the ORM cascade from
+a deleted User is extended to the other shards by projects.signals.
+"""
+import hashlib
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import models, transaction
+
+PRIMARY = "default"
+
+SHARDED_MODELS = {"projects.project", "projects.projectmember"}
+
+
+def shard_aliases():
+    return settings.PROJECT_SHARDS
+
+
+def is_sharded():
+    return len(settings.PROJECT_SHARDS) > 1
+
+
+def shard_for(project_id):
+    shards = settings.PROJECT_SHARDS
+    if len(shards) == 1:
+        return shards[0]
+    if not isinstance(project_id, uuid.UUID):
+        project_id = uuid.UUID(str(project_id))
+    digest = hashlib.blake2b(project_id.bytes, digest_size=8).digest()
+    return shards[int.from_bytes(digest, "big") % len(shards)]
+
+
+def shard_of(instance):
+    """Shard of a Project, or of any row carrying a project_id"""
+    if instance._meta.label_lower == "projects.project":
+        return shard_for(instance.pk)
+    project_id = getattr(instance, "project_id", None)
+    return shard_for(project_id) if project_id is not None else None
+
+
+def group_by_shard(project_ids):
+    """{alias: [project_id, ...]} for the given ids"""
+    groups = {}
+    for project_id in project_ids:
+        groups.setdefault(shard_for(project_id), []).append(project_id)
+    return groups
+
+
+def atomic_for_project(project_id):
+    """
+    transaction.atomic() on the project's shard and on "default", where
+    the feed index is written. Not a distributed transaction: the default
+    block commits first.
+    """
+    stack = ExitStack()
+    shard = shard_for(project_id)
+    stack.enter_context(transaction.atomic(using=shard))
+    if shard != PRIMARY:
+        stack.enter_context(transaction.atomic(using=PRIMARY))
+    return stack
+
+
+class ShardedQuerySet(models.QuerySet):
+    """QuerySet for models stored on the project shards"""
+
+    def for_project(self, project_id):
+        return self.using(shard_for(project_id))
+
+    def per_shard(self):
+        """This queryset on every shard (just itself when unsharded)"""
+        if not is_sharded():
+            return [self]
+        return [self.using(alias) for alias in shard_aliases()]
+
+    def _by_shard(self, objs):
+        groups = {}
+        for obj in objs:
+            groups.setdefault(shard_of(obj), []).append(obj)
+        return groups
+
+    def create(self, **kwargs):
+        if self._db is not None or not is_sharded():
+            return super().create(**kwargs)
+        obj = self.model(**kwargs)
+        obj.save(force_insert=True, using=shard_of(obj))
+        return obj
+
+    def bulk_create(self, objs, *args, **kwargs):
+        if self._db is not None or not is_sharded():
+            return super().bulk_create(objs, *args, **kwargs)
+        objs = list(objs)
+        for alias, group in self._by_shard(objs).items():
+            self.using(alias).bulk_create(group, *args, **kwargs)
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        if self._db is not None or not is_sharded():
+            return super().bulk_update(objs, fields, *args, **kwargs)
+        return sum(
+            self.using(alias).bulk_update(group, fields, *args, **kwargs)
+            for alias, group in self._by_shard(objs).items()
+        )
+
+
+class ProjectShardRouter:
+    """
+    Routes Project / ProjectMember instances to their shard. Queries
+    without an instance fall through to the next router (the primary),
+    which is why code reading by project id uses .for_project().
+    """
+
+    def _db_for_instance(self, model, **hints):
+        if not is_sharded() or model._meta.label_lower not in SHARDED_MODELS:
+            return None
+        instance = hints.get("instance")
+        return shard_of(instance) if instance is not None else None
+
+    db_for_read = _db_for_instance
+    db_for_write = _db_for_instance
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == PRIMARY or db not in shard_aliases():
+            return None
+        # Shards only hold the sharded tables (plus the projects app's
+        # raw SQL, e.g. the search index)
+        return app_label == "projects" and (
+            model_name is None or f"projects.{model_name}" in SHARDED_MODELS
+        )
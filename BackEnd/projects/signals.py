@@ -0,0 +1,186 @@
+import threading
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver, Signal
+
+from .models import Project, ProjectMember, ProjectName, UserProjectIndex
+from . import feed
+from .access import project_access
+from .autocomplete import autocomplete_index
+from .changes import record_on_commit
+from .events import publish_on_commit
+from .sharding import is_sharded, shard_aliases
+from . import versions
+
+# Batch-shaped membership signal: sender=ProjectMember, upserted=[...], removed=[...]
+# bulk_create / bulk_update bypass post_save, so bulk write paths call
+# notify_members_changed() themselves; everything else arrives through the
+# model signals below.
+members_changed = Signal()
+
+_batch = threading.local()
+
+
+@contextmanager
+def batched_member_changes():
+    """
+    Collect membership changes made inside the block and send them as a
+    single members_changed signal on exit, so receivers run O(1) queries
+    per batch instead of one per row. Nested blocks join the outer batch.
+    """
+    if getattr(_batch, "pending", None) is not None:
+        yield
+        return
+
+    _batch.pending = {"upserted": [], "removed": []}
+    try:
+        yield
+        pending = _batch.pending
+    finally:
+        _batch.pending = None
+
+    if pending["upserted"] or pending["removed"]:
+        members_changed.send(sender=ProjectMember, **pending)
+
+
+def notify_members_changed(upserted=(), removed=()):
+    pending = getattr(_batch, "pending", None)
+    if pending is not None:
+        pending["upserted"].extend(upserted)
+        pending["removed"].extend(removed)
+        return
+
+    members_changed.send(
+        sender=ProjectMember,
+        upserted=list(upserted),
+        removed=list(removed),
+    )
+
+
+# Connected first: a taken name fails the save before any other write
+@receiver(post_save, sender=Project)
+def reserve_project_name(sender, instance, created=False, update_fields=None, **kwargs):
+    if update_fields is not None and "name" not in update_fields:
+        return
+    name_ci = instance.name.lower()
+    if created or not ProjectName.objects.filter(project_id=instance.pk).update(name_ci=name_ci):
+        ProjectName.objects.create(project_id=instance.pk, name_ci=name_ci)
+
+
+@receiver(post_delete, sender=Project)
+def release_project_name(sender, instance, **kwargs):
+    ProjectName.objects.filter(project_id=instance.pk).delete()
+
+
+# Connected before project_saved / project_deleted: the feed rows still
+# include a previous owner
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def project_changed(sender, instance, created=False, signal=None, **kwargs):
+    """
+    Bump the ETag versions, log the change, push an event and update the
+    autocomplete index for every user who sees the project
+    """
+    user_ids = {instance.root_admin_id}
+    if not created:
+        user_ids.update(
+            UserProjectIndex.objects
+            .filter(project_id=instance.pk)
+            .values_list("user_id", flat=True)
+        )
+    using = instance._state.db
+    versions.bump([versions.project_key(instance.pk), *map(versions.user_key, user_ids)])
+    record_on_commit([(user_id, instance.pk) for user_id in user_ids], using=using)
+    publish_on_commit(user_ids, {
+        "type": "project",
+        "project_id": str(instance.pk),
+        "deleted": signal is post_delete,
+    }, using=using)
+    autocomplete_index.project_changed_on_commit(instance, user_ids, deleted=signal is post_delete)
+
+
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, **kwargs):
+    feed.index_project(instance)
+
+
+@receiver(post_delete, sender=Project)
+def project_deleted(sender, instance, **kwargs):
+    # UserProjectIndex.project does not cascade (it may span shards)
+    feed.unindex_project(instance)
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def invalidate_project_access(sender, instance, **kwargs):
+    # Renames, ownership changes, deletion
+    project_access.invalidate_project(instance)
+
+
+@receiver(post_save, sender=ProjectMember)
+def member_saved(sender, instance, **kwargs):
+    notify_members_changed(upserted=[instance])
+
+
+@receiver(post_delete, sender=ProjectMember)
+def member_deleted(sender, instance, **kwargs):
+    notify_members_changed(removed=[instance])
+
+
+@receiver(members_changed)
+def update_feed_index(sender, upserted, removed, **kwargs):
+    feed.index_memberships(upserted)
+    feed.unindex_memberships(removed)
+
+
+@receiver(members_changed)
+def invalidate_member_access(sender, upserted, removed, **kwargs):
+    project_access.invalidate_memberships([*upserted, *removed])
+
+
+@receiver(members_changed)
+def update_member_autocomplete(sender, upserted, removed, **kwargs):
+    autocomplete_index.memberships_changed_on_commit(upserted, removed)
+
+
+@receiver(members_changed)
+def membership_changed(sender, upserted, removed, **kwargs):
+    memberships = [*upserted, *removed]
+    versions.bump([
+        key
+        for m in memberships
+        for key in (versions.user_key(m.user_id), versions.project_key(m.project_id))
+    ])
+
+    by_db = {}
+    for m in memberships:
+        by_db.setdefault(m._state.db, []).append(m)
+    for using, memberships in by_db.items():
+        record_on_commit([(m.user_id, m.project_id) for m in memberships], using=using)
+
+    for m, role in [*((m, m.role) for m in upserted), *((m, None) for m in removed)]:
+        publish_on_commit([m.user_id], {
+            "type": "membership",
+            "project_id": str(m.project_id),
+            "role": role,
+        }, using=m._state.db)
+
+
+@receiver(pre_delete, sender=User)
+def delete_user_projects(sender, instance, using, **kwargs):
+    """
+    The ORM cascade from a User stays on its own database: delete the
+    user's projects and memberships on the other shards too. Their feed
+    index rows go with them through the receivers above.
+    """
+    if not is_sharded():
+        return
+    for alias in shard_aliases():
+        if alias == using:
+            continue
+        with transaction.atomic(using=alias), batched_member_changes():
+            ProjectMember.objects.using(alias).filter(user_id=instance.pk).delete()
+            Project.objects.using(alias).filter(root_admin_id=instance.pk).delete()
@@ -1,3 +1,974 @@
-from django.test import TestCase
+import time
+import uuid
+from datetime import timedelta
+from importlib import import_module
+from types import SimpleNamespace
+from functools import partial
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from config.testing import database_snapshot
+from users.authentication import user_cache
+from users.revocation import arevoke_token
+
+from .access import ProjectAccessCache
+from .async_views import _token_still_valid
+from .changes import purge
+from .checks import check_client_ip, check_join_cache
+from .events import event_stream
+from .feed import backfill
+from .joining import client_ip
+from .listings import overview_queryset
+from .members import MAX_BULK_OPERATIONS
+from .models import (
+    Project, ProjectChange, ProjectMember, ProjectName, UserProjectIndex, VersionCounter,
+)
+from .sharding import atomic_for_project, shard_for
+from .utils import uuid7
+from .versions import current_versions, user_key
+
+uuid7_migration = import_module("projects.migrations.0010_uuid7_project_ids")
+
+PASSWORD = "Abcdef1@"
+
+
+class APITestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        # Test transactions never commit, so nothing invalidates users cached
+        # by an earlier test under a reused primary key
+        user_cache.local.clear()
+
+    def login(self, email):
+        if not User.objects.filter(email=email).exists():
+            response = self.client.post("/api/auth/register/", {
+                "fullname": email.split("@")[0],
+                "email": email,
+                "password": PASSWORD,
+                "confirmPassword": PASSWORD,
+            }, content_type="application/json")
+            self.assertEqual(response.status_code, 201, response.content)
+        response = self.client.post(
+            "/api/auth/login/", {"email": email, "password": PASSWORD},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return {"Authorization": f"Bearer {response.json()['tokens']['access']}"}
+
+    def post(self, url, data, headers, **extra):
+        return self.client.post(url, data, content_type="application/json", headers=headers, **extra)
+
+    def create_project(self, name, headers, members=()):
+        response = self.post("/api/projects/create/", {"name": name, "members": list(members)}, headers)
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.json()
+
+
+class VersionTests(APITestCase):
+
+    def test_counters_live_in_the_database(self):
+        owner = self.login("owner@example.com")
+        project = self.create_project("Versioned", owner)
+        user_id = User.objects.get(email="owner@example.com").pk
+
+        etag = self.client.get("/api/projects/owned/", headers=owner)["ETag"]
+        self.assertEqual(
+            self.client.get("/api/projects/owned/", headers=owner, HTTP_IF_NONE_MATCH=etag).status_code,
+            304,
+        )
+
+        # Another worker's write: nothing shared but the database
+        renamed = Project.objects.get(pk=project["id"])
+        renamed.name = "Renamed"
+        renamed.save()
+        cache.clear()
+
+        response = self.client.get("/api/projects/owned/", headers=owner, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"][0]["name"], "Renamed")
+        self.assertTrue(VersionCounter.objects.filter(key=user_key(user_id)).exists())
+
+    def test_bumps_never_repeat_a_value(self):
+        owner = User.objects.create(username="owner")
+        key = user_key(owner.pk)
+        self.assertEqual(current_versions([key]), [0])
+        # Ahead of the clock (e.g. written by a host whose clock ran fast)
+        VersionCounter.objects.create(key=key, value=2**62)
+
+        Project.objects.create(name="Bumped", root_admin=owner, access_key_hash="x", pin_hash="x")
+        self.assertGreater(current_versions([key])[0], 2**62)
+
+
+class MemberOperationTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.owner = self.login("owner@example.com")
+        for email in ("ann@example.com", "ben@example.com"):
+            self.login(email)
+        self.project = self.create_project("Team", self.owner, members=[
+            {"email": "ann@example.com", "role": "user"},
+        ])
+        self.url = f"/api/projects/{self.project['id']}/members/bulk/"
+
+    def roles(self):
+        return dict(
+            ProjectMember.objects.filter(project_id=self.project["id"])
+            .values_list("user__email", "role")
+        )
+
+    def test_bulk_operations(self):
+        response = self.post(self.url, {"operations": [
+            {"op": "add", "email": "Ben@example.com", "role": "admin"},
+            {"op": "set_role", "email": "ann@example.com", "role": "admin"},
+            {"op": "add", "email": "ben@example.com"},
+            {"op": "add", "email": "nobody@example.com"},
+            {"op": "remove", "email": "owner@example.com"},
+            {"op": "rename", "email": "ann@example.com"},
+            {"op": "add", "email": "ann@example.com", "role": "superuser"},
+        ]}, self.owner)
+
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(
+            [(r["status"], r.get("reason")) for r in response.json()["results"]],
+            [
+                ("added", None),
+                ("updated", None),
+                ("skipped", "duplicate"),
+                ("skipped", "not_registered"),
+                ("skipped", "owner"),
+                ("error", "invalid_operation"),
+                ("error", "invalid_role"),
+            ],
+        )
+        self.assertEqual(self.roles(), {"ann@example.com": "admin", "ben@example.com": "admin"})
+
+        response = self.post(self.url, {"operations": [
+            {"op": "remove", "email": "ann@example.com"},
+            {"op": "set_role", "email": "ben@example.com", "role": "admin"},
+        ]}, self.owner)
+        self.assertEqual(response.json()["summary"], {"removed": 1, "skipped": 1})
+        self.assertEqual(self.roles(), {"ben@example.com": "admin"})
+
+    def test_only_admins_manage_members(self):
+        ann = self.login("ann@example.com")
+        response = self.post(self.url, {"operations": [
+            {"op": "add", "email": "ben@example.com"},
+        ]}, ann)
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn("ben@example.com", self.roles())
+
+    def test_malformed_operations_are_rejected(self):
+        for operations in (
+            None,
+            [],
+            {"op": "add"},
+            ["ben@example.com"],
+            [{"op": "add", "email": ["ben@example.com"]}],
+            [{"op": "add", "email": "ben@example.com", "role": {"name": "admin"}}],
+            [{"op": True, "email": "ben@example.com"}],
+        ):
+            with self.subTest(operations=operations):
+                response = self.post(self.url, {"operations": operations}, self.owner)
+                self.assertEqual(response.status_code, 400, response.content)
+                self.assertIn("operations", response.json())
+        self.assertEqual(self.roles(), {"ann@example.com": "user"})
+
+    def test_operation_limit(self):
+        operations = [{"op": "remove", "email": "ann@example.com"}] * (MAX_BULK_OPERATIONS + 1)
+        response = self.post(self.url, {"operations": operations}, self.owner)
+        self.assertEqual(response.status_code, 400)
+
+    def test_initial_members(self):
+        created = self.create_project("Started", self.owner, members=[
+            {"email": "ann@example.com", "role": "admin"},
+            {"email": "BEN@example.com"},
+            {"email": "Ann@example.com", "role": "user"},
+            {"email": "owner@example.com"},
+            {"email": "nobody@example.com"},
+            {"email": "ben2@example.com", "role": "superuser"},
+        ])
+        self.assertEqual(created["members"], {
+            "added": ["ann@example.com", "BEN@example.com"],
+            "skipped": [
+                {"email": "Ann@example.com", "reason": "duplicate"},
+                {"email": "owner@example.com", "reason": "owner"},
+                {"email": "ben2@example.com", "reason": "invalid_role"},
+                {"email": "nobody@example.com", "reason": "not_registered"},
+            ],
+        })
+        self.assertEqual(
+            dict(ProjectMember.objects.filter(project_id=created["id"]).values_list("user__email", "role")),
+            {"ann@example.com": "admin", "ben@example.com": "user"},
+        )
+        self.assertEqual(UserProjectIndex.objects.filter(project_id=created["id"]).count(), 3)
+
+    def test_initial_members_take_a_constant_number_of_queries(self):
+        emails = [f"m{n}@example.com" for n in range(4)]
+        User.objects.bulk_create([User(username=e, email=e) for e in emails])
+
+        def create_queries(name, members):
+            with CaptureQueriesContext(connection) as queries:
+                self.create_project(name, self.owner, members=[{"email": e} for e in members])
+            return len(queries)
+
+        self.assertEqual(create_queries("One", emails[:1]), create_queries("Four", emails))
+
+    def test_malformed_initial_members_are_rejected(self):
+        for members in (
+            {"email": "ann@example.com"},
+            [{"email": 42.5, "role": []}],
+            [{"email": "ann@example.com", "role": ["admin"]}],
+        ):
+            with self.subTest(members=members):
+                response = self.post(
+                    "/api/projects/create/", {"name": "Typed", "members": members}, self.owner,
+                )
+                self.assertEqual(response.status_code, 400, response.content)
+                self.assertIn("members", response.json())
+        self.assertFalse(Project.objects.filter(name="Typed").exists())
+
+        response = self.post("/api/projects/create/", {"name": ["Typed"]}, self.owner)
+        self.assertEqual(response.status_code, 400)
+
+
+class AccessAnnotationTests(APITestCase):
+    """Project.objects.with_access_for(): role and is_owner in the same query"""
+
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create(username="owner", email="owner@example.com")
+        self.user = User.objects.create(username="user", email="user@example.com")
+        self.projects = {}
+        for name, role in (("Owned", None), ("Admin", "admin"), ("Member", "user"),
+                           ("Invited", "invited"), ("Stranger", None)):
+            root_admin = self.user if name == "Owned" else self.owner
+            project = Project.objects.create(
+                name=name, root_admin=root_admin, access_key_hash="x", pin_hash="x",
+            )
+            if role:
+                ProjectMember.objects.create(project=project, user=self.user, role=role)
+
+    def test_one_query_for_every_row(self):
+        with self.assertNumQueries(1):
+            rows = list(
+                Project.objects.with_access_for(self.user).order_by("name")
+                .values_list("name", "role", "is_owner")
+            )
+        self.assertEqual(rows, [
+            ("Admin", "admin", False),
+            ("Invited", "invited", False),
+            ("Member", "user", False),
+            ("Owned", "root_admin", True),
+            ("Stranger", None, False),
+        ])
+
+        project_id = Project.objects.get(name="Member").pk
+        with self.assertNumQueries(1):
+            self.assertEqual(overview_queryset(self.user, project_id).get().role, "user")
+
+    def test_list_queries_do_not_grow_with_the_rows(self):
+        headers = self.login("reader@example.com")
+        reader = User.objects.get(email="reader@example.com")
+
+        def joined_list_queries():
+            self.client.get("/api/projects/joined/", headers=headers)  # warm the caches
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get("/api/projects/joined/", {"limit": 50}, headers=headers)
+            self.assertEqual(response.status_code, 200)
+            return len(response.json()["results"]), len(queries)
+
+        ProjectMember.objects.create(project=Project.objects.get(name="Admin"), user=reader, role="user")
+        few = joined_list_queries()
+        for name in ("Member", "Invited", "Stranger"):
+            ProjectMember.objects.create(project=Project.objects.get(name=name), user=reader, role="admin")
+        many = joined_list_queries()
+        self.assertEqual((few[0], many[0]), (1, 4))
+        self.assertEqual(few[1], many[1])
+
+
+class FeedTests(APITestCase):
+    """The UserProjectIndex feed behind /api/projects/all/"""
+
+    def setUp(self):
+        super().setUp()
+        self.owner = self.login("owner@example.com")
+        self.login("ann@example.com")
+        self.project = self.create_project("Team", self.owner, members=[
+            {"email": "ann@example.com", "role": "user"},
+        ])
+
+    def rows(self):
+        return sorted(UserProjectIndex.objects.values_list("user__email", "project_id", "role", "is_owner"))
+
+    def test_backfill_rewrites_and_sweeps_the_feed(self):
+        expected = self.rows()
+        self.assertEqual(len(expected), 2)
+
+        UserProjectIndex.objects.filter(is_owner=True).delete()
+        UserProjectIndex.objects.filter(is_owner=False).update(role="admin")
+        # Left behind by a project deleted without the signals
+        UserProjectIndex.objects.create(
+            user=User.objects.get(email="ann@example.com"), project_id=uuid.uuid4(),
+            role="user", sort_at=timezone.now(),
+        )
+
+        self.assertEqual(backfill(batch_size=1), (2, 1))
+        self.assertEqual(self.rows(), expected)
+
+    def feed(self, headers):
+        names, cursor = [], None
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            data = self.client.get("/api/projects/all/", params, headers=headers).json()
+            names += [(row["name"], row["role"], row["is_owner"]) for row in data["results"]]
+            if not (cursor := data["next_cursor"]):
+                return names
+
+    def members(self, project, *operations):
+        url = f"/api/projects/{project['id']}/members/bulk/"
+        response = self.post(url, {"operations": list(operations)}, self.owner)
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_all_merges_owned_and_joined_newest_first(self):
+        ann = self.login("ann@example.com")
+        self.create_project("Own", ann)
+        later = self.create_project("Later", self.owner)
+        self.members(later, {"op": "add", "email": "ann@example.com", "role": "admin"})
+
+        self.assertEqual(self.feed(ann), [
+            ("Later", "admin", False), ("Own", "root_admin", True), ("Team", "user", False),
+        ])
+        self.members(self.project, {"op": "set_role", "email": "ann@example.com", "role": "admin"})
+        self.members(later, {"op": "remove", "email": "ann@example.com"})
+        self.assertEqual(self.feed(ann), [("Own", "root_admin", True), ("Team", "admin", False)])
+
+
+class SearchTests(APITestCase):
+    """/api/projects/search/: the trigram FTS5 index, icontains below 3 characters"""
+
+    def setUp(self):
+        super().setUp()
+        self.owner = self.login("owner@example.com")
+        for name in ("The Alpha Team", "Alpha", "Alphabet", "Beta"):
+            self.create_project(name, self.owner)
+        self.create_project("Alpha Elsewhere", self.login("other@example.com"))
+
+    def search(self, q):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/projects/search/", {"q": q}, headers=self.owner)
+        self.assertEqual(response.status_code, 200, response.content)
+        used_fts = any("projects_project_fts" in query["sql"] for query in queries)
+        return [row["name"] for row in response.json()["results"]], used_fts
+
+    def test_ranking(self):
+        # Exact name, then prefix, then substring; only the caller's projects
+        self.assertEqual(self.search("alpha"), (["Alpha", "Alphabet", "The Alpha Team"], True))
+        # Newest first within a bucket
+        self.assertEqual(self.search("pha"), (["Alphabet", "Alpha", "The Alpha Team"], True))
+        public_code = Project.objects.get(name="Beta").public_code
+        self.assertEqual(self.search(public_code.lower()), (["Beta"], True))
+
+    def test_short_queries_fall_back_to_icontains(self):
+        self.assertEqual(self.search("al"), (["Alphabet", "Alpha", "The Alpha Team"], False))
+        self.assertEqual(self.search("et"), (["Beta", "Alphabet"], False))
+
+    def test_index_follows_renames_and_deletes(self):
+        project = Project.objects.get(name="Beta")
+        project.name = "Gamma"
+        project.save()
+        self.assertEqual(self.search("beta"), ([], True))
+        self.assertEqual(self.search("gamm"), (["Gamma"], True))
+        project.delete()
+        self.assertEqual(self.search("gamm"), ([], True))
+
+
+class SparseFieldsTests(APITestCase):
+    """?fields= on the list, search and overview endpoints"""
+
+    def setUp(self):
+        super().setUp()
+        self.owner = self.login("owner@example.com")
+        self.login("ann@example.com")
+        project = self.create_project("Fields", self.owner, members=[{"email": "ann@example.com"}])
+        self.paths = [
+            "/api/projects/owned/", "/api/projects/joined/", "/api/projects/all/",
+            "/api/projects/search/", f"/api/projects/{project['id']}/overview/",
+        ]
+        self.ann = self.login("ann@example.com")
+
+    def get(self, path, **params):
+        headers = self.owner if "joined" not in path else self.ann
+        if "search" in path:
+            params["q"] = "fields"
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(path, params, headers=headers)
+        sql = " ".join(query["sql"] for query in queries)
+        self.assertNotIn("pin_hash", sql)
+        self.assertNotIn("access_key_hash", sql)
+        return response
+
+    def test_only_the_requested_fields(self):
+        for path in self.paths:
+            with self.subTest(path=path):
+                response = self.get(path, fields=" role, name ,")
+                self.assertEqual(response.status_code, 200, response.content)
+                data = response.json()
+                row = data["results"][0] if "results" in data else data
+                self.assertEqual(list(row), ["id", "name", "role"])
+                self.assertEqual(self.get(path).status_code, 200)
+
+    def test_only_whitelisted_fields(self):
+        for path in self.paths:
+            for fields in ("pin_hash", "name,access_key_hash", "root_admin"):
+                with self.subTest(path=path, fields=fields):
+                    response = self.get(path, fields=fields)
+                    self.assertEqual(response.status_code, 400, response.content)
+                    self.assertIn("fields", response.json())
+
+
+class AutocompleteTests(APITestCase):
+    """/api/projects/autocomplete/ and the index kept current by the signals"""
+
+    def setUp(self):
+        super().setUp()
+        self.owner = self.login("owner@example.com")
+        self.ann = self.login("ann@example.com")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_project("Apple Pie", self.ann)
+            self.team = self.create_project("Big Apple", self.owner, members=[
+                {"email": "ann@example.com", "role": "user"},
+            ])
+            self.create_project("Apple", self.owner)
+
+    def complete(self, q, **params):
+        response = self.client.get("/api/projects/autocomplete/", {"q": q, **params}, headers=self.ann)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [(row["name"], row["role"]) for row in response.json()["results"]]
+
+    def members(self, *operations):
+        url = f"/api/projects/{self.team['id']}/members/bulk/"
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.post(url, {"operations": list(operations)}, self.owner)
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_prefix_ranking(self):
+        # Name prefix before word prefix; only the caller's projects
+        self.assertEqual(self.complete("APP"), [("Apple Pie", "root_admin"), ("Big Apple", "user")])
+        self.assertEqual(self.complete("pi"), [("Apple Pie", "root_admin")])
+        self.assertEqual(self.complete("app", limit=1), [("Apple Pie", "root_admin")])
+        self.assertEqual(self.complete(self.team["public_code"][:6].lower()), [("Big Apple", "user")])
+        self.assertEqual(self.complete("ple"), [])
+
+    def test_results_follow_member_changes(self):
+        self.assertEqual(self.complete("big"), [("Big Apple", "user")])
+        self.members({"op": "set_role", "email": "ann@example.com", "role": "admin"})
+        self.assertEqual(self.complete("big"), [("Big Apple", "admin")])
+        self.members({"op": "remove", "email": "ann@example.com"})
+        self.assertEqual(self.complete("big"), [])
+        self.members({"op": "add", "email": "ann@example.com", "role": "user"})
+        self.assertEqual(self.complete("big"), [("Big Apple", "user")])
+
+        project = Project.objects.get(pk=self.team["id"])
+        project.name = "Huge Apple"
+        with self.captureOnCommitCallbacks(execute=True):
+            project.save()
+        self.assertEqual(self.complete("big"), [])
+        self.assertEqual(self.complete("hug"), [("Huge Apple", "user")])
+        with self.captureOnCommitCallbacks(execute=True):
+            project.delete()
+        self.assertEqual(self.complete("hug"), [])
+
+
+class ChangesTests(APITestCase):
+
+    def changes(self, headers, since=None):
+        params = {"since": since} if since else {}
+        response = self.client.get("/api/projects/changes/", params, headers=headers)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_bootstrap_token_is_read_before_the_lists(self):
+        self.login("owner@example.com")
+        response = self.post("/api/auth/login/?include=bootstrap", {
+            "email": "owner@example.com", "password": PASSWORD,
+        }, headers={})
+        owner = {"Authorization": f"Bearer {response.json()['tokens']['access']}"}
+        bootstrap = response.json()["bootstrap"]
+        self.assertEqual(bootstrap["owned"]["results"], [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            project = self.create_project("Later", owner)
+
+        changes = self.changes(owner, bootstrap["since"])
+        self.assertEqual([row["name"] for row in changes["upserted"]], ["Later"])
+        self.assertEqual(changes["upserted"][0]["id"], project["id"])
+
+    def test_positions_are_not_reused_after_a_purge(self):
+        owner = self.login("owner@example.com")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_project("Old", owner)
+            self.create_project("Older", owner)
+        since = self.changes(owner)["since"]
+        last = ProjectChange.objects.latest("id").pk
+
+        expired = ProjectChange.objects.update(changed_at=timezone.now() - timedelta(days=365))
+        self.assertEqual(purge(), expired - 1)
+        # The newest row stays so that the next id cannot restart below it
+        self.assertEqual(list(ProjectChange.objects.values_list("id", flat=True)), [last])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_project("New", owner)
+        self.assertGreater(ProjectChange.objects.latest("id").pk, last)
+        changes = self.changes(owner, since)
+        self.assertEqual([row["name"] for row in changes["upserted"]], ["New"])
+
+
+@override_settings(
+    PROJECT_JOIN={**settings.PROJECT_JOIN, "PER_IP": 5, "PER_CODE_IP": 3, "PER_CODE": 4},
+    CLIENT_IP={"HEADER": "HTTP_X_FORWARDED_FOR", "PROXY_COUNT": 1},
+)
+class JoinTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        owner = self.login("owner@example.com")
+        self.project = self.create_project("Joinable", owner)
+        self.guest = self.login("guest@example.com")
+
+    def join(self, pin, address="203.0.113.1", code=None, headers=None):
+        return self.post("/api/projects/join/", {
+            "public_code": code or self.project["public_code"], "pin": pin,
+        }, headers or self.guest, HTTP_X_FORWARDED_FOR=address)
+
+    def test_join_with_the_pin(self):
+        response = self.join(self.project["pin"])
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual((response.json()["role"], response.json()["joined"]), ("user", True))
+        self.assertEqual(self.join(self.project["pin"]).status_code, 200)
+        self.assertEqual(self.join("wrong").status_code, 403)
+
+    def test_malformed_requests(self):
+        for data in (
+            {"public_code": ["x"], "pin": "1"},
+            {"public_code": self.project["public_code"], "pin": {"pin": "1"}},
+        ):
+            with self.subTest(data=data):
+                response = self.post("/api/projects/join/", data, self.guest)
+                self.assertEqual(response.status_code, 400, response.content)
+        response = self.post("/api/projects/join/", {"public_code": "", "pin": ""}, self.guest)
+        self.assertEqual(response.status_code, 400)
+
+    def test_guessing_from_one_address_locks_only_that_address(self):
+        statuses = [self.join("wrong").status_code for _ in range(4)]
+        self.assertEqual(statuses, [403, 403, 403, 429])
+        self.assertEqual(self.join(self.project["pin"]).status_code, 429)
+
+        response = self.join("wrong")
+        self.assertEqual(response["Retry-After"], str(settings.PROJECT_JOIN["WINDOW"]))
+        # Someone else can still join
+        self.assertEqual(self.join(self.project["pin"], address="198.51.100.7").status_code, 201)
+
+    def test_per_address_limit_spans_codes(self):
+        other = self.create_project("Other", self.login("owner@example.com"))
+        statuses = [self.join("wrong").status_code for _ in range(3)]
+        statuses += [self.join("wrong", code=other["public_code"]).status_code for _ in range(3)]
+        self.assertEqual(statuses, [403, 403, 403, 403, 403, 429])
+
+    def test_unknown_codes_count_against_the_address(self):
+        statuses = [self.join("1234", code=f"NOPE-{n}").status_code for n in range(4)]
+        statuses += [self.join("wrong").status_code, self.join("1234", code="NOPE-4").status_code]
+        self.assertEqual(statuses, [404, 404, 404, 404, 403, 429])
+        self.assertEqual(self.join("1234", code="NOPE-5", address="198.51.100.7").status_code, 404)
+
+    def test_failures_from_many_addresses_lock_the_code(self):
+        for n in range(4):
+            self.assertEqual(self.join("wrong", address=f"198.51.100.{n}").status_code, 403)
+        self.assertEqual(self.join(self.project["pin"], address="192.0.2.1").status_code, 429)
+
+    def test_correct_pins_do_not_count_against_the_code(self):
+        for n in range(6):
+            headers = self.login(f"member{n}@example.com")
+            response = self.join(self.project["pin"], address=f"198.51.100.{n}", headers=headers)
+            self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self.join("wrong").status_code, 403)
+
+    def test_client_ip(self):
+        request = RequestFactory().get(
+            "/", REMOTE_ADDR="10.0.0.2", HTTP_X_FORWARDED_FOR="1.2.3.4, 203.0.113.9",
+        )
+        # The proxy's entry, not the one the client made up
+        self.assertEqual(client_ip(request), "203.0.113.9")
+        with override_settings(CLIENT_IP={"HEADER": "HTTP_X_FORWARDED_FOR", "PROXY_COUNT": 0}):
+            self.assertEqual(client_ip(request), "10.0.0.2")
+        with override_settings(CLIENT_IP={"HEADER": "HTTP_X_FORWARDED_FOR", "PROXY_COUNT": 3}):
+            self.assertEqual(client_ip(request), "10.0.0.2")
+
+    def test_deploy_check_requires_the_proxy_count(self):
+        with override_settings(CLIENT_IP={**settings.CLIENT_IP, "PROXY_COUNT": None}):
+            self.assertEqual([e.id for e in check_client_ip(None)], ["projects.E003"])
+        with override_settings(CLIENT_IP={**settings.CLIENT_IP, "PROXY_COUNT": 0}):
+            self.assertEqual(check_client_ip(None), [])
+
+    def test_deploy_check_rejects_a_per_process_cache(self):
+        self.assertEqual([e.id for e in check_join_cache(None)], ["projects.E001"])
+        with override_settings(CACHES={
+            **settings.CACHES,
+            "shared": {"BACKEND": "django.core.cache.backends.redis.RedisCache", "LOCATION": ""},
+        }, PROJECT_JOIN={**settings.PROJECT_JOIN, "CACHE": "shared"}):
+            self.assertEqual(check_join_cache(None), [])
+
+
+@override_settings(PROJECT_EVENTS={**settings.PROJECT_EVENTS, "HEARTBEAT": 0.01})
+class EventStreamTests(TestCase):
+    """projects.events.event_stream, with a heartbeat every 10 ms"""
+
+    def setUp(self):
+        self.user = User.objects.create(username="listener", email="listener@example.com")
+
+    async def open_stream(self, token):
+        stream = event_stream(self.user.pk, time.time() + 60, partial(_token_still_valid, token))
+        chunks = [await anext(stream), await anext(stream)]
+        return stream, chunks
+
+    async def test_revoked_token_closes_the_stream(self):
+        token = AccessToken.for_user(self.user)
+        stream, chunks = await self.open_stream(token)
+        self.assertEqual(chunks, ["retry: 5000\n\n", ": ping\n\n"])
+
+        await arevoke_token(token)
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+
+    async def test_deactivated_user_closes_the_stream(self):
+        stream, _ = await self.open_stream(AccessToken.for_user(self.user))
+        self.user.is_active = False
+        await self.user.asave(update_fields=["is_active"])
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+
+    def add_member(self, project):
+        with self.captureOnCommitCallbacks(execute=True):
+            ProjectMember.objects.create(project=project, user=self.user, role="admin")
+
+    async def test_delivers_events_until_the_token_expires(self):
+        owner = await User.objects.acreate(username="owner", email="owner@example.com")
+        project = await Project.objects.acreate(
+            name="Pushed", root_admin=owner, access_key_hash="x", pin_hash="x",
+        )
+        expires_at = time.time() + 0.5
+        stream = event_stream(self.user.pk, expires_at)
+        self.assertEqual(await anext(stream), "retry: 5000\n\n")
+
+        await sync_to_async(self.add_member)(project)
+        chunks = [chunk async for chunk in stream if chunk != ": ping\n\n"]
+        self.assertGreaterEqual(time.time(), expires_at)
+        self.assertEqual(chunks, [
+            "event: membership\ndata: "
+            f'{{"type": "membership", "project_id": "{project.pk}", "role": "admin"}}\n\n',
+        ])
+
+
+class AccessCacheTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.owner = User.objects.create(username="owner", email="owner@example.com")
+        self.member = User.objects.create(username="member", email="member@example.com")
+        self.project = Project.objects.create(
+            name="Guarded", root_admin=self.owner, access_key_hash="x", pin_hash="x",
+        )
+        ProjectMember.objects.create(project=self.project, user=self.member, role="user")
+
+    def access_cache(self, shared=False):
+        return ProjectAccessCache(
+            ttl=60, max_entries=100, shared_alias="default" if shared else None, shared_local_ttl=5,
+        )
+
+    def resolve_while(self, access_cache, write):
+        """resolve() for the member, running `write` right after its database read"""
+        def overview(user, project_id):
+            project = overview_queryset(user, project_id).first()
+            write()
+            return mock.Mock(first=mock.Mock(return_value=project))
+
+        with mock.patch("projects.access.overview_queryset", overview):
+            return access_cache.resolve(self.member, self.project.pk)[1]
+
+    def promote(self, *access_caches):
+        ProjectMember.objects.filter(user=self.member).update(role="admin")
+        for access_cache in access_caches:
+            access_cache.delete_many([access_cache.role_key(self.project.pk, self.member.pk)])
+
+    def test_fill_racing_an_invalidation_is_not_cached(self):
+        access_cache = self.access_cache()
+        self.assertEqual(self.resolve_while(access_cache, lambda: self.promote(access_cache)), "user")
+        self.assertEqual(access_cache.role_for(self.member, self.project.pk), "admin")
+        self.assertEqual(access_cache.misses, 2)
+
+    def test_shared_fill_racing_another_process_is_ignored(self):
+        filling, writing, reading = (self.access_cache(shared=True) for _ in range(3))
+        self.assertEqual(self.resolve_while(filling, lambda: self.promote(writing)), "user")
+
+        self.assertEqual(reading.role_for(self.member, self.project.pk), "admin")
+        self.assertEqual(reading.misses, 1)
+        # The corrected entry is shared
+        another = self.access_cache(shared=True)
+        self.assertEqual(another.role_for(self.member, self.project.pk), "admin")
+        self.assertEqual(another.misses, 0)
+
+    def test_shared_tier_shortens_the_local_ttl(self):
+        self.assertEqual(self.access_cache().local.ttl, 60)
+        self.assertEqual(self.access_cache(shared=True).local.ttl, 5)
+
+
+class UUID7Tests(TestCase):
+
+    def test_layout_and_order(self):
+        ids = [uuid7() for _ in range(5000)]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual({(u.version, u.variant) for u in ids}, {(7, uuid.RFC_4122)})
+
+        now_ms = time.time_ns() // 1_000_000
+        self.assertLessEqual(abs((ids[-1].int >> 80) - now_ms), 1000)
+        earlier, later = uuid7(now_ms - 1), uuid7(now_ms)
+        self.assertEqual(earlier.int >> 80, now_ms - 1)
+        self.assertLess(earlier, later)
+
+    def test_migration_rekeys_existing_projects_by_creation_time(self):
+        owner = User.objects.create(username="owner", email="owner@example.com")
+        member = User.objects.create(username="member", email="member@example.com")
+        now = timezone.now()
+        for age in (1, 3, 2):
+            project = Project.objects.create(
+                id=uuid.uuid4(), name=f"Old {age}", root_admin=owner, access_key_hash="x", pin_hash="x",
+            )
+            Project.objects.filter(pk=project.pk).update(created_at=now - timedelta(days=age))
+            ProjectMember.objects.create(project=project, user=member, role="user")
+
+        uuid7_migration.rekey_projects(apps, SimpleNamespace(connection=connection))
+
+        projects = list(Project.objects.order_by("id"))
+        self.assertEqual([p.name for p in projects], ["Old 3", "Old 2", "Old 1"])
+        self.assertTrue(all(p.id.version == 7 for p in projects))
+        self.assertEqual(
+            set(ProjectMember.objects.values_list("project_id", flat=True)), {p.id for p in projects},
+        )
+        self.assertEqual(
+            set(UserProjectIndex.objects.filter(user=member).values_list("project_id", flat=True)),
+            {p.id for p in projects},
+        )
+
+
+class KeysetPaginationTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.owner = self.login("owner@example.com")
+        root_admin = User.objects.get(email="owner@example.com")
+        for n in range(5):
+            Project.objects.create(name=f"P{n}", root_admin=root_admin, access_key_hash="x", pin_hash="x")
+
+    def page(self, cursor=None, url="/api/projects/owned/"):
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = self.client.get(url, params, headers=self.owner)
+        self.assertEqual(response.status_code, 200, response.content)
+        data = response.json()
+        data["names"] = [row["name"] for row in data["results"]]
+        return data
+
+    def test_forward_and_backward(self):
+        first = self.page()
+        second = self.page(first["next_cursor"])
+        last = self.page(second["next_cursor"])
+        self.assertEqual(
+            [first["names"], second["names"], last["names"]],
+            [["P4", "P3"], ["P2", "P1"], ["P0"]],
+        )
+        self.assertEqual((first["prev_cursor"], last["has_more"], last["next_cursor"]), (None, False, None))
+
+        back = self.page(last["prev_cursor"])
+        self.assertEqual(back["names"], ["P2", "P1"])
+        self.assertTrue(back["has_more"])
+        back = self.page(back["prev_cursor"])
+        self.assertEqual(back["names"], ["P4", "P3"])
+        self.assertIsNone(back["prev_cursor"])
+        self.assertEqual(self.page(back["next_cursor"])["names"], ["P2", "P1"])
+
+    def test_tampered_cursors_are_rejected(self):
+        cursor = self.page()["next_cursor"]
+        payload, signature = cursor.rsplit(":", 1)
+        key = [str(Project.objects.get(name="P0").pk)]
+        for tampered in (
+            "garbage",
+            f"{payload}x:{signature}",
+            f"{payload}:{signature[::-1]}",
+            # Well formed, but not signed by this paginator
+            signing.dumps({"d": "next", "k": key}, salt="projects.other"),
+            signing.dumps({"d": "next", "k": key}, salt="projects.owned", key="not-the-secret"),
+        ):
+            with self.subTest(cursor=tampered):
+                response = self.client.get(
+                    "/api/projects/owned/", {"cursor": tampered}, headers=self.owner,
+                )
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(response.json(), {"detail": "Invalid cursor"})
+
+        # Cursors are only valid on the list that issued them
+        response = self.client.get("/api/projects/joined/", {"cursor": cursor}, headers=self.owner)
+        self.assertEqual(response.status_code, 404)
+
+
+@override_settings(PROJECT_SHARDS=["default", "shard_1"])
+class ShardingTests(APITestCase):
+    """shard_1 is an empty snapshot of the test database: a second shard"""
+    databases = "__all__"
+
+    @classmethod
+    def setUpClass(cls):
+        cls.enterClassContext(database_snapshot("shard_1"))
+        super().setUpClass()
+
+    def setUp(self):
+        super().setUp()
+        self.owner = self.login("owner@example.com")
+        self.root_admin = User.objects.get(email="owner@example.com")
+
+    def make_projects(self, per_shard=3):
+        """Projects until every shard holds `per_shard` of them (ids are random)"""
+        by_shard = {"default": [], "shard_1": []}
+        n = 0
+        while min(map(len, by_shard.values())) < per_shard:
+            project = Project.objects.create(
+                name=f"P{n:02}", root_admin=self.root_admin, access_key_hash="x", pin_hash="x",
+            )
+            by_shard[shard_for(project.pk)].append(project)
+            n += 1
+        return by_shard
+
+    def login_as(self, user):
+        user.set_password(PASSWORD)
+        user.save()
+        return self.login(user.email)
+
+    def test_rows_live_on_their_project_shard(self):
+        member = User.objects.create(username="member", email="member@example.com")
+        created = self.create_project("Sharded", self.owner, members=[
+            {"email": "member@example.com", "role": "admin"},
+        ])
+        alias = shard_for(created["id"])
+        other = "shard_1" if alias == "default" else "default"
+
+        self.assertTrue(Project.objects.using(alias).filter(pk=created["id"]).exists())
+        self.assertFalse(Project.objects.using(other).filter(pk=created["id"]).exists())
+        self.assertEqual(
+            ProjectMember.objects.for_project(created["id"]).get(user=member).role, "admin",
+        )
+        self.assertFalse(ProjectMember.objects.using(other).exists())
+
+        for shard, projects in self.make_projects().items():
+            self.assertTrue(all(
+                Project.objects.using(shard).filter(pk=p.pk).exists() for p in projects
+            ))
+
+    def test_lists_merge_the_shards(self):
+        by_shard = self.make_projects()
+        projects = sorted((p for ps in by_shard.values() for p in ps), key=lambda p: p.pk, reverse=True)
+        member = User.objects.create(username="member", email="member@example.com")
+        for project in projects:
+            ProjectMember.objects.create(project=project, user=member, role="user")
+
+        names, cursor = [], None
+        while True:
+            params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+            data = self.client.get("/api/projects/owned/", params, headers=self.owner).json()
+            names += [row["name"] for row in data["results"]]
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+        self.assertEqual(names, [p.name for p in projects])
+
+        member_headers = self.login_as(member)
+        data = self.client.get("/api/projects/joined/", {"limit": 50}, headers=member_headers).json()
+        self.assertEqual(sorted(row["name"] for row in data["results"]), sorted(names))
+
+    def test_atomic_for_project_spans_the_shard_and_default(self):
+        project = self.make_projects(per_shard=1)["shard_1"][0]
+        member = User.objects.create(username="member", email="member@example.com")
+
+        with self.assertRaises(RuntimeError):
+            with atomic_for_project(project.pk):
+                ProjectMember.objects.create(project=project, user=member, role="user")
+                # The feed index row is written on "default"
+                self.assertTrue(UserProjectIndex.objects.filter(user=member).exists())
+                raise RuntimeError
+        self.assertFalse(ProjectMember.objects.using("shard_1").filter(user=member).exists())
+        self.assertFalse(UserProjectIndex.objects.filter(user=member).exists())
+
+        with atomic_for_project(project.pk):
+            ProjectMember.objects.create(project=project, user=member, role="user")
+        self.assertTrue(ProjectMember.objects.using("shard_1").filter(user=member).exists())
+        self.assertTrue(UserProjectIndex.objects.filter(user=member, project_id=project.pk).exists())
+
+    def test_names_are_unique_across_shards(self):
+        by_shard = self.make_projects(per_shard=1)
+        taken = by_shard["shard_1"][0]
+        response = self.post("/api/projects/create/", {"name": taken.name.lower()}, self.owner)
+        self.assertEqual(response.status_code, 400, response.content)
+
+        # A racing insert on the other shard passes the shard's own constraint
+        # but not the reservation on "default"
+        project = Project(name=taken.name.lower(), root_admin=self.root_admin, access_key_hash="x", pin_hash="x")
+        while shard_for(project.pk) != "default":
+            project = Project(name=project.name, root_admin=self.root_admin, access_key_hash="x", pin_hash="x")
+        with self.assertRaises(IntegrityError):
+            with atomic_for_project(project.pk):
+                project.save()
+        self.assertFalse(Project.objects.using("default").filter(pk=project.pk).exists())
+
+        renamed = by_shard["default"][0]
+        renamed.name = taken.name.upper()
+        with self.assertRaises(IntegrityError):
+            with atomic_for_project(renamed.pk):
+                renamed.save()
+
+        taken.delete()
+        self.assertFalse(ProjectName.objects.filter(project_id=taken.pk).exists())
+        self.assertEqual(self.create_project(taken.name, self.owner)["name"], taken.name)
+
+    def test_deleting_a_user_cleans_every_shard(self):
+        by_shard = self.make_projects(per_shard=1)
+        member = User.objects.create(username="member", email="member@example.com")
+        for projects in by_shard.values():
+            ProjectMember.objects.create(project=projects[0], user=member, role="user")
+        owned = {}
+        while len(owned) < 2:
+            project = Project.objects.create(
+                name=f"Owned {len(owned)}", root_admin=member, access_key_hash="x", pin_hash="x",
+            )
+            owned.setdefault(shard_for(project.pk), project)
+            if owned[shard_for(project.pk)] != project:
+                project.delete()
+        self.assertEqual(UserProjectIndex.objects.filter(user=member).count(), 4)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            member.delete()
+        for alias in ("default", "shard_1"):
+            self.assertFalse(ProjectMember.objects.using(alias).filter(user_id=member.pk).exists())
+            self.assertFalse(Project.objects.using(alias).filter(root_admin_id=member.pk).exists())
+            self.assertTrue(Project.objects.using(alias).filter(pk=by_shard[alias][0].pk).exists())
+        self.assertFalse(UserProjectIndex.objects.filter(user_id=member.pk).exists())
+        self.assertFalse(ProjectName.objects.filter(project_id__in=[p.pk for p in owned.values()]).exists())
@@ -1,10 +1,23 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import views, async_views
+
+# Read endpoints: native async under ASGI, DRF views otherwise
+reads = async_views if settings.ASYNC_PROJECT_VIEWS else views
 
 urlpatterns = [
-    path("owned/", views.owned_projects),
-    path("joined/", views.joined_projects),
-    path("search/", views.search_projects),
+    path("owned/", reads.owned_projects),
+    path("joined/", reads.joined_projects),
+    path("all/", reads.all_projects),
+    path("search/", reads.search_projects),
+    path("autocomplete/", reads.autocomplete_projects),
+    path("changes/", reads.project_changes),
     path("create/", views.create_project, name="create-project"),
-    path("<uuid:project_id>/overview/", views.project_overview),
-]
\ No newline at end of file
+    path("join/", views.join_project),
+    path("<uuid:project_id>/overview/", reads.project_overview),
+    path("<uuid:project_id>/members/bulk/", views.bulk_members),
+]
+
+if settings.ASYNC_PROJECT_VIEWS:
+    # Long-lived stream: ASGI only, a WSGI worker would be held per client
+    urlpatterns.append(path("events/", async_views.project_events))
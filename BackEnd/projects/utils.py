@@ -1,9 +1,51 @@
 import secrets
 import string
+import threading
+import time
+import uuid
 
 # Allowed special characters for project PIN
 SPECIAL_CHARS = "!@#$%&*"
 
+_uuid7_lock = threading.Lock()
+_uuid7_last_ms = 0
+_uuid7_counter = 0
+
+
+def uuid7(timestamp_ms: int | None = None) -> uuid.UUID:
+    """
+    Time-ordered UUID (RFC 9562 version 7).
+
+    Layout: 48-bit Unix timestamp in ms, version, a 12-bit counter, variant,
+    62 random bits. Ids sort by creation time, so inserts append to the
+    primary-key index and the id alone works as a keyset cursor.
+    Without `timestamp_ms`, ids from this process are strictly increasing
+    (the counter orders ids minted within the same millisecond).
+    """
+    global _uuid7_last_ms, _uuid7_counter
+
+    if timestamp_ms is None:
+        with _uuid7_lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > _uuid7_last_ms:
+                # Random start, leaving headroom to count up
+                _uuid7_last_ms, _uuid7_counter = now_ms, secrets.randbits(11)
+            else:
+                _uuid7_counter += 1
+                if _uuid7_counter > 0xFFF:
+                    _uuid7_last_ms, _uuid7_counter = _uuid7_last_ms + 1, 0
+            timestamp_ms, counter = _uuid7_last_ms, _uuid7_counter
+    else:
+        counter = secrets.randbits(12)
+
+    return uuid.UUID(int=(
+        (timestamp_ms & 0xFFFF_FFFF_FFFF) << 80
+        | 0x7 << 76
+        | counter << 64
+        | 0b10 << 62
+        | secrets.randbits(62)
+    ))
+
 
 def generate_project_pin(length: int = 8) -> str:
     """
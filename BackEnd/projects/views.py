@@ -1,195 +1,267 @@
+import asyncio
+import secrets
+from functools import partial
+
+from asgiref.sync import sync_to_async
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from django.db import transaction
-from django.db.models import Q, Value, BooleanField
+from django.db import IntegrityError
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from django.utils.dateparse import parse_datetime
-from django.contrib.auth.models import User
-import secrets
 
-from .models import Project, ProjectMember
-from .serializers import ProjectListSerializer
+from config.asyncapi import async_api_view, json_body
+from config.db_router import replica_reads
+from config.renderers import JSONResponse
+
+from .models import Project, ProjectMember, ProjectName
+from .access import project_access
+from .autocomplete import autocomplete_index, result_limit
+from .changes import changes_since
+from .joining import (
+    AttemptLimited, acount_unknown_code, afind_project, averify_pin, client_ip, normalize_code,
+)
+from .versions import conditional_on_versions, overview_keys, user_lists_keys
 from .utils import generate_project_pin
-
-DEFAULT_LIMIT = 10
-
-def cursor_paginate(queryset, cursor, limit):
-    """
-    Standard cursor pagination for descending order (-created_at).
-    Uses microsecond precision to prevent skip/repeat loops.
-    """
-    if cursor:
-        queryset = queryset.filter(created_at__lt=cursor)
-
-    # Fetch limit + 1 to determine if there's a next page
-    items = list(queryset[: limit + 1])
-    has_more = len(items) > limit
-    results = items[:limit]
-    
-    # Generate the cursor string using isoformat for standard parsing
-    next_cursor = results[-1].created_at.isoformat() if results and has_more else None
-    
-    return results, has_more, next_cursor
-
-
+from .search import search_projects_queryset
+from .listings import (
+    OWNED_PAGINATOR, JOINED_PAGINATOR, FEED_PAGINATOR, SEARCH_PAGINATOR,
+    owned_queryset, joined_queryset, feed_queryset,
+    load_feed_projects, serialize_projects, serialize_feed,
+    serialize_search_results, serialize_overview,
+    SEARCH_RESULT_FIELDS, requested_fields,
+)
+from .sharding import atomic_for_project
+from .members import add_initial_members, apply_member_operations
+from .serializers import (
+    BulkMembersSerializer, CreateProjectSerializer, JoinProjectSerializer,
+)
+
+@replica_reads
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@conditional_on_versions(user_lists_keys)
 def owned_projects(request):
-    cursor_str = request.query_params.get("cursor")
-    cursor = parse_datetime(cursor_str) if cursor_str else None
-    limit = int(request.query_params.get("limit", DEFAULT_LIMIT))
-
-    qs = (
-        Project.objects
-        .filter(root_admin=request.user)
-        .annotate(
-            role=Value("root_admin"),
-            is_owner=Value(True, output_field=BooleanField()),
-        )
-        .order_by("-created_at")
-        .distinct()
-    )
-
-    # Unpack three values (results, has_more, next_cursor)
-    projects, has_more, next_cursor = cursor_paginate(qs, cursor, limit)
-    serializer = ProjectListSerializer(projects, many=True)
-
-    return Response({
-        "results": serializer.data,
-        "has_more": has_more,
-        "next_cursor": next_cursor
-    })
+    fields = requested_fields(request.query_params)
+    return Response(OWNED_PAGINATOR.get_paginated_data(
+        owned_queryset(request.user, fields), request.query_params,
+        partial(serialize_projects, fields=fields),
+    ))
 
 
+@replica_reads
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@conditional_on_versions(user_lists_keys)
 def joined_projects(request):
-    cursor_str = request.query_params.get("cursor")
-    cursor = parse_datetime(cursor_str) if cursor_str else None
-    limit = int(request.query_params.get("limit", DEFAULT_LIMIT))
-
-    memberships_qs = (
-        ProjectMember.objects
-        .filter(
-            user=request.user,
-            role__in=["admin", "user"]
-        )
-        .select_related("project")
-        .order_by("-joined_at")
-    )
-
-    if cursor:
-        memberships_qs = memberships_qs.filter(joined_at__lt=cursor)
+    fields = requested_fields(request.query_params)
+    return Response(JOINED_PAGINATOR.get_paginated_data(
+        joined_queryset(request.user, fields), request.query_params,
+        partial(serialize_projects, fields=fields),
+    ))
 
-    memberships = list(memberships_qs[: limit + 1])
-    has_more = len(memberships) > limit
-    current_page_members = memberships[:limit]
 
-    projects = []
-    for m in current_page_members:
-        p = m.project
-        p.role = m.role
-        p.is_owner = (p.root_admin == request.user)
-        projects.append(p)
+@replica_reads
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@conditional_on_versions(user_lists_keys)
+def all_projects(request):
+    """
+    Owned + joined projects merged into one feed, newest activity first.
+    Served from UserProjectIndex with a single range scan on
+    (user, -sort_at); only the page's projects are joined in.
+    """
+    fields = requested_fields(request.query_params)
+    return Response(FEED_PAGINATOR.get_paginated_data(
+        feed_queryset(request.user, fields), request.query_params,
+        partial(serialize_feed, fields=fields),
+        load=partial(load_feed_projects, fields=fields),
+    ))
 
-    serializer = ProjectListSerializer(projects, many=True)
-    next_cursor = current_page_members[-1].joined_at.isoformat() if current_page_members and has_more else None
 
-    return Response({
-        "results": serializer.data,
-        "has_more": has_more,
-        "next_cursor": next_cursor
-    })
+@replica_reads
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def project_changes(request):
+    """Projects added, changed or removed for the caller since ?since="""
+    return Response(changes_since(request.user, request.query_params.get("since")))
 
 
+@replica_reads
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@conditional_on_versions(overview_keys)
 def project_overview(request, project_id):
-    project = get_object_or_404(Project, id=project_id)
+    fields = requested_fields(request.query_params)
+    summary, role = project_access.resolve(request.user, project_id)
 
-    if project.root_admin == request.user:
-        role = "root_admin"
-        is_owner = True
-    else:
-        membership = ProjectMember.objects.filter(
-            project=project,
-            user=request.user
-        ).first()
+    if summary is None:
+        raise Http404("No Project matches the given query.")
 
-        if not membership:
-            return Response(
-                {"detail": "Access denied"},
-                status=status.HTTP_403_FORBIDDEN
-            )
+    if role is None:
+        return Response(
+            {"detail": "Access denied"},
+            status=status.HTTP_403_FORBIDDEN
+        )
 
-        role = membership.role
-        is_owner = False
+    return Response(serialize_overview(summary, role, fields))
 
-    return Response({
-        "id": str(project.id),
-        "name": project.name,
-        "public_code": project.public_code,
-        "created_at": project.created_at,
-        "role": role,
-        "is_owner": is_owner,
-    })
 
+def _save_new_project(project, members_list):
+    with atomic_for_project(project.pk):
+        project.save()
+        return add_initial_members(project, members_list)
+
+
+def _duplicate_name_response():
+    return JSONResponse(
+        {"error": "A project with this name already exists. Please choose a different name."},
+        status=status.HTTP_400_BAD_REQUEST,
+    )
 
-@api_view(["POST"])
-@permission_classes([IsAuthenticated])
-def create_project(request):
-    name = request.data.get("name", "").strip()
-    members_list = request.data.get("members", []) 
+
+@async_api_view(["POST"], authenticated=True)
+async def create_project(request):
+    serializer = CreateProjectSerializer(data=json_body(request))
+    if not serializer.is_valid():
+        return JSONResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    name = serializer.validated_data.get("name") or ""
+    members_list = serializer.validated_data.get("members") or []
 
     if not name:
-        return Response({"error": "Project name is required"}, status=400)
+        return JSONResponse({"error": "Project name is required"}, status=400)
 
-    # NEW CHECK: Validation for unique project name
-    if Project.objects.filter(name__iexact=name).exists():
-        return Response(
-            {"error": "A project with this name already exists. Please choose a different name."}, 
-            status=status.HTTP_400_BAD_REQUEST
-        )
+    # Names are unique ignoring case across shards: ProjectName, inserted
+    # with the project, is the check
+    if await ProjectName.objects.filter(name_ci=name.lower()).aexists():
+        return _duplicate_name_response()
 
     # Scoped outside transaction block so it's accessible to Response
     raw_pin = generate_project_pin()
     raw_access_key = secrets.token_urlsafe(16)
 
-    with transaction.atomic():
-        project = Project(name=name, root_admin=request.user)
-        project.set_access_key(raw_access_key)
-        project.set_pin(raw_pin)
-        project.save()
+    # Hash on the hashing pool, both at once, before taking the write lock
+    project = Project(name=name, root_admin=request.user)
+    await asyncio.gather(
+        project.aset_access_key(raw_access_key),
+        project.aset_pin(raw_pin),
+    )
+
+    try:
+        added, skipped = await sync_to_async(_save_new_project)(project, members_list)
+    except IntegrityError:
+        # Lost a race for the name (a public_code clash is re-raised)
+        if await ProjectName.objects.filter(name_ci=name.lower()).aexists():
+            return _duplicate_name_response()
+        raise
 
-        for m_data in members_list:
-            email = m_data.get("email", "").strip()
-            role = m_data.get("role", "user").lower()
-
-            if email:
-                # ROOT ADMIN PROTECTION: Prevent root admin from being added as a member
-                if email.lower() == request.user.email.lower():
-                    continue 
-
-                # REGISTERED USER CHECK: Only add if user exists
-                target_user = User.objects.filter(email__iexact=email).first()
-                if target_user:
-                    ProjectMember.objects.get_or_create(
-                        project=project,
-                        user=target_user,
-                        defaults={'role': role}
-                    )
-                # Else: Non-registered emails are ignored for security
-
-    return Response({
+    return JSONResponse({
         "id": str(project.id),
         "name": project.name,
         "public_code": project.public_code,
         "pin": raw_pin,
+        "members": {
+            "added": added,
+            "skipped": skipped,
+        },
     }, status=201)
 
 
+def _join(project, user):
+    """(role, joined) for `user` joining by PIN; invited members are promoted"""
+    with atomic_for_project(project.pk):
+        member, created = (
+            ProjectMember.objects
+            .for_project(project.pk)
+            .select_for_update()
+            .get_or_create(project=project, user=user, defaults={"role": "user"})
+        )
+        if member.role == "invited":
+            member.role = "user"
+            member.save(update_fields=["role"])
+            return member.role, True
+        return member.role, created
+
+
+@async_api_view(["POST"], authenticated=True)
+async def join_project(request):
+    """
+    Join a project with its public_code and PIN. PIN checks are rate
+    limited and cached by projects.joining.
+    """
+    serializer = JoinProjectSerializer(data=json_body(request))
+    if not serializer.is_valid():
+        return JSONResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    public_code = normalize_code(serializer.validated_data.get("public_code"))
+    pin = serializer.validated_data.get("pin") or ""
+
+    if not public_code or not pin:
+        return JSONResponse({"error": "public_code and pin are required"}, status=400)
+
+    address = client_ip(request)
+    project = await afind_project(public_code)
+    try:
+        if project is None:
+            await acount_unknown_code(address)
+            return JSONResponse({"error": "Project not found"}, status=404)
+        verified = await averify_pin(project, pin, address)
+    except AttemptLimited as exc:
+        response = JSONResponse(
+            {"detail": "Too many attempts. Please try again later."},
+            status=status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+        response["Retry-After"] = str(exc.retry_after)
+        return response
+
+    if not verified:
+        return JSONResponse({"error": "Invalid PIN"}, status=403)
+
+    if project.root_admin_id == request.user.pk:
+        role, joined = "root_admin", False
+    else:
+        role, joined = await sync_to_async(_join)(project, request.user)
+
+    summary = {f: getattr(project, f) for f in ("id", "name", "public_code", "created_at")}
+    return JSONResponse(
+        {**serialize_overview(summary, role), "joined": joined},
+        status=201 if joined else 200,
+    )
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def bulk_members(request, project_id):
+    """
+    Add / remove / re-role many members in one transaction.
+    Only the root admin and project admins may manage members.
+    """
+    project = get_object_or_404(
+        Project.objects.for_project(project_id).with_access_for(request.user),
+        id=project_id
+    )
+
+    if project.role not in ("root_admin", "admin"):
+        return Response(
+            {"detail": "Access denied"},
+            status=status.HTTP_403_FORBIDDEN
+        )
+
+    serializer = BulkMembersSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    with atomic_for_project(project.pk):
+        results = apply_member_operations(project, serializer.validated_data["operations"])
+
+    summary = {}
+    for result in results:
+        summary[result["status"]] = summary.get(result["status"], 0) + 1
+
+    return Response({"results": results, "summary": summary})
+
+
+@replica_reads
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def search_projects(request):
@@ -198,35 +270,22 @@ def search_projects(request):
     if not q:
         return Response({"results": []})
 
-    owned_qs = Project.objects.filter(root_admin=request.user)
-    joined_qs = Project.objects.filter(projectmember__user=request.user)
-
-    qs = (
-        owned_qs | joined_qs
-    ).filter(
-        Q(name__icontains=q) |
-        Q(public_code__icontains=q)
-    ).distinct().order_by("-created_at")[:10]
-
-    results = []
-    for project in qs:
-        if project.root_admin == request.user:
-            role = "root_admin"
-            is_owner = True
-        else:
-            membership = ProjectMember.objects.filter(
-                project=project,
-                user=request.user
-            ).first()
-            role = membership.role if membership else "user"
-            is_owner = False
-
-        results.append({
-            "id": str(project.id),
-            "name": project.name,
-            "public_code": project.public_code,
-            "role": role,
-            "is_owner": is_owner,
-        })
-
-    return Response({"results": results})
\ No newline at end of file
+    fields = requested_fields(request.query_params, default=SEARCH_RESULT_FIELDS)
+    qs = search_projects_queryset(request.user, q, fields)
+
+    return Response(SEARCH_PAGINATOR.get_paginated_data(
+        qs, request.query_params, partial(serialize_search_results, fields=fields)
+    ))
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def autocomplete_projects(request):
+    """Prefix matches among the caller's projects, from projects.autocomplete"""
+    q = request.query_params.get("q", "").strip()
+
+    if not q:
+        return Response({"results": []})
+
+    rows = autocomplete_index.search(request.user, q, result_limit(request.query_params))
+    return Response({"results": serialize_search_results(rows)})
@@ -0,0 +1,225 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from config import metrics
+from config.tiered import TieredCache
+from .revocation import ais_revoked, is_revoked
+
+
+class AsyncJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication with awaitable entry points for native async views.
+    Token parsing/validation is CPU-only; the revocation check and the user
+    lookup use the async ORM. Revoked tokens (users.revocation) are rejected
+    on both paths.
+    """
+
+    async def aauthenticate(self, request):
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = await self.aget_validated_token(raw_token)
+
+        return await self.aget_user(validated_token), validated_token
+
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if is_revoked(validated_token):
+            raise InvalidToken(_("Token has been revoked"))
+        return validated_token
+
+    async def aget_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if await ais_revoked(validated_token):
+            raise InvalidToken(_("Token has been revoked"))
+        return validated_token
+
+    def get_user_id(self, validated_token):
+        try:
+            return validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            ) from e
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+
+        try:
+            user = await self.user_model.objects.aget(
+                **{api_settings.USER_ID_FIELD: user_id}
+            )
+        except self.user_model.DoesNotExist as e:
+            raise AuthenticationFailed(
+                _("User not found"), code="user_not_found"
+            ) from e
+
+        self.check_user(user, validated_token)
+        return user
+
+    async def arecheck(self, validated_token):
+        """
+        Run the revocation and user checks again on a token accepted
+        earlier (long-lived streams); raises AuthenticationFailed. The user
+        is read from the database, never from a cache.
+        """
+        if await ais_revoked(validated_token):
+            raise InvalidToken(_("Token has been revoked"))
+        await AsyncJWTAuthentication.aget_user(self, validated_token)
+
+    def check_user(self, user, validated_token):
+        """Same post-lookup checks as JWTAuthentication.get_user()"""
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # UserCache users carry the fingerprint, not the hash
+            fingerprint = getattr(user, "password_fingerprint", None)
+            if fingerprint is None:
+                fingerprint = get_md5_hash_password(user.password)
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != fingerprint:
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code="password_changed"
+                )
+
+
+class UserCache(TieredCache):
+    """
+    Token user id -> User, in a local LRU (per process) and optionally a
+    shared Django cache (config.tiered). Entries hold the user's column
+    values, and every hit builds a fresh instance, so requests never share
+    a mutable User.
+
+    The password hash is never cached: with CHECK_REVOKE_TOKEN entries
+    carry SimpleJWT's fingerprint of it instead, and cached users load the
+    password column on access. Code that needs it (e.g. change_password)
+    reads the user from the database.
+
+    users.signals invalidates both tiers after a User is saved or deleted
+    (deactivation, password change, ...) commits.
+    """
+
+    def __init__(self, user_model, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user_model = user_model
+        self.fields = [
+            f.attname for f in user_model._meta.concrete_fields if f.attname != "password"
+        ]
+
+    @staticmethod
+    def key(user_id):
+        # Token claims carry the id as a string, user.pk an int
+        return f"jwt-user:{user_id}"
+
+    def _pack(self, user):
+        fingerprint = None
+        if api_settings.CHECK_REVOKE_TOKEN:
+            fingerprint = get_md5_hash_password(user.password)
+        return tuple(getattr(user, f) for f in self.fields), fingerprint
+
+    def _unpack(self, entry):
+        if entry is None:
+            return None
+        values, fingerprint = entry
+        user = self.user_model.from_db("default", self.fields, values)
+        user.password_fingerprint = fingerprint
+        return user
+
+    def get(self, user_id):
+        """(User or None, fill state for set())"""
+        values, state = self.get_many([self.key(user_id)])
+        return self._unpack(values[self.key(user_id)]), state
+
+    async def aget(self, user_id):
+        values, state = await self.aget_many([self.key(user_id)])
+        return self._unpack(values[self.key(user_id)]), state
+
+    def set(self, user, state):
+        self.set_many({self.key(user.pk): self._pack(user)}, state)
+
+    async def aset(self, user, state):
+        await self.aset_many({self.key(user.pk): self._pack(user)}, state)
+
+    def invalidate_on_commit(self, user_id, using=None):
+        self.delete_on_commit([self.key(user_id)], using)
+
+
+class CachedJWTAuthentication(AsyncJWTAuthentication):
+    """
+    JWT authentication that resolves the token's user through UserCache,
+    saving the per-request User primary-key query on a hit.
+    Configured by settings.JWT_USER_CACHE.
+    """
+
+    def get_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        user, state = user_cache.get(user_id)
+
+        if user is None:
+            try:
+                user = self.user_model.objects.get(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+            except self.user_model.DoesNotExist as e:
+                raise AuthenticationFailed(
+                    _("User not found"), code="user_not_found"
+                ) from e
+            user_cache.set(user, state)
+
+        self.check_user(user, validated_token)
+        return user
+
+    async def aget_user(self, validated_token):
+        user_id = self.get_user_id(validated_token)
+        user, state = await user_cache.aget(user_id)
+
+        if user is None:
+            user = await super().aget_user(validated_token)
+            await user_cache.aset(user, state)
+            return user
+
+        self.check_user(user, validated_token)
+        return user
+
+
+class QueryTokenJWTAuthentication(CachedJWTAuthentication):
+    """
+    Also accepts the access token as ?token=, for clients that cannot set
+    headers (EventSource). Only for long-lived GET streams: the token ends
+    up in access logs.
+    """
+
+    def get_header(self, request):
+        header = super().get_header(request)
+        token = request.GET.get("token")
+        if header is None and token:
+            header = f"{api_settings.AUTH_HEADER_TYPES[0]} {token}".encode()
+        return header
+
+
+def _build_user_cache():
+    from django.contrib.auth import get_user_model
+
+    config = settings.JWT_USER_CACHE
+    return UserCache(
+        get_user_model(),
+        ttl=config["TTL"],
+        max_entries=config["MAX_ENTRIES"],
+        shared_alias=config.get("SHARED_CACHE"),
+        shared_ttl=config.get("SHARED_TTL"),
+        shared_local_ttl=config.get("SHARED_LOCAL_TTL"),
+    )
+
+
+user_cache = _build_user_cache()
+metrics.register("jwt_user_cache", user_cache.local.stats)
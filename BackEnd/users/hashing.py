@@ -0,0 +1,106 @@
+"""
+Bounded worker pool for password / PIN hashing.
+
+PBKDF2 costs tens of milliseconds of CPU per call. Async views await these
+helpers so the event loop (and Django's shared sync thread) never blocks on
+a hash. hashlib releases the GIL while deriving keys, so a thread pool runs
+hashes in parallel without the pickling cost of a process pool.
+
+The pool is bounded: once HASHING_POOL_MAX_PENDING calls are queued or
+running, new calls fail fast with HashingBusy instead of piling up.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password, verify_password
+
+from config import metrics
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue is full"""
+
+
+class HashingPool:
+
+    def __init__(self, workers, max_pending):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._peak = 0
+        self._completed = 0
+        self._rejected = 0
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers,
+                        thread_name_prefix="hashing",
+                    )
+        return self._executor
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise HashingBusy()
+            self._pending += 1
+            self._peak = max(self._peak, self._pending)
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._completed += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "in_flight": min(self._pending, self.workers),
+                "queue_depth": max(0, self._pending - self.workers),
+                "peak_pending": self._peak,
+                "completed": self._completed,
+                "rejected": self._rejected,
+            }
+
+
+pool = HashingPool(
+    workers=settings.HASHING_POOL_WORKERS,
+    max_pending=settings.HASHING_POOL_MAX_PENDING,
+)
+metrics.register("hashing_pool", pool.stats)
+
+
+async def amake_password(raw):
+    return await pool.run(make_password, raw)
+
+
+async def acheck_password(raw, encoded):
+    is_correct, _ = await pool.run(verify_password, raw, encoded)
+    return is_correct
+
+
+async def acheck_user_password(user, raw):
+    """User.check_password() on the pool, including the hash upgrade"""
+    is_correct, must_update = await pool.run(verify_password, raw, user.password)
+    if is_correct and must_update:
+        user.password = await amake_password(raw)
+        await user.asave(update_fields=["password"])
+    return is_correct
+
+
+async def aset_user_password(user, raw):
+    """User.set_password() on the pool"""
+    user.password = await amake_password(raw)
+    user._password = raw
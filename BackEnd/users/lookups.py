@@ -0,0 +1,26 @@
+"""
+Case-insensitive email lookups.
+
+Emails are unique ignoring case through the partial expression index from
+users migration 0004, UNIQUE ON auth_user (LOWER(email)) WHERE email > ''.
+These querysets repeat that predicate so the index is usable (SQLite only
+picks a partial index when the query implies its WHERE clause); __iexact
+compiles to LIKE and cannot use it.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models.functions import Lower
+
+User = get_user_model()
+
+
+def _users():
+    return User.objects.alias(email_ci=Lower("email")).filter(email__gt="")
+
+
+def user_by_email(email):
+    """At most one user, whatever the case of `email`"""
+    return _users().filter(email_ci=email.lower())
+
+
+def users_by_emails(emails):
+    return _users().filter(email_ci__in={e.lower() for e in emails})
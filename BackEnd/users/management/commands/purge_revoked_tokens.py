@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from users.revocation import denylist
+
+
+class Command(BaseCommand):
+    help = "Delete revoked-token rows and cutoffs that no unexpired token can match"
+
+    def handle(self, *args, **options):
+        tokens, cutoffs = denylist.purge()
+        self.stdout.write(self.style.SUCCESS(
+            f"Purged {tokens} revoked tokens and {cutoffs} cutoffs"
+        ))
@@ -0,0 +1,59 @@
+from django.core.management.base import CommandError
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+
+def check_case_duplicates(apps, schema_editor):
+    """
+    Emails used to be unique only as typed (accounts made through the
+    admin or createsuperuser never went through the register check).
+    Accounts can't be merged or renamed automatically, so stop with the
+    conflicting rows listed instead of failing on the index.
+    """
+    db = schema_editor.connection.alias
+    User = apps.get_model("auth", "User")
+    users = User.objects.using(db).filter(email__gt="").annotate(email_ci=Lower("email"))
+
+    duplicated = (
+        users.values("email_ci")
+        .annotate(n=Count("id"))
+        .filter(n__gt=1)
+        .values_list("email_ci", flat=True)
+    )
+    conflicts = [
+        ", ".join(
+            f"#{u.pk} {u.username} <{u.email}>"
+            for u in users.filter(email_ci=email_ci).order_by("pk")
+        )
+        for email_ci in duplicated
+    ]
+    if conflicts:
+        raise CommandError(
+            "Emails must be unique ignoring case, but these accounts share "
+            "one. Change or clear the email of all but one account in each "
+            "group (e.g. in the admin), then run migrate again:\n  "
+            + "\n  ".join(conflicts)
+        )
+
+
+# auth.User belongs to django.contrib.auth, so the index is created here
+# rather than declared on the model. Blank emails (e.g. createsuperuser
+# without one) are left out of the uniqueness check.
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('users', '0003_token_revocation'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_case_duplicates, migrations.RunPython.noop),
+        migrations.RunSQL(
+            sql=(
+                "CREATE UNIQUE INDEX users_auth_user_email_ci_uniq "
+                "ON auth_user (LOWER(email)) WHERE email > ''"
+            ),
+            reverse_sql="DROP INDEX IF EXISTS users_auth_user_email_ci_uniq",
+        ),
+    ]
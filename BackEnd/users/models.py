@@ -84,3 +84,44 @@ class ProjectMember(models.Model):
 
     def __str__(self):
         return f"{self.user} → {self.project} ({self.role})"
+
+
+class RevokedToken(models.Model):
+    """
+    Denylisted JWT, by jti (logout). Rows are only needed until the token
+    would have expired anyway; purge_revoked_tokens removes the rest.
+    """
+
+    jti = models.CharField(max_length=255, unique=True)
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="revoked_tokens"
+    )
+
+    expires_at = models.DateTimeField(db_index=True)
+    revoked_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.jti
+
+
+class TokenCutoff(models.Model):
+    """
+    Every token issued to `user` before the second of `not_before` is
+    revoked (password change, "log out everywhere"); token iat claims
+    only have whole-second precision.
+    """
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="token_cutoff"
+    )
+
+    not_before = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.user} < {self.not_before}"
@@ -0,0 +1,291 @@
+"""
+JWT revocation: a jti denylist (logout) plus a per-user "tokens issued
+before" cutoff (password change, log out everywhere).
+
+Both live in the database (RevokedToken, TokenCutoff). Every authenticated
+request is checked against an in-memory Bloom filter holding the revoked
+jtis and the users with a live cutoff, so the common case costs a couple of
+hashes and no query; only a filter hit (a revoked token or a rare false
+positive) falls through to an exact lookup.
+
+The filter is rebuilt from the database every REBUILD_INTERVAL seconds, by
+whichever request first notices it is stale (single-flight: the others
+keep using the current filter; async requests rebuild on a worker thread,
+not the thread-sensitive one shared by every sync_to_async call). Revocations made in this
+process are added to the filter immediately; other processes pick them up
+on their next rebuild, so REBUILD_INTERVAL bounds how long a revoked token
+can still be accepted by another worker.
+"""
+import hashlib
+import math
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from config import metrics
+from .models import RevokedToken, TokenCutoff
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (double hashing on one blake2b digest)"""
+
+    def __init__(self, capacity, error_rate):
+        capacity = max(1, capacity)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        positions = self._positions(item)
+        with self._lock:
+            for p in positions:
+                self.bits[p >> 3] |= 1 << (p & 7)
+            self.count += 1
+
+    def __contains__(self, item):
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+
+def _jti_key(jti):
+    return f"t:{jti}"
+
+
+def _user_key(user_id):
+    return f"u:{user_id}"
+
+
+def _cutoff_window():
+    # Older cutoffs cannot affect any token that is still unexpired
+    return max(
+        api_settings.ACCESS_TOKEN_LIFETIME,
+        api_settings.REFRESH_TOKEN_LIFETIME,
+    )
+
+
+class RevocationList:
+
+    def __init__(self, rebuild_interval, error_rate, min_capacity):
+        self.rebuild_interval = rebuild_interval
+        self.error_rate = error_rate
+        self.min_capacity = min_capacity
+        self._filter = None
+        self._built_at = 0.0
+        self._rebuild_lock = threading.Lock()
+        self._recent = []
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+        self.checks = 0
+        self.filter_hits = 0
+        self.revoked_hits = 0
+
+    # ---------- filter maintenance ----------
+
+    def _load_keys(self):
+        now = timezone.now()
+        jtis = (
+            RevokedToken.objects
+            .filter(expires_at__gt=now)
+            .values_list("jti", flat=True)
+            .iterator(chunk_size=10000)
+        )
+        user_ids = (
+            TokenCutoff.objects
+            .filter(not_before__gt=now - _cutoff_window())
+            .values_list("user_id", flat=True)
+            .iterator(chunk_size=10000)
+        )
+        return [_jti_key(j) for j in jtis] + [_user_key(u) for u in user_ids]
+
+    def rebuild(self):
+        with self._lock:
+            self._recent = []
+
+        keys = self._load_keys()
+        bloom = BloomFilter(max(self.min_capacity, 2 * len(keys)), self.error_rate)
+        for key in keys:
+            bloom.add(key)
+
+        with self._lock:
+            # Revocations made while the rows were loading
+            for key in self._recent:
+                bloom.add(key)
+            self._filter = bloom
+            self._built_at = time.monotonic()
+            self.rebuilds += 1
+
+    def _is_stale(self):
+        return time.monotonic() - self._built_at > self.rebuild_interval
+
+    def _refresh(self):
+        if self._filter is None:
+            with self._rebuild_lock:
+                if self._filter is None:
+                    self.rebuild()
+        elif self._is_stale() and self._rebuild_lock.acquire(blocking=False):
+            # Other requests keep using the current filter meanwhile
+            try:
+                if self._is_stale():
+                    self.rebuild()
+            finally:
+                self._rebuild_lock.release()
+
+    def _refresh_off_thread(self):
+        try:
+            self._refresh()
+        finally:
+            # Not a request thread: honour CONN_MAX_AGE here
+            close_old_connections()
+
+    def _add(self, key):
+        with self._lock:
+            self._recent.append(key)
+            bloom = self._filter
+        if bloom is not None:
+            bloom.add(key)
+
+    # ---------- checks ----------
+
+    def _candidates(self, token):
+        """Which exact lookups a token needs: (jti or None, user_id or None)"""
+        bloom = self._filter
+        jti = token.get(api_settings.JTI_CLAIM)
+        user_id = token.get(api_settings.USER_ID_CLAIM)
+
+        jti = jti if jti and _jti_key(jti) in bloom else None
+        user_id = user_id if user_id is not None and _user_key(user_id) in bloom else None
+        with self._lock:
+            self.checks += 1
+            if jti or user_id:
+                self.filter_hits += 1
+        return jti, user_id
+
+    def _revoked(self, token, jti_revoked, cutoff):
+        # iat has whole-second precision, so the cutoff is compared in whole
+        # seconds too: tokens from the cutoff's second onwards stay valid
+        # (the re-login right after a password change), tokens from earlier
+        # seconds are revoked
+        issued_at = token.get("iat")
+        revoked = jti_revoked or (
+            cutoff is not None
+            and (issued_at is None or issued_at < int(cutoff.timestamp()))
+        )
+        if revoked:
+            with self._lock:
+                self.revoked_hits += 1
+        return revoked
+
+    def is_revoked(self, token):
+        self._refresh()
+        jti, user_id = self._candidates(token)
+        if jti is None and user_id is None:
+            return False
+
+        jti_revoked = jti is not None and RevokedToken.objects.filter(jti=jti).exists()
+        cutoff = None
+        if user_id is not None and not jti_revoked:
+            cutoff = (
+                TokenCutoff.objects
+                .filter(user_id=user_id)
+                .values_list("not_before", flat=True)
+                .first()
+            )
+        return self._revoked(token, jti_revoked, cutoff)
+
+    async def ais_revoked(self, token):
+        # A rebuild already in flight serves the current filter meanwhile
+        if self._filter is None or (self._is_stale() and not self._rebuild_lock.locked()):
+            await sync_to_async(self._refresh_off_thread, thread_sensitive=False)()
+        jti, user_id = self._candidates(token)
+        if jti is None and user_id is None:
+            return False
+
+        jti_revoked = jti is not None and await RevokedToken.objects.filter(jti=jti).aexists()
+        cutoff = None
+        if user_id is not None and not jti_revoked:
+            cutoff = await (
+                TokenCutoff.objects
+                .filter(user_id=user_id)
+                .values_list("not_before", flat=True)
+                .afirst()
+            )
+        return self._revoked(token, jti_revoked, cutoff)
+
+    # ---------- revoking ----------
+
+    @staticmethod
+    def _denylist_row(token):
+        return RevokedToken(
+            jti=token[api_settings.JTI_CLAIM],
+            user_id=token[api_settings.USER_ID_CLAIM],
+            expires_at=datetime_from_epoch(token["exp"]),
+        )
+
+    def revoke_token(self, token):
+        RevokedToken.objects.bulk_create([self._denylist_row(token)], ignore_conflicts=True)
+        self._add(_jti_key(token[api_settings.JTI_CLAIM]))
+
+    async def arevoke_token(self, token):
+        await RevokedToken.objects.abulk_create([self._denylist_row(token)], ignore_conflicts=True)
+        self._add(_jti_key(token[api_settings.JTI_CLAIM]))
+
+    def revoke_user_tokens(self, user):
+        TokenCutoff.objects.update_or_create(user=user, defaults={"not_before": timezone.now()})
+        self._add(_user_key(user.pk))
+
+    async def arevoke_user_tokens(self, user):
+        await TokenCutoff.objects.aupdate_or_create(user=user, defaults={"not_before": timezone.now()})
+        self._add(_user_key(user.pk))
+
+    def purge(self):
+        """Delete rows that can no longer match an unexpired token"""
+        now = timezone.now()
+        tokens, _ = RevokedToken.objects.filter(expires_at__lte=now).delete()
+        cutoffs, _ = TokenCutoff.objects.filter(not_before__lte=now - _cutoff_window()).delete()
+        return tokens, cutoffs
+
+    def stats(self):
+        bloom = self._filter
+        with self._lock:
+            rebuilds, checks = self.rebuilds, self.checks
+            filter_hits, revoked_hits = self.filter_hits, self.revoked_hits
+        return {
+            "filter_bits": bloom.size if bloom else 0,
+            "filter_hashes": bloom.hashes if bloom else 0,
+            "filter_entries": bloom.count if bloom else 0,
+            "filter_age_s": round(time.monotonic() - self._built_at, 1) if bloom else None,
+            "rebuilds": rebuilds,
+            "checks": checks,
+            "filter_hits": filter_hits,
+            "revoked": revoked_hits,
+            "false_positives": filter_hits - revoked_hits,
+        }
+
+
+denylist = RevocationList(
+    rebuild_interval=settings.TOKEN_REVOCATION["REBUILD_INTERVAL"],
+    error_rate=settings.TOKEN_REVOCATION["FALSE_POSITIVE_RATE"],
+    min_capacity=settings.TOKEN_REVOCATION["MIN_CAPACITY"],
+)
+metrics.register("token_denylist", denylist.stats)
+
+is_revoked = denylist.is_revoked
+ais_revoked = denylist.ais_revoked
+revoke_token = denylist.revoke_token
+arevoke_token = denylist.arevoke_token
+revoke_user_tokens = denylist.revoke_user_tokens
+arevoke_user_tokens = denylist.arevoke_user_tokens
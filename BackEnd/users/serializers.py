@@ -1,8 +1,13 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from rest_framework_simplejwt import serializers as jwt_serializers
+from rest_framework_simplejwt.exceptions import InvalidToken
 from django.core.validators import RegexValidator
 from .models import UserProfile
-from django.contrib.auth import authenticate
+from .hashing import acheck_user_password
+from .lookups import user_by_email
+from .revocation import is_revoked
 from .models import Project, ProjectMember
 
 
@@ -26,12 +31,6 @@ class RegisterSerializer(serializers.Serializer):
     )
     confirmPassword = serializers.CharField(write_only=True)
 
-    def validate_email(self, value):
-        # Ensure unique email (case-insensitive)
-        if User.objects.filter(email__iexact=value).exists():
-            raise serializers.ValidationError("Email already registered!")
-        return value
-
     def validate(self, data):
         if data["password"] != data["confirmPassword"]:
             raise serializers.ValidationError({
@@ -41,23 +40,33 @@ class RegisterSerializer(serializers.Serializer):
 
     def create(self, validated_data):
         validated_data.pop("confirmPassword")
+        validated_data.pop("password")
 
         email = validated_data["email"].lower()
-        password = validated_data["password"]
         fullname = validated_data["fullname"]
 
-        # Create Django user
-        user = User.objects.create_user(
+        # Password is hashed by the caller on users.hashing's pool
+        # (serializer.save(password_hash=...)), never on this thread
+        user = User(
             username=email,  # email as username
             email=email,
-            password=password
+            password=validated_data["password_hash"],
         )
 
-        # Create user profile
-        UserProfile.objects.create(
-            user=user,
-            full_name=fullname
-        )
+        # Emails are unique ignoring case (users_auth_user_email_ci_uniq),
+        # so a concurrent registration of the same address fails here
+        # instead of slipping past a check-then-insert
+        try:
+            with transaction.atomic():
+                user.save()
+
+                # Create user profile
+                UserProfile.objects.create(
+                    user=user,
+                    full_name=fullname
+                )
+        except IntegrityError:
+            raise serializers.ValidationError({"email": ["Email already registered!"]})
 
         return user
     
@@ -66,29 +75,30 @@ class LoginSerializer(serializers.Serializer):
     email = serializers.EmailField()
     password = serializers.CharField(write_only=True)
 
-    def validate(self, data):
-        email = data.get("email")
-        password = data.get("password")
+    async def aauthenticate(self):
+        """
+        Resolve and verify the user for the validated credentials.
+        The password check runs on users.hashing's pool, not the event loop.
+        """
+        email = self.validated_data["email"]
+        password = self.validated_data["password"]
 
-        # 1. Check if the user exists at all
-        user_exists = User.objects.filter(username=email).exists()
-        
-        if not user_exists:
+        # 1. Check if the user exists at all (one indexed, case-insensitive lookup)
+        user = await user_by_email(email).afirst()
+
+        if user is None:
             # If email is not in DB, tell them to register
             raise serializers.ValidationError({"email": "User not found. Please register first!"})
 
-        # 2. If user exists, try to authenticate with the password
-        user = authenticate(username=email, password=password)
-
-        if not user:
+        # 2. If user exists, verify the password
+        if not await acheck_user_password(user, password):
             # If user exists but password is wrong
             raise serializers.ValidationError({"password": "Invalid credentials!"})
 
         if not user.is_active:
-            raise serializers.ValidationError("User account is disabled!")
+            raise serializers.ValidationError({"non_field_errors": ["User account is disabled!"]})
 
-        data["user"] = user
-        return data
+        return user
     
 
 class ProjectSerializer(serializers.ModelSerializer):
@@ -108,4 +118,18 @@ class ChangePasswordSerializer(serializers.Serializer):
             raise serializers.ValidationError(
                 "Password must be at least 8 characters long."
             )
-        return value
\ No newline at end of file
+        return value
+
+class TokenRefreshSerializer(jwt_serializers.TokenRefreshSerializer):
+    """Refuses refresh tokens revoked by logout or a password change"""
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        if is_revoked(refresh):
+            raise InvalidToken("Token has been revoked")
+        return super().validate(attrs)
+
+
+class LogoutSerializer(serializers.Serializer):
+    refresh = serializers.CharField(required=False)
+    everywhere = serializers.BooleanField(default=False)
@@ -1,3 +1,203 @@
+import asyncio
+import threading
+from datetime import datetime, timezone
+from importlib import import_module
+from types import SimpleNamespace
+from unittest import mock
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.management.base import CommandError
+from django.db import connection
 from django.test import TestCase
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from .authentication import CachedJWTAuthentication, user_cache
+from .hashing import HashingBusy, HashingPool, pool
+from .models import RevokedToken, TokenCutoff
+from .revocation import _jti_key, denylist, is_revoked, revoke_token
+
+email_ci_migration = import_module("users.migrations.0004_user_email_ci_unique")
+
+PASSWORD = "Abcdef1@"
+
+
+class EmailCaseDuplicatesMigrationTests(TestCase):
+
+    def check(self):
+        # Only the editor's connection is used
+        editor = SimpleNamespace(connection=connection)
+        email_ci_migration.check_case_duplicates(apps, editor)
+
+    def test_reports_conflicting_accounts(self):
+        # The state before the migration; SQLite DDL is rolled back with the test
+        with connection.cursor() as cursor:
+            cursor.execute("DROP INDEX users_auth_user_email_ci_uniq")
+        User.objects.create(username="first", email="Same@example.com")
+        User.objects.create(username="second", email="same@EXAMPLE.com")
+        User.objects.create(username="blank1", email="")
+        User.objects.create(username="blank2", email="")
+
+        with self.assertRaisesMessage(CommandError, "first <Same@example.com>, #"):
+            self.check()
+
+    def test_passes_without_conflicts(self):
+        User.objects.create(username="one", email="one@example.com")
+        User.objects.create(username="blank1", email="")
+        User.objects.create(username="blank2", email="")
+        self.check()
+
+
+class RevocationTests(TestCase):
+    """users.revocation: Bloom filter in front of the denylist and cutoffs"""
+
+    def setUp(self):
+        self.user = User.objects.create_user("alice", "alice@example.com", PASSWORD)
+        denylist.rebuild()
+
+    def token(self, iat=None):
+        token = AccessToken.for_user(self.user)
+        if iat is not None:
+            token["iat"] = iat
+        return token
+
+    def test_unrevoked_tokens_cost_no_query(self):
+        with self.assertNumQueries(0):
+            self.assertFalse(is_revoked(self.token()))
+
+    def test_revoked_jti(self):
+        revoked, other = self.token(), self.token()
+        revoke_token(revoked)
+        self.assertTrue(is_revoked(revoked))
+        self.assertFalse(is_revoked(other))
+
+    def test_cutoff_compares_whole_seconds(self):
+        cutoff = datetime(2030, 1, 1, 12, 0, 0, 750000, tzinfo=timezone.utc)
+        TokenCutoff.objects.create(user=self.user, not_before=cutoff)
+        denylist.rebuild()
+        second = int(cutoff.timestamp())
+
+        self.assertTrue(is_revoked(self.token(iat=second - 1)))
+        # Same second as the cutoff: e.g. the login right after a password change
+        self.assertFalse(is_revoked(self.token(iat=second)))
+        self.assertFalse(is_revoked(self.token(iat=second + 1)))
+
+    def test_revocations_from_other_processes_after_rebuild(self):
+        token = self.token()
+        RevokedToken.objects.create(
+            jti=token["jti"], user=self.user, expires_at=datetime_from_epoch(token["exp"]),
+        )
+        # Not in this process's filter until the next rebuild
+        self.assertFalse(is_revoked(token))
+        denylist.rebuild()
+        self.assertTrue(is_revoked(token))
+
+    def test_filter_false_positive_falls_back_to_the_database(self):
+        token = self.token()
+        denylist._add(_jti_key(token["jti"]))
+        with self.assertNumQueries(1):
+            self.assertFalse(is_revoked(token))
+
+
+class PasswordChangeTests(TestCase):
+
+    def login(self, password):
+        response = self.client.post(
+            "/api/auth/login/", {"email": "bob@example.com", "password": password},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+        return {"Authorization": f"Bearer {response.json()['tokens']['access']}"}
+
+    def test_relogin_right_after_password_change(self):
+        User.objects.create_user("bob", "bob@example.com", PASSWORD)
+        old = self.login(PASSWORD)
+        response = self.client.post(
+            "/api/auth/change-password/",
+            {"current_password": PASSWORD, "new_password": "Abcdef2@"},
+            content_type="application/json", headers=old,
+        )
+        self.assertEqual(response.status_code, 200, response.content)
+
+        new = self.login("Abcdef2@")
+        self.assertEqual(self.client.get("/api/projects/owned/", headers=new).status_code, 200)
+        self.assertEqual(self.client.get("/api/projects/owned/", headers=old).status_code, 401)
+
+
+class HashingPoolTests(TestCase):
+
+    async def test_full_pool_fails_fast(self):
+        hashing = HashingPool(workers=1, max_pending=1)
+        release = threading.Event()
+        running = asyncio.ensure_future(hashing.run(release.wait))
+        await asyncio.sleep(0)
+
+        with self.assertRaises(HashingBusy):
+            await hashing.run(len, "x")
+        release.set()
+        self.assertTrue(await running)
+        self.assertEqual(await hashing.run(len, "x"), 1)
+        self.assertEqual(
+            {k: hashing.stats()[k] for k in ("peak_pending", "completed", "rejected")},
+            {"peak_pending": 1, "completed": 2, "rejected": 1},
+        )
+
+    def test_saturated_pool_answers_503(self):
+        User.objects.create_user("bob", "bob@example.com", PASSWORD)
+        with mock.patch.object(pool, "max_pending", 0):
+            response = self.client.post(
+                "/api/auth/login/", {"email": "bob@example.com", "password": PASSWORD},
+                content_type="application/json",
+            )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response["Retry-After"], "1")
+
+
+class UserCacheTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user("carol", "carol@example.com", PASSWORD)
+        user_cache.local.clear()
+        self.auth = CachedJWTAuthentication()
+        self.token = AccessToken.for_user(self.user)
+
+    def authenticate(self):
+        return self.auth.get_user(self.token)
+
+    def test_entries_hold_no_password_hash(self):
+        self.authenticate()
+        values, fingerprint = user_cache.local.peek(user_cache.key(self.user.pk))
+        self.assertNotIn(self.user.password, values)
+        self.assertIsNone(fingerprint)
+
+        cached = self.authenticate()
+        self.assertEqual(cached.email, "carol@example.com")
+        self.assertIn("password", cached.get_deferred_fields())
+
+    def test_invalidated_after_commit(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.is_active = False
+            self.user.save()
+            # Still cached until the write commits
+            self.assertIsNotNone(user_cache.local.peek(user_cache.key(self.user.pk)))
+        with self.assertRaisesMessage(AuthenticationFailed, "User is inactive"):
+            self.authenticate()
+
+    def test_lookup_racing_a_deactivation_is_not_cached(self):
+        users = self.auth.user_model.objects
+
+        def get(**kwargs):
+            user = users.get(**kwargs)
+            # An admin deactivates the user between the read and the fill
+            with self.captureOnCommitCallbacks(execute=True):
+                User.objects.filter(pk=self.user.pk).update(is_active=False)
+                User.objects.get(pk=self.user.pk).save()
+            return user
 
-# Create your tests here.
+        with mock.patch.object(self.auth, "user_model", mock.Mock(objects=mock.Mock(get=get))):
+            self.assertTrue(self.authenticate().is_active)
+        with self.assertRaisesMessage(AuthenticationFailed, "User is inactive"):
+            self.authenticate()
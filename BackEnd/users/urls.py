@@ -1,10 +1,10 @@
 from django.urls import path
-from rest_framework_simplejwt.views import TokenRefreshView
-from .views import register, login, ChangePasswordView
+from .views import register, login, logout, change_password, TokenRefreshView
 
 urlpatterns = [
     path("register/", register),
     path("login/", login),
-    path("change-password/", ChangePasswordView.as_view()),
+    path("logout/", logout),
+    path("change-password/", change_password),
     path("token/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
 ]
\ No newline at end of file
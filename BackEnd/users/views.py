@@ -1,13 +1,22 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import get_object_or_404
-from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
-from rest_framework import status
+from rest_framework import serializers, status
 from rest_framework.views import APIView
 
-from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth.hashers import check_password
-from .serializers import ChangePasswordSerializer
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework_simplejwt import views as jwt_views
+from config.asyncapi import async_api_view, json_body
+from config.renderers import JSONResponse
+from projects.changes import acurrent_token, current_token
+from projects.listings import afirst_pages, first_pages
+from .authentication import CachedJWTAuthentication
+from .hashing import amake_password, acheck_user_password, aset_user_password
+from .revocation import arevoke_token, arevoke_user_tokens
+from .serializers import ChangePasswordSerializer, LogoutSerializer
 
 from .models import UserProfile, Project, ProjectMember
 from .serializers import RegisterSerializer, LoginSerializer
@@ -19,53 +28,98 @@ User = get_user_model()
 # AUTH
 # ======================================================
 
-@api_view(["POST"])
-def register(request):
-    serializer = RegisterSerializer(data=request.data)
+# Auth endpoints are native async views so PBKDF2 runs on the bounded
+# hashing pool (users.hashing) instead of a request worker thread.
+
+# ?include=bootstrap on login / token refresh embeds what the client loads
+# next anyway: the first page of the owned and joined lists
+# (projects.listings.first_pages), saving those round-trips, plus the
+# projects.changes token to sync them from. The token is read before the
+# lists so that no change falls between the two.
+
+def _wants_bootstrap(request):
+    return "bootstrap" in request.GET.get("include", "").split(",")
+
+
+def _bootstrap(user):
+    since = current_token()
+    return {**first_pages(user), "since": since}
 
-    if serializer.is_valid():
-        serializer.save()
-        return Response(
-            {"message": "User registered successfully"},
-            status=status.HTTP_201_CREATED,
-        )
 
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+async def _abootstrap(user):
+    since = await acurrent_token()
+    return {**await afirst_pages(user), "since": since}
 
 
-@api_view(["POST"])
-def login(request):
-    serializer = LoginSerializer(data=request.data)
+def _user_data(user, profile):
+    return {
+        "id": user.id,
+        "email": user.email,
+        "full_name": profile.full_name if profile else "",
+    }
+
+@async_api_view(["POST"])
+async def register(request):
+    serializer = RegisterSerializer(data=json_body(request))
 
     if not serializer.is_valid():
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        return JSONResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    password_hash = await amake_password(serializer.validated_data["password"])
+    # A duplicate email surfaces here as a ValidationError (400)
+    await sync_to_async(serializer.save)(password_hash=password_hash)
+
+    return JSONResponse(
+        {"message": "User registered successfully"},
+        status=status.HTTP_201_CREATED,
+    )
+
 
-    user = serializer.validated_data["user"]
+@async_api_view(["POST"])
+async def login(request):
+    serializer = LoginSerializer(data=json_body(request))
+
+    if not serializer.is_valid():
+        return JSONResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        user = await serializer.aauthenticate()
+    except serializers.ValidationError as exc:
+        return JSONResponse(
+            serializers.as_serializer_error(exc),
+            status=status.HTTP_400_BAD_REQUEST,
+        )
 
     refresh = RefreshToken.for_user(user)
 
     # Safe profile fetch
-    try:
-        profile = UserProfile.objects.get(user=user)
-        full_name = profile.full_name
-    except UserProfile.DoesNotExist:
-        full_name = ""
-
-    return Response(
-        {
-            "message": "Login successful",
-            "tokens": {
-                "access": str(refresh.access_token),
-                "refresh": str(refresh),
-            },
-            "user": {
-                "id": user.id,
-                "email": user.email,
-                "full_name": full_name,
-            },
+    profile = await UserProfile.objects.filter(user=user).afirst()
+
+    data = {
+        "message": "Login successful",
+        "tokens": {
+            "access": str(refresh.access_token),
+            "refresh": str(refresh),
         },
-        status=status.HTTP_200_OK,
-    )
+        "user": _user_data(user, profile),
+    }
+    if _wants_bootstrap(request):
+        data["bootstrap"] = await _abootstrap(user)
+
+    return JSONResponse(data, status=status.HTTP_200_OK)
+
+
+class TokenRefreshView(jwt_views.TokenRefreshView):
+    """SimpleJWT's refresh, plus "user" and "bootstrap" on include=bootstrap"""
+
+    def post(self, request, *args, **kwargs):
+        response = super().post(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK and _wants_bootstrap(request):
+            user = CachedJWTAuthentication().get_user(AccessToken(response.data["access"]))
+            profile = UserProfile.objects.filter(user=user).first()
+            response.data["user"] = _user_data(user, profile)
+            response.data["bootstrap"] = _bootstrap(user)
+        return response
 
 
 # ======================================================
@@ -212,36 +266,78 @@ class ProjectDetailView(APIView):
         )
 
 
-class ChangePasswordView(APIView):
-    permission_classes = [IsAuthenticated]
+@async_api_view(["POST"], authenticated=True)
+async def change_password(request):
+    serializer = ChangePasswordSerializer(data=json_body(request))
 
-    def post(self, request):
-        serializer = ChangePasswordSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+    if not serializer.is_valid():
+        return JSONResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    # The authenticated user may come from UserCache, which has no hash
+    user = await User.objects.aget(pk=request.user.pk)
+    current_password = serializer.validated_data["current_password"]
+    new_password = serializer.validated_data["new_password"]
+
+    # Verify current password
+    if not await acheck_user_password(user, current_password):
+        return JSONResponse(
+            {"detail": "Current password is incorrect."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
 
-        user = request.user
-        current_password = serializer.validated_data["current_password"]
-        new_password = serializer.validated_data["new_password"]
+    # Prevent reusing same password
+    if current_password == new_password:
+        return JSONResponse(
+            {"detail": "New password cannot be the same as the current password."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
 
-        # Verify current password
-        if not user.check_password(current_password):
-            return Response(
-                {"detail": "Current password is incorrect."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+    # Set new password securely
+    await aset_user_password(user, new_password)
+    await user.asave(update_fields=["password"])
 
-        # Prevent reusing same password
-        if current_password == new_password:
-            return Response(
-                {"detail": "New password cannot be the same as the current password."},
+    # Every token issued before this second, plus the one on this request
+    # (the cutoff has whole-second precision)
+    await arevoke_user_tokens(user)
+    await arevoke_token(request.auth)
+
+    return JSONResponse(
+        {"detail": "Password updated successfully. Please log in again."},
+        status=status.HTTP_200_OK,
+    )
+
+
+@async_api_view(["POST"], authenticated=True)
+async def logout(request):
+    """
+    Revoke the access token used for this request and, when given, its
+    refresh token. {"everywhere": true} revokes every token of the user.
+    """
+    serializer = LogoutSerializer(data=json_body(request))
+
+    if not serializer.is_valid():
+        return JSONResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    if serializer.validated_data["everywhere"]:
+        await arevoke_user_tokens(request.user)
+        await arevoke_token(request.auth)
+        return JSONResponse({"detail": "Logged out everywhere."}, status=status.HTTP_200_OK)
+
+    refresh = None
+    raw_refresh = serializer.validated_data.get("refresh")
+    if raw_refresh:
+        try:
+            refresh = RefreshToken(raw_refresh)
+        except TokenError:
+            refresh = None
+        if refresh is None or str(refresh.get(api_settings.USER_ID_CLAIM)) != str(request.user.pk):
+            return JSONResponse(
+                {"detail": "Invalid refresh token."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        # Set new password securely
-        user.set_password(new_password)
-        user.save()
+    await arevoke_token(request.auth)
+    if refresh is not None:
+        await arevoke_token(refresh)
 
-        return Response(
-            {"detail": "Password updated successfully. Please log in again."},
-            status=status.HTTP_200_OK,
-        )
+    return JSONResponse({"detail": "Logged out."}, status=status.HTTP_200_OK)
@@ -159,7 +159,7 @@ const HomePrivate = () => {
 
       try {
         setIsSearching(true);
-        const res = await api.get("/api/projects/search/", {
+        const res = await api.get("/api/projects/autocomplete/", {
           params: { q: searchQuery },
         });
         setSearchResults(res.data.results);